@@ -3,6 +3,8 @@
 import math
 import random
 
+import numpy
+import ps2_batch
 import ps2_visualize
 import pylab
 
@@ -66,6 +68,13 @@ class RectangularRoom(object):
 
     A room has a width and a height and contains (width * height) tiles. At any
     particular time, each of these tiles is either clean or dirty.
+
+    Tiles are stored in a bytearray, one byte per tile (tile (m, n) at index
+    m * height + n), and the number of cleaned tiles is kept up to date as tiles
+    get cleaned, so coverage checks take constant time. Once popCleanedTiles has
+    been called (by the visualization), newly cleaned tiles are also logged until
+    the next call, so that only the tiles that changed are redrawn. Rooms that
+    are never visualized keep no log.
     """
     def __init__(self, width, height):
         """
@@ -78,12 +87,12 @@ class RectangularRoom(object):
         """
         self.width = width
         self.height = height
-        self.tiles = {}
-        # Initialize a dictionary of dirty tiles
-        for w in range(self.width):
-            for h in range(self.height):
-                self.tiles[(w, h)] = 0
-    
+        # All the tiles start dirty
+        self.tiles = bytearray(width * height)
+        self.num_cleaned = 0
+        # Log of the newly cleaned tiles, only kept once popCleanedTiles is used
+        self.new_tiles = None
+
     def cleanTileAtPosition(self, pos):
         """
         Mark the tile under the position POS as cleaned.
@@ -92,7 +101,118 @@ class RectangularRoom(object):
 
         pos: a Position
         """
-        self.tiles[(math.floor(pos.getX()), math.floor(pos.getY()))] = 1
+        self.cleanTile(int(math.floor(pos.getX())), int(math.floor(pos.getY())))
+
+    def cleanTile(self, m, n):
+        """
+        Mark the tile (m, n) as cleaned.
+
+        Assumes that (m, n) represents a valid tile inside the room.
+
+        m: an integer
+        n: an integer
+        """
+        index = m * self.height + n
+        if not self.tiles[index]:
+            self.tiles[index] = 1
+            self.num_cleaned += 1
+            if self.new_tiles is not None:
+                self.new_tiles.append(index)
+
+    def popCleanedTiles(self):
+        """
+        Return the tiles cleaned since the last call (or since the room was
+        created), and forget them. The first call starts logging the cleaned
+        tiles.
+
+        returns: a list of (m, n) tuples
+        """
+        if self.new_tiles is None:
+            self.new_tiles = [index for index, cleaned in enumerate(self.tiles) if cleaned]
+        tiles = [divmod(index, self.height) for index in self.new_tiles]
+        self.new_tiles = []
+        return tiles
+
+    def cleanSegment(self, start, end):
+        """
+        Mark every tile crossed by the segment from START to END as cleaned.
+
+        Assumes that both positions are inside this room.
+
+        start: a Position
+        end: a Position
+        """
+        for _, m, n in self.crossedTiles(start, end):
+            self.cleanTile(m, n)
+
+    def crossedTiles(self, start, end):
+        """
+        Walk the grid from START to END one tile at a time (Amanatides & Woo
+        traversal). END may be outside the room.
+
+        start: a Position
+        end: a Position
+        returns: a generator of (t, m, n) tuples, the tiles (m, n) crossed by
+                 the segment in order and the fraction t of the segment at
+                 which it enters each of them
+        """
+        x, y = start.getX(), start.getY()
+        dx, dy = end.getX() - x, end.getY() - y
+        m, n = int(math.floor(x)), int(math.floor(y))
+        last_m, last_n = int(math.floor(end.getX())), int(math.floor(end.getY()))
+        step_m = 1 if dx > 0 else -1
+        step_n = 1 if dy > 0 else -1
+        # Fraction of the segment at which the next vertical / horizontal grid
+        # line is crossed, and between two consecutive lines
+        if dx != 0:
+            next_m = ((m + (dx > 0)) - x) / dx
+            delta_m = abs(1.0 / dx)
+        else:
+            next_m = delta_m = float('inf')
+        if dy != 0:
+            next_n = ((n + (dy > 0)) - y) / dy
+            delta_n = abs(1.0 / dy)
+        else:
+            next_n = delta_n = float('inf')
+
+        yield 0.0, m, n
+        while (m, n) != (last_m, last_n):
+            # Through a corner, the segment goes straight to the diagonal tile
+            cross_m = n == last_n or (m != last_m and next_m <= next_n)
+            cross_n = m == last_m or (n != last_n and next_n <= next_m)
+            t = next_m if cross_m else next_n
+            if cross_m:
+                m += step_m
+                next_m += delta_m
+            if cross_n:
+                n += step_n
+                next_n += delta_n
+            yield t, m, n
+
+    def wallHitPosition(self, start, end):
+        """
+        Return the position where the move from START to END hits a wall,
+        just inside the room, or END if it stays inside the room.
+
+        start: a Position inside the room
+        end: a Position
+        returns: a Position object
+        """
+        x, y = start.getX(), start.getY()
+        dx, dy = end.getX() - x, end.getY() - y
+        t = 1.0
+        if dx > 0:
+            t = min(t, (self.width - x) / dx)
+        elif dx < 0:
+            t = min(t, -x / dx)
+        if dy > 0:
+            t = min(t, (self.height - y) / dy)
+        elif dy < 0:
+            t = min(t, -y / dy)
+        # Stay strictly inside the room on the far walls
+        new_x = min(max(x + t * dx, 0.0), self.width * (1 - 1e-12))
+        new_y = min(max(y + t * dy, 0.0), self.height * (1 - 1e-12))
+        return Position(new_x, new_y)
 
     def isTileCleaned(self, m, n):
         """
@@ -104,15 +224,15 @@ class RectangularRoom(object):
         n: an integer
         returns: True if (m, n) is cleaned, False otherwise
         """
-        return self.tiles[(m, n)] == 1
-    
+        return self.tiles[m * self.height + n] == 1
+
     def getNumTiles(self):
         """
         Return the total number of tiles in the room.
 
         returns: an integer
         """
-        return len(self.tiles)
+        return self.width * self.height
 
     def getNumCleanedTiles(self):
         """
@@ -120,11 +240,15 @@ class RectangularRoom(object):
 
         returns: an integer
         """
-        count = 0
-        for k in self.tiles:
-            if self.tiles[k] == 1:
-                count += 1
-        return count
+        return self.num_cleaned
+
+    def getCoverage(self):
+        """
+        Return the fraction of the tiles of the room that have been cleaned.
+
+        returns: a float between 0 and 1
+        """
+        return float(self.num_cleaned) / self.getNumTiles()
 
     def getRandomPosition(self):
         """
@@ -132,7 +256,7 @@ class RectangularRoom(object):
 
         returns: a Position object.
         """
-        return Position(random.choice(range(self.width)), random.choice(range(self.height)))
+        return Position(random.randrange(self.width), random.randrange(self.height))
 
     def isPositionInRoom(self, pos):
         """
@@ -143,6 +267,115 @@ class RectangularRoom(object):
         """
         return 0 <= pos.getX() < self.width and 0 <= pos.getY() < self.height
 
+    def isMoveInRoom(self, start, end):
+        """
+        Return True if the move from START to END stays inside the room. The
+        room is convex, so this only depends on END.
+
+        start: a Position inside the room
+        end: a Position
+        returns: True if the move stays in the room, False otherwise.
+        """
+        return self.isPositionInRoom(end)
+
+
+class FurnishedRoom(RectangularRoom):
+    """
+    A FurnishedRoom is a RectangularRoom with obstacles, laid out by a
+    ps2_batch.FloorPlan. Only the free tiles of the plan are part of the room:
+    robots are placed on them, cannot move through blocked tiles, and the
+    coverage only counts free tiles.
+
+    The plan is computed once and shared by all the rooms built from it. Its
+    distance transform lets most moves be checked like in an empty room: a
+    move no longer than the clearance of its starting tile cannot hit an
+    obstacle, so only its end is checked against the walls, and only the
+    moves close to an obstacle walk the grid.
+    """
+    def __init__(self, plan):
+        """
+        Initializes a room following the floor plan PLAN. Initially, no tiles
+        in the room have been cleaned.
+
+        plan: a ps2_batch.FloorPlan
+        """
+        RectangularRoom.__init__(self, plan.width, plan.height)
+        self.plan = plan
+        self.free = bytearray(plan.free.tolist())
+        self.clearance = plan.clearance.tolist()
+        self.free_tiles = plan.free_tiles.tolist()
+
+    def isTileFree(self, m, n):
+        """
+        Return True if the tile (m, n) is a free tile of the room.
+
+        m: an integer
+        n: an integer
+        """
+        return 0 <= m < self.width and 0 <= n < self.height and self.free[m * self.height + n] == 1
+
+    def getNumTiles(self):
+        """
+        Return the number of free tiles in the room.
+
+        returns: an integer
+        """
+        return len(self.free_tiles)
+
+    def getRandomPosition(self):
+        """
+        Return a random position on a free tile of the room.
+
+        returns: a Position object.
+        """
+        index = random.choice(self.free_tiles)
+        return Position(index // self.height, index % self.height)
+
+    def isPositionInRoom(self, pos):
+        """
+        Return True if pos is on a free tile of the room.
+
+        pos: a Position object.
+        returns: True if pos is in the room, False otherwise.
+        """
+        return self.isTileFree(int(math.floor(pos.getX())), int(math.floor(pos.getY())))
+
+    def isMoveInRoom(self, start, end):
+        """
+        Return True if the move from START to END only crosses free tiles.
+
+        start: a Position on a free tile
+        end: a Position
+        returns: True if the move stays in the room, False otherwise.
+        """
+        x, y = start.getX(), start.getY()
+        length = math.hypot(end.getX() - x, end.getY() - y)
+        if length <= self.clearance[int(x) * self.height + int(y)]:
+            return RectangularRoom.isPositionInRoom(self, end)
+        return all(self.isTileFree(m, n) for _, m, n in self.crossedTiles(start, end))
+
+    def wallHitPosition(self, start, end):
+        """
+        Return the position where the move from START to END reaches a wall
+        or an obstacle, on the last free tile crossed, or END if it only
+        crosses free tiles.
+
+        start: a Position on a free tile
+        end: a Position
+        returns: a Position object
+        """
+        x, y = start.getX(), start.getY()
+        last_m, last_n = int(x), int(y)
+        for t, m, n in self.crossedTiles(start, end):
+            if not self.isTileFree(m, n):
+                # Stay on the last free tile, whose far sides belong to the
+                # next tiles
+                hit_x = min(max(x + t * (end.getX() - x), last_m), last_m + 1 - 1e-9)
+                hit_y = min(max(y + t * (end.getY() - y), last_n), last_n + 1 - 1e-9)
+                return Position(hit_x, hit_y)
+            last_m, last_n = m, n
+        return end
+
 
 class Robot(object):
     """
@@ -154,6 +387,10 @@ class Robot(object):
     Subclasses of Robot should provide movement strategies by implementing
     updatePositionAndClean(), which simulates a single time-step.
     """
+    # When True, robots clean every tile they cross and move up to the wall
+    # instead of stopping before it, see moveAndClean
+    sweep = False
+
     def __init__(self, room, speed):
         """
         Initializes a Robot with the given speed in the specified room. The
@@ -163,7 +400,11 @@ class Robot(object):
         room:  a RectangularRoom object.
         speed: a float (speed > 0)
         """
-        raise NotImplementedError
+        self.room = room
+        self.speed = speed
+        self.position = room.getRandomPosition()
+        self.direction = random.randrange(360)
+        room.cleanTileAtPosition(self.position)
 
     def getRobotPosition(self):
         """
@@ -171,8 +412,8 @@ class Robot(object):
 
         returns: a Position object giving the robot's position.
         """
-        raise NotImplementedError
-    
+        return self.position
+
     def getRobotDirection(self):
         """
         Return the direction of the robot.
@@ -180,7 +421,7 @@ class Robot(object):
         returns: an integer d giving the direction of the robot as an angle in
         degrees, 0 <= d < 360.
         """
-        raise NotImplementedError
+        return self.direction
 
     def setRobotPosition(self, position):
         """
@@ -188,7 +429,7 @@ class Robot(object):
 
         position: a Position object.
         """
-        raise NotImplementedError
+        self.position = position
 
     def setRobotDirection(self, direction):
         """
@@ -196,7 +437,7 @@ class Robot(object):
 
         direction: integer representing an angle in degrees
         """
-        raise NotImplementedError
+        self.direction = direction
 
     def updatePositionAndClean(self):
         """
@@ -207,9 +448,86 @@ class Robot(object):
         """
         raise NotImplementedError # don't change this!
 
+    def moveAndClean(self):
+        """
+        Move the robot in its current direction and clean the tile it lands
+        on, unless the move would take it out of the room.
+
+        With sweep, every tile crossed during the move is cleaned, and a
+        robot that would leave the room moves up to the wall instead, so
+        large speeds do not skip tiles.
+
+        returns: True if the robot moved, False if it would have hit a wall.
+        """
+        new_position = self.position.getNewPosition(self.direction, self.speed)
+        inside = self.room.isMoveInRoom(self.position, new_position)
+        if not self.sweep:
+            if inside:
+                self.position = new_position
+                self.room.cleanTileAtPosition(new_position)
+            return inside
+
+        if not inside:
+            new_position = self.room.wallHitPosition(self.position, new_position)
+        self.room.cleanSegment(self.position, new_position)
+        self.position = new_position
+        return inside
+
+
+class KernelRobot(Robot):
+    """
+    A KernelRobot moves with the kernel registered in ps2_batch under its
+    strategy attribute, applied to this robot alone. A strategy written once as
+    a kernel therefore runs with both engines of runSimulation and in the
+    visualization.
+    """
+    strategy = None
+
+    def __init__(self, room, speed):
+        Robot.__init__(self, room, speed)
+        self.turn = ps2_batch.STRATEGIES[self.strategy]
+        self.state = numpy.zeros(1, dtype=int)
+        self.rng = numpy.random.RandomState(random.randrange(2 ** 31 - 1))
+        # Arguments of the kernel, reused at every time-step
+        self.directions = numpy.zeros(1)
+        self.blocked = numpy.zeros(1, dtype=bool)
+        self.walls = numpy.zeros(1, dtype=int)
+
+    def updatePositionAndClean(self):
+        """
+        Simulate the passage of a single time-step.
+
+        Move the robot to a new position and mark the tile it is on as having
+        been cleaned, then let the kernel choose the next direction.
+        """
+        start = self.position
+        moved = self.moveAndClean()
+        walls = 0
+        if not moved:
+            # Which of the moves along x and along y alone would also be blocked
+            end = start.getNewPosition(self.direction, self.speed)
+            if not self.room.isMoveInRoom(start, Position(end.getX(), start.getY())):
+                walls += ps2_batch.WALL_X
+            if not self.room.isMoveInRoom(start, Position(start.getX(), end.getY())):
+                walls += ps2_batch.WALL_Y
+        self.directions[0] = self.direction
+        self.blocked[0] = not moved
+        self.walls[0] = walls
+        directions = self.turn(self.directions, self.state, self.blocked, self.walls, self.rng, self.probe)
+        self.setRobotDirection(float(directions[0]))
+
+    def probe(self, robots, headings):
+        """
+        Tells whether this robot could move one time-step along each of
+        HEADINGS, see the probe argument of the ps2_batch kernels.
+        """
+        start = self.position
+        return numpy.array([self.room.isMoveInRoom(start, start.getNewPosition(heading, self.speed))
+                            for heading in headings], dtype=bool)
+
 
 # === Problem 2
-class StandardRobot(Robot):
+class StandardRobot(KernelRobot):
     """
     A StandardRobot is a Robot with the standard movement strategy.
 
@@ -217,14 +535,8 @@ class StandardRobot(Robot):
     direction; when it would hit a wall, it *instead* chooses a new direction
     randomly.
     """
-    def updatePositionAndClean(self):
-        """
-        Simulate the raise passage of a single time-step.
-
-        Move the robot to a new position and mark the tile it is on as having
-        been cleaned.
-        """
-        raise NotImplementedError
+    # Kernel of the strategy, see ps2_batch.standardTurns
+    strategy = 'standard'
 
 # Uncomment this line to see your implementation of StandardRobot in action!
 ##testRobotMovement(StandardRobot, RectangularRoom)
@@ -232,7 +544,8 @@ class StandardRobot(Robot):
 
 # === Problem 3
 def runSimulation(num_robots, speed, width, height, min_coverage, num_trials,
-                  robot_type):
+                  robot_type, engine='object', max_workers=1, sweep=False,
+                  blocked=(), polygons=(), seed=None, batch_size=100, max_steps=None):
     """
     Runs NUM_TRIALS trials of the simulation and returns the mean number of
     time-steps needed to clean the fraction MIN_COVERAGE of the room.
@@ -248,40 +561,124 @@ def runSimulation(num_robots, speed, width, height, min_coverage, num_trials,
     num_trials: an int (num_trials > 0)
     robot_type: class of robot to be instantiated (e.g. StandardRobot or
                 RandomWalkRobot)
+    engine: 'object' to step each robot object, or 'batch' to advance the
+            robots of all the trials together with ps2_batch, following the
+            strategy attribute of robot_type. Robot types without a strategy
+            registered in ps2_batch always run with the object engine
+    max_workers: an int, number of processes running the batched trials, or
+                 None for one per CPU
+    sweep: True to clean every tile the robots cross, see Robot.moveAndClean
+    blocked: iterable of (m, n) tiles covered by obstacles
+    polygons: iterable of obstacles given as lists of (x, y) vertices. With
+              obstacles, the room is a FurnishedRoom and the coverage only
+              counts the free tiles, see ps2_batch.FloorPlan
+    seed: an int or None, seed of the batched trials. The object engine
+          draws from the random module
+    batch_size: an int, number of batched trials simulated together. The
+                result of the batch engine only depends on the seed and the
+                batch size, whatever the number of workers
+    max_steps: an int, or None for a cap depending on the size of the room
+               (see ps2_batch.stepLimit). Raises RuntimeError if a trial did
+               not clean the fraction MIN_COVERAGE of the room after that many
+               time-steps, since some strategies never clean some rooms
     """
-    raise NotImplementedError
+    plan = None
+    if blocked or polygons:
+        plan = ps2_batch.FloorPlan(width, height, blocked, polygons)
+    max_steps = ps2_batch.stepLimit(min_coverage, width * height if plan is None else plan.getNumTiles(),
+                                    max_steps)
+    if engine == 'batch' and getattr(robot_type, 'strategy', None) in ps2_batch.STRATEGIES:
+        return ps2_batch.runSimulation(num_robots, speed, width, height, min_coverage,
+                                       num_trials, robot_type.strategy, seed=seed,
+                                       batch_size=batch_size, max_workers=max_workers,
+                                       sweep=sweep, plan=plan, max_steps=max_steps)
+
+    total_steps = 0
+    for _ in range(num_trials):
+        room = RectangularRoom(width, height) if plan is None else FurnishedRoom(plan)
+        robots = [robot_type(room, speed) for _ in range(num_robots)]
+        for robot in robots:
+            robot.sweep = sweep
+        needed = min_coverage * room.getNumTiles()
+        step = 0
+        while room.getNumCleanedTiles() < needed:
+            if step >= max_steps:
+                raise RuntimeError("a trial did not clean %g of the room in %d time-steps"
+                                   % (min_coverage, max_steps))
+            for robot in robots:
+                robot.updatePositionAndClean()
+            step += 1
+        total_steps += step
+    return float(total_steps) / num_trials
 
 # Uncomment this line to see how much your simulation takes on average
 ##print  runSimulation(1, 1.0, 10, 10, 0.75, 30, StandardRobot)
 
 
 # === Problem 4
-class RandomWalkRobot(Robot):
+class RandomWalkRobot(KernelRobot):
     """
     A RandomWalkRobot is a robot with the "random walk" movement strategy: it
     chooses a new direction at random at the end of each time-step.
     """
-    def updatePositionAndClean(self):
-        """
-        Simulate the passage of a single time-step.
+    # Kernel of the strategy, see ps2_batch.randomWalkTurns
+    strategy = 'random_walk'
 
-        Move the robot to a new position and mark the tile it is on as having
-        been cleaned.
-        """
-        raise NotImplementedError
+
+class SpiralRobot(KernelRobot):
+    """
+    A SpiralRobot moves in widening spirals, starting a new one when it
+    would hit a wall.
+    """
+    strategy = 'spiral'
 
 
-def showPlot1(title, x_label, y_label):
+class WallFollowRobot(KernelRobot):
+    """
+    A WallFollowRobot runs along the walls of the room and around its
+    obstacles, and leaves them in a random direction after each lap.
+    """
+    strategy = 'wall_follow'
+
+
+class BoustrophedonRobot(KernelRobot):
+    """
+    A BoustrophedonRobot sweeps the room back and forth in parallel lanes,
+    like a lawnmower.
+    """
+    strategy = 'boustrophedon'
+
+
+def runForPlot(num_robots, speed, width, height, min_coverage, num_trials,
+               robot_type, engine, precision):
+    """
+    Mean number of time-steps of a point of showPlot1 / showPlot2: runs
+    NUM_TRIALS trials with runSimulation, or when PRECISION is given as many
+    trials as ps2_batch.runAdaptive needs to reach that relative precision.
+    """
+    if precision is None:
+        return runSimulation(num_robots, speed, width, height, min_coverage, num_trials,
+                             robot_type, engine)
+    return ps2_batch.runAdaptive(num_robots, speed, width, height, min_coverage,
+                                 robot_type.strategy, precision)['mean']
+
+
+def showPlot1(title, x_label, y_label, engine='object', precision=None):
     """
     What information does the plot produced by this function tell you?
+
+    engine: 'object' or 'batch', see runSimulation
+    precision: None to run a fixed number of trials per point, or a float to
+               run trials until the confidence interval of each point is that
+               narrow relative to its mean, see ps2_batch.runAdaptive
     """
     num_robot_range = range(1, 11)
     times1 = []
     times2 = []
     for num_robots in num_robot_range:
         print "Plotting", num_robots, "robots..."
-        times1.append(runSimulation(num_robots, 1.0, 20, 20, 0.8, 20, StandardRobot))
-        times2.append(runSimulation(num_robots, 1.0, 20, 20, 0.8, 20, RandomWalkRobot))
+        times1.append(runForPlot(num_robots, 1.0, 20, 20, 0.8, 20, StandardRobot, engine, precision))
+        times2.append(runForPlot(num_robots, 1.0, 20, 20, 0.8, 20, RandomWalkRobot, engine, precision))
     pylab.plot(num_robot_range, times1)
     pylab.plot(num_robot_range, times2)
     pylab.title(title)
@@ -291,9 +688,12 @@ def showPlot1(title, x_label, y_label):
     pylab.show()
 
     
-def showPlot2(title, x_label, y_label):
+def showPlot2(title, x_label, y_label, engine='object', precision=None):
     """
     What information does the plot produced by this function tell you?
+
+    engine: 'object' or 'batch', see runSimulation
+    precision: None or a float, see showPlot1
     """
     aspect_ratios = []
     times1 = []
@@ -302,8 +702,8 @@ def showPlot2(title, x_label, y_label):
         height = 300/width
         print "Plotting cleaning time for a room of width:", width, "by height:", height
         aspect_ratios.append(float(width) / height)
-        times1.append(runSimulation(2, 1.0, width, height, 0.8, 200, StandardRobot))
-        times2.append(runSimulation(2, 1.0, width, height, 0.8, 200, RandomWalkRobot))
+        times1.append(runForPlot(2, 1.0, width, height, 0.8, 200, StandardRobot, engine, precision))
+        times2.append(runForPlot(2, 1.0, width, height, 0.8, 200, RandomWalkRobot, engine, precision))
     pylab.plot(aspect_ratios, times1)
     pylab.plot(aspect_ratios, times2)
     pylab.title(title)
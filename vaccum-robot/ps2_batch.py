@@ -0,0 +1,794 @@
+# Problem Set 2:
+# Batched simulation engine for the robots of ps2.py.
+#
+# The robots are held in numpy arrays (x, y and direction of every robot) and
+# advanced together: the moves are computed with vectorized trig, wall
+# collisions are handled with a mask and the tiles under the robots are marked
+# in bulk. Many independent trials are stacked in the same arrays (one row per
+# trial) and retired as soon as they reach the target coverage, so a time-step
+# costs a handful of numpy operations whatever the number of robots and trials.
+#
+# Uses numpy.random.RandomState so that it runs with the numpy versions that
+# support Python 2.7.
+
+import collections
+import multiprocessing
+
+import numpy
+
+
+# Movement strategies are kernels that update the directions of many robots at
+# once, after they moved:
+#
+#     kernel(directions, state, blocked, walls, rng, probe) -> new directions
+#
+# directions: numpy float array of the direction of each robot, in degrees
+# state: numpy int array of the same shape, per robot memory of the strategy,
+#        zero when the robot is placed. Kernels update it in place
+# blocked: numpy boolean array of the same shape, True for the robots that
+#          would have left the room during the time-step
+# walls: numpy int array of the same shape, which wall blocked each robot:
+#        WALL_X when moving along x alone would also have been blocked (the
+#        robot hit a side parallel to the y axis), plus WALL_Y likewise for
+#        y. Both in a corner, and 0 when only the diagonal move was blocked,
+#        on the corner of an obstacle
+# rng: numpy.random.RandomState
+# probe: function probe(robots, headings) -> numpy boolean array, for the robots
+#        selected by the boolean array ROBOTS (from their new positions),
+#        True where a move of one time-step along HEADINGS would stay in the
+#        room. Only computed when a kernel calls it
+#
+# Kernels only see arrays, so the same kernel drives the batched engine and, one
+# robot at a time, the KernelRobot objects of ps2.py.
+STRATEGIES = {}
+
+WALL_X = 1
+WALL_Y = 2
+
+
+def registerStrategy(name, kernel):
+    """
+    Makes a movement strategy available to the batched engine and to the
+    robots of ps2.py whose strategy attribute is NAME.
+
+    name: a string
+    kernel: a function following the kernel signature above
+    """
+    STRATEGIES[name] = kernel
+
+
+def standardTurns(directions, state, blocked, walls, rng, probe):
+    """
+    StandardRobot strategy: a robot that would hit a wall chooses a new
+    direction instead of moving.
+    """
+    num_blocked = numpy.count_nonzero(blocked)
+    if num_blocked:
+        directions[blocked] = rng.randint(360, size=num_blocked)
+    return directions
+
+
+def randomWalkTurns(directions, state, blocked, walls, rng, probe):
+    """
+    RandomWalkRobot strategy: every robot chooses a new direction at the end
+    of each time-step.
+    """
+    return rng.randint(360, size=directions.shape).astype(float)
+
+
+# A spiral starts with turns of 360 / SPIRAL_START degrees, and after a wall hit
+# the robot moves straight for SPIRAL_PAUSE time-steps before the next one
+SPIRAL_START = 6
+SPIRAL_PAUSE = 10
+
+
+def spiralTurns(directions, state, blocked, walls, rng, probe):
+    """
+    Spiral strategy: the robot turns right by a smaller angle at every
+    time-step, drawing a spiral that widens as it goes. A robot that would hit
+    a wall leaves in a random direction, moves straight for a while, then
+    starts a new spiral. The state counts the time-steps of the spiral, and is
+    negative while the robot moves straight.
+    """
+    state += 1
+    spiraling = state > 0
+    directions[spiraling] += 360.0 / (SPIRAL_START + state[spiraling])
+    state[blocked] = -SPIRAL_PAUSE
+    directions[blocked] = rng.randint(360, size=numpy.count_nonzero(blocked))
+    return directions % 360
+
+
+# Axis-aligned headings, in clockwise order. West is -90 rather than 270
+# degrees: cos(270 degrees) is slightly negative, which would take a robot
+# standing on the y = 0 wall out of the room
+NORTH, EAST, SOUTH, WEST = 0.0, 90.0, 180.0, -90.0
+AXES = numpy.array([NORTH, EAST, SOUTH, WEST])
+
+
+def wallFollowTurns(directions, state, blocked, walls, rng, probe):
+    """
+    Wall-following strategy: a robot keeps the wall on its left. When it
+    would hit a wall it turns right along it, and when the wall on its left
+    ends (the convex corner of an obstacle) it turns left around it, so it
+    runs around the room and around the obstacles. Each corner is counted in
+    the state and after every lap (4 corners) the robot leaves the wall in a
+    random direction to explore the inside of the room.
+    """
+    # Robots on a wall that moved: turn left where the wall ends
+    following = ~blocked & (state % 4 != 0)
+    if numpy.count_nonzero(following):
+        left = AXES[(numpy.round(directions[following] / 90.0).astype(int) + 3) % 4]
+        ended = probe(following, left)
+        if ended.any():
+            corners = following.copy()
+            corners[following] = ended
+            state[corners] += 1
+            left = left[ended]
+            leave = state[corners] % 4 == 0
+            left[leave] = rng.randint(360, size=numpy.count_nonzero(leave))
+            directions[corners] = left
+    if not numpy.count_nonzero(blocked):
+        return directions
+    state[blocked] += 1
+    headings = numpy.radians(directions[blocked])
+    hits = walls[blocked]
+    # Heading into the wall that was hit, as an index of AXES: the side of
+    # the wall comes from the direction of the robot, the wall from walls
+    x_wall = numpy.where(numpy.sin(headings) > 0, 1, 3)
+    y_wall = numpy.where(numpy.cos(headings) > 0, 0, 2)
+    # In a corner, follow the wall that turning right does not lead back into
+    corner = hits == (WALL_X | WALL_Y)
+    use_x = (hits == WALL_X) | (corner & ((x_wall + 1) % 4 != y_wall))
+    into = numpy.where(use_x, x_wall, numpy.where(hits & WALL_Y, y_wall,
+                                                  numpy.round(directions[blocked] / 90.0).astype(int) % 4))
+    along = AXES[(into + 1) % 4]
+    leave = state[blocked] % 4 == 0
+    along[leave] = rng.randint(360, size=numpy.count_nonzero(leave))
+    directions[blocked] = along
+    return directions
+
+
+# Phases of the boustrophedon strategy, kept in the two lowest bits of the
+# state. The third bit is set while the robot shifts towards decreasing x
+SWEEPING = 0
+SHIFT_THEN_DOWN = 1
+SHIFT_THEN_UP = 2
+WESTWARD = 4
+
+
+def boustrophedonTurns(directions, state, blocked, walls, rng, probe):
+    """
+    Boustrophedon (lawnmower) strategy: the robot sweeps the room along the
+    y axis. When it reaches a wall it moves sideways for one time-step, then
+    sweeps back the other way. When the sideways move is blocked the robot
+    has reached the end of its lanes: it leaves in a random direction, which
+    keeps it from cycling around obstacles, and later shifts the other way.
+    """
+    phase = state & 3
+    shifting = phase != SWEEPING
+
+    # Robots that finished their sideways move sweep back along y
+    directions[shifting] = numpy.where(phase[shifting] == SHIFT_THEN_DOWN, SOUTH, NORTH)
+    ended = shifting & blocked
+    directions[ended] = rng.randint(360, size=numpy.count_nonzero(ended))
+    state[ended] ^= WESTWARD
+    state[shifting] &= WESTWARD
+
+    # Sweeping robots that reached a wall move sideways for one time-step
+    ends = ~shifting & blocked
+    going_up = numpy.cos(numpy.radians(directions[ends])) > 0
+    state[ends] |= numpy.where(going_up, SHIFT_THEN_DOWN, SHIFT_THEN_UP)
+    directions[ends] = numpy.where(state[ends] & WESTWARD, WEST, EAST)
+    return directions
+
+
+registerStrategy('standard', standardTurns)
+registerStrategy('random_walk', randomWalkTurns)
+registerStrategy('spiral', spiralTurns)
+registerStrategy('wall_follow', wallFollowTurns)
+registerStrategy('boustrophedon', boustrophedonTurns)
+
+
+def crossedTiles(x0, y0, x1, y1):
+    """
+    Grid traversal of segments: finds every tile crossed by each segment from
+    (x0, y0) to (x1, y1), in order. The segment is cut at every vertical and
+    horizontal grid line it crosses, and the tile of each piece is the one
+    containing its middle. Segments crossing up to k grid lines cost arrays of
+    k columns, so the work does not depend on the length of the pieces.
+
+    x0, y0, x1, y1: numpy arrays of coordinates, one per segment
+    returns: tuple of numpy arrays (segment index, x and y of a point in the
+             tile, fraction of the segment where it enters the tile) with one
+             entry per crossed tile
+    """
+    dx = x1 - x0
+    dy = y1 - y0
+    bounds = [numpy.zeros((len(x0), 1)), numpy.ones((len(x0), 1))]
+    for start, end, delta in ((x0, x1, dx), (y0, y1, dy)):
+        lines = numpy.abs(numpy.floor(end) - numpy.floor(start)).astype(int)
+        if not len(lines) or not lines.max():
+            continue
+        steps = numpy.arange(1, lines.max() + 1)
+        first = numpy.floor(start)[:, None]
+        grid = numpy.where(delta[:, None] > 0, first + steps, first - steps + 1)
+        with numpy.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            crossings = (grid - start[:, None]) / delta[:, None]
+        crossings[steps[None, :] > lines[:, None]] = numpy.inf
+        bounds.append(crossings)
+    bounds = numpy.sort(numpy.concatenate(bounds, axis=1), axis=1)
+    # Pieces end at a crossing or at the end of the segment, padding is infinite
+    pieces = (bounds[:, 1:] <= 1) & (bounds[:, 1:] > bounds[:, :-1])
+    segments, columns = numpy.nonzero(pieces)
+    starts = bounds[segments, columns]
+    middles = (starts + bounds[segments, columns + 1]) / 2
+    x = x0[segments] + middles * dx[segments]
+    y = y0[segments] + middles * dy[segments]
+    # A segment ending exactly on a grid line enters its last tile with a
+    # piece of length zero: add the tile of the end point after the others
+    last = numpy.flatnonzero(numpy.diff(numpy.append(segments, len(x0))))
+    missed = ((numpy.floor(x[last]) != numpy.floor(x1[segments[last]])) |
+              (numpy.floor(y[last]) != numpy.floor(y1[segments[last]])))
+    if missed.any():
+        ends = segments[last[missed]]
+        order = numpy.argsort(numpy.append(segments, ends), kind='mergesort')
+        segments = numpy.append(segments, ends)[order]
+        x = numpy.append(x, x1[ends])[order]
+        y = numpy.append(y, y1[ends])[order]
+        starts = numpy.append(starts, numpy.ones(len(ends)))[order]
+    return segments, x, y, starts
+
+
+def wallHits(x0, y0, x1, y1, width, height):
+    """
+    Clips moves that would leave the room at the point where they hit a wall.
+
+    x0, y0: numpy arrays, positions inside the room
+    x1, y1: numpy arrays, positions the robots would move to
+    returns: tuple of numpy arrays (x, y) of the end of each move, just inside
+             the room for the moves that hit a wall
+    """
+    dx = x1 - x0
+    dy = y1 - y0
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        tx = numpy.where(dx > 0, (width - x0) / dx, numpy.where(dx < 0, -x0 / dx, numpy.inf))
+        ty = numpy.where(dy > 0, (height - y0) / dy, numpy.where(dy < 0, -y0 / dy, numpy.inf))
+    t = numpy.minimum(numpy.minimum(tx, ty), 1.0)
+    x = numpy.clip(x0 + t * dx, 0, numpy.nextafter(width, 0))
+    y = numpy.clip(y0 + t * dy, 0, numpy.nextafter(height, 0))
+    return x, y
+
+
+def polygonTiles(polygon, width, height):
+    """
+    Finds the tiles of a WIDTH x HEIGHT room whose centre is inside POLYGON
+    (even-odd rule).
+
+    polygon: list of (x, y) vertices
+    returns: numpy boolean array of shape (width, height)
+    """
+    x = numpy.arange(width)[:, None] + 0.5
+    y = numpy.arange(height)[None, :] + 0.5
+    inside = numpy.zeros((width, height), dtype=bool)
+    vertices = list(polygon)
+    for (x1, y1), (x2, y2) in zip(vertices, vertices[1:] + vertices[:1]):
+        if y1 == y2:
+            continue
+        inside ^= ((y1 > y) != (y2 > y)) & (x < x1 + (y - y1) * (x2 - x1) / float(y2 - y1))
+    return inside
+
+
+def largestRegion(free):
+    """
+    Keeps the largest region of free tiles connected through their sides.
+
+    free: numpy boolean array of shape (width, height)
+    returns: numpy boolean array of the same shape
+    """
+    width, height = free.shape
+    grid = free.tolist()
+    seen = [[False] * height for _ in range(width)]
+    best = []
+    for m in range(width):
+        for n in range(height):
+            if not grid[m][n] or seen[m][n]:
+                continue
+            seen[m][n] = True
+            region = [(m, n)]
+            queue = collections.deque(region)
+            while queue:
+                i, j = queue.popleft()
+                for a, b in ((i + 1, j), (i - 1, j), (i, j + 1), (i, j - 1)):
+                    if 0 <= a < width and 0 <= b < height and grid[a][b] and not seen[a][b]:
+                        seen[a][b] = True
+                        region.append((a, b))
+                        queue.append((a, b))
+            if len(region) > len(best):
+                best = region
+    region = numpy.zeros(free.shape, dtype=bool)
+    if best:
+        region[tuple(numpy.array(best).T)] = True
+    return region
+
+
+def clearances(free):
+    """
+    Distance transform of the free tiles: the number of rings of free tiles
+    around each tile. Only obstacles count: the room is convex, so the walls
+    are left to a bounds check of the end of each move. The free tiles are
+    eroded one ring at a time, so this costs one pass over the grid per unit
+    of the largest clearance, which is capped at the size of the room (a
+    clearance that large already covers the whole room).
+
+    free: numpy boolean array of shape (width, height)
+    returns: numpy int array of the same shape, 0 for blocked tiles
+    """
+    width, height = free.shape
+    clearance = numpy.zeros(free.shape, dtype=int)
+    level = free.copy()
+    for _ in range(max(width, height)):
+        if not level.any():
+            break
+        padded = numpy.pad(level, 1, 'constant', constant_values=True)
+        for dm in (-1, 0, 1):
+            for dn in (-1, 0, 1):
+                level &= padded[1 + dm:1 + dm + width, 1 + dn:1 + dn + height]
+        clearance += level
+    return clearance
+
+
+class FloorPlan(object):
+    """
+    Layout of a room with obstacles, computed once and shared by every trial
+    simulated in it.
+
+    The free tiles are those of the largest open region of the room: tiles
+    covered by obstacles, and tiles the obstacles cut off from that region,
+    are blocked. Robots are only placed on free tiles, and only free tiles
+    count in the coverage of the room.
+
+    Tiles are indexed like in RectangularRoom (tile (m, n) at m * height + n):
+    free: numpy boolean array, True for the free tiles
+    free_tiles: numpy array of the indices of the free tiles
+    clearance: numpy int array, for each free tile the number of rings of
+               free tiles around it (see clearances). A move no longer than
+               the clearance of the tile it starts from cannot hit an
+               obstacle, so most collision checks are a lookup and the bounds
+               check of an empty room.
+    """
+    def __init__(self, width, height, blocked=(), polygons=()):
+        """
+        width: an integer > 0
+        height: an integer > 0
+        blocked: iterable of (m, n) tiles of the room covered by obstacles
+        polygons: iterable of obstacles given as lists of (x, y) vertices,
+                  covering the tiles whose centre is inside them
+        """
+        self.width = width
+        self.height = height
+        free = numpy.ones((width, height), dtype=bool)
+        for m, n in blocked:
+            free[m, n] = False
+        for polygon in polygons:
+            free &= ~polygonTiles(polygon, width, height)
+        free = largestRegion(free)
+        self.clearance = clearances(free).reshape(-1)
+        self.free = free.reshape(-1)
+        self.free_tiles = numpy.flatnonzero(self.free)
+
+    def getNumTiles(self):
+        """
+        returns: an integer, the number of free tiles
+        """
+        return len(self.free_tiles)
+
+    def contains(self, x, y):
+        """
+        returns: numpy boolean array, True for the positions (x, y) on a free
+                 tile
+        """
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        tiles = numpy.floor(x[inside]).astype(int) * self.height + numpy.floor(y[inside]).astype(int)
+        inside[inside] = self.free[tiles]
+        return inside
+
+    def movesInRoom(self, x0, y0, x1, y1, length):
+        """
+        Checks that the moves from (x0, y0) to (x1, y1), all of the given
+        length, only cross free tiles. Moves ending inside the room and no
+        longer than the clearance of their starting tile are free: from x in
+        tile m, x + length < m + 1 + clearance, so every tile crossed is
+        within the clearance. Only the moves starting closer to an obstacle
+        than their length walk the grid.
+
+        x0, y0: numpy arrays, positions on free tiles
+        x1, y1: numpy arrays, positions the robots would move to
+        length: a float, length of the moves
+        returns: numpy boolean array, True for the moves that stay on free
+                 tiles
+        """
+        inside = (x1 >= 0) & (x1 < self.width) & (y1 >= 0) & (y1 < self.height)
+        tiles = numpy.floor(x0).astype(int) * self.height + numpy.floor(y0).astype(int)
+        near = numpy.flatnonzero(inside & (length > self.clearance[tiles]))
+        if len(near):
+            flat = [a.reshape(-1)[near] for a in (x0, y0, x1, y1)]
+            segments, tile_x, tile_y, _ = crossedTiles(*flat)
+            hits = segments[~self.contains(tile_x, tile_y)]
+            inside.reshape(-1)[near] = numpy.bincount(hits, minlength=len(near)) == 0
+        return inside
+
+    def wallsHit(self, x0, y0, x1, y1, length):
+        """
+        Finds which walls or obstacle sides block moves that leave the free
+        tiles, see the walls argument of the strategy kernels.
+
+        x0, y0: numpy arrays, positions on free tiles
+        x1, y1: numpy arrays, positions the robots would move to
+        length: a float, upper bound of the length of the moves
+        returns: numpy int array, WALL_X and / or WALL_Y for each move
+        """
+        return (WALL_X * ~self.movesInRoom(x0, y0, x1, y0, length) +
+                WALL_Y * ~self.movesInRoom(x0, y0, x0, y1, length))
+
+    def obstacleHits(self, x0, y0, x1, y1):
+        """
+        Clips moves that would leave the free tiles at the point where they
+        reach the first blocked tile or wall, like wallHits does for empty
+        rooms.
+
+        x0, y0: numpy arrays, positions on free tiles
+        x1, y1: numpy arrays, positions the robots would move to
+        returns: tuple of numpy arrays (x, y) of the end of each move, on the
+                 last free tile crossed for the moves that hit something
+        """
+        segments, tile_x, tile_y, starts = crossedTiles(x0, y0, x1, y1)
+        hits = numpy.flatnonzero(~self.contains(tile_x, tile_y))
+        # Pieces are sorted along each segment: keep the first hit of each one.
+        # The last free tile is the piece before it, or the starting tile when
+        # the segment leaves it right away from one of its sides
+        hit_segments, first = numpy.unique(segments[hits], return_index=True)
+        hits = hits[first]
+        t = starts[hits]
+        before = numpy.maximum(hits - 1, 0)
+        started = (hits > 0) & (segments[before] == hit_segments)
+        m = numpy.where(started, numpy.floor(tile_x[before]), numpy.floor(x0[hit_segments]))
+        n = numpy.where(started, numpy.floor(tile_y[before]), numpy.floor(y0[hit_segments]))
+        x = x1.copy()
+        y = y1.copy()
+        x[hit_segments] = numpy.clip(x0[hit_segments] + t * (x1 - x0)[hit_segments], m, numpy.nextafter(m + 1, m))
+        y[hit_segments] = numpy.clip(y0[hit_segments] + t * (y1 - y0)[hit_segments], n, numpy.nextafter(n + 1, n))
+        return x, y
+
+
+class BatchRoom(object):
+    """
+    Tiles of the rooms of a batch of trials: a boolean array with one row per
+    trial, where tile (m, n) is at column m * height + n like in
+    RectangularRoom, and the number of cleaned tiles of each trial. The rooms
+    are empty, or all follow the same FloorPlan.
+    """
+    def __init__(self, width, height, num_trials=1, plan=None):
+        self.width = width
+        self.height = height
+        self.plan = plan
+        self.cleaned = numpy.zeros((num_trials, width * height), dtype=bool)
+        self.num_cleaned = numpy.zeros(num_trials, dtype=int)
+
+    def getNumTiles(self):
+        if self.plan is not None:
+            return self.plan.getNumTiles()
+        return self.width * self.height
+
+    def getNumCleanedTiles(self):
+        """
+        returns: numpy array with the number of cleaned tiles of each trial
+        """
+        return self.num_cleaned
+
+    def cleanTilesAt(self, trials, x, y):
+        """
+        Marks the tiles under the positions (x, y) as cleaned.
+
+        trials: numpy array, row of the trial of each position
+        x, y: numpy arrays of coordinates inside the room
+        """
+        tiles = self.width * self.height
+        indices = trials * tiles + numpy.floor(x).astype(int) * self.height + numpy.floor(y).astype(int)
+        cleaned = self.cleaned.reshape(-1)
+        dirty = indices[~cleaned[indices]]
+        if len(dirty):
+            # Several robots can land on the same dirty tile
+            dirty = numpy.unique(dirty)
+            cleaned[dirty] = True
+            self.num_cleaned += numpy.bincount(dirty // tiles, minlength=len(self.num_cleaned))
+
+    def keep(self, trials):
+        """
+        Drops the rows of the trials that are over.
+
+        trials: numpy boolean array, True for the trials to keep
+        """
+        self.cleaned = self.cleaned[trials]
+        self.num_cleaned = self.num_cleaned[trials]
+
+
+class RobotBatch(object):
+    """
+    Positions and directions of the robots of a batch of trials, in arrays
+    with one row per trial and one column per robot.
+    """
+    def __init__(self, room, num_robots, speed, strategy, rng, sweep=False):
+        """
+        Places num_robots robots per trial at random positions (integer
+        coordinates of a free tile, like RectangularRoom.getRandomPosition)
+        with random directions and cleans the tiles they are on.
+
+        room: a BatchRoom
+        num_robots: an int (num_robots > 0)
+        speed: a float (speed > 0)
+        strategy: a key of STRATEGIES
+        rng: numpy.random.RandomState
+        sweep: False to clean only the tile a robot lands on, True to clean
+               every tile crossed during the time-step and to let robots
+               that would hit a wall move up to it (see Robot.moveAndClean)
+        """
+        shape = (len(room.getNumCleanedTiles()), num_robots)
+        self.room = room
+        self.speed = speed
+        self.sweep = sweep
+        self.turn = STRATEGIES[strategy]
+        self.rng = rng
+        if room.plan is None:
+            self.x = rng.randint(room.width, size=shape).astype(float)
+            self.y = rng.randint(room.height, size=shape).astype(float)
+        else:
+            tiles = room.plan.free_tiles[rng.randint(room.plan.getNumTiles(), size=shape)]
+            self.x = (tiles // room.height).astype(float)
+            self.y = (tiles % room.height).astype(float)
+        self.directions = rng.randint(360, size=shape).astype(float)
+        self.state = numpy.zeros(shape, dtype=int)
+        trials = numpy.repeat(numpy.arange(shape[0]), num_robots)
+        room.cleanTilesAt(trials, self.x.reshape(-1), self.y.reshape(-1))
+
+    def update(self):
+        """
+        Simulates a single time-step for every robot: robots whose move stays
+        inside the room (and off the obstacles of its FloorPlan) move and
+        clean their tile, then the strategy updates the directions.
+        """
+        plan = self.room.plan
+        angles = numpy.radians(self.directions)
+        new_x = self.x + self.speed * numpy.sin(angles)
+        new_y = self.y + self.speed * numpy.cos(angles)
+        if plan is None:
+            inside_x = (new_x >= 0) & (new_x < self.room.width)
+            inside_y = (new_y >= 0) & (new_y < self.room.height)
+            inside = inside_x & inside_y
+            walls = WALL_X * ~inside_x + WALL_Y * ~inside_y
+        else:
+            inside = plan.movesInRoom(self.x, self.y, new_x, new_y, self.speed)
+            walls = numpy.zeros(inside.shape, dtype=int)
+            blocked = ~inside
+            if blocked.any():
+                walls[blocked] = plan.wallsHit(self.x[blocked], self.y[blocked], new_x[blocked],
+                                               new_y[blocked], self.speed)
+        if self.sweep:
+            if plan is None:
+                new_x, new_y = wallHits(self.x, self.y, new_x, new_y, self.room.width, self.room.height)
+            else:
+                new_x[blocked], new_y[blocked] = plan.obstacleHits(self.x[blocked], self.y[blocked],
+                                                                   new_x[blocked], new_y[blocked])
+            segments, tile_x, tile_y, _ = crossedTiles(self.x.reshape(-1), self.y.reshape(-1),
+                                                       new_x.reshape(-1), new_y.reshape(-1))
+            if plan is not None:
+                # Moves clipped on an obstacle corner may graze a blocked tile
+                free = plan.contains(tile_x, tile_y)
+                segments, tile_x, tile_y = segments[free], tile_x[free], tile_y[free]
+            self.room.cleanTilesAt(segments // self.x.shape[1], tile_x, tile_y)
+            self.x = new_x
+            self.y = new_y
+        else:
+            self.x[inside] = new_x[inside]
+            self.y[inside] = new_y[inside]
+            self.room.cleanTilesAt(numpy.nonzero(inside)[0], self.x[inside], self.y[inside])
+        self.directions = self.turn(self.directions, self.state, ~inside, walls, self.rng, self.probe)
+
+    def probe(self, robots, headings):
+        """
+        Tells which of the robots ROBOTS could move one time-step along
+        HEADINGS, see the probe argument of the strategy kernels.
+
+        robots: numpy boolean array of the shape of the batch
+        headings: numpy array of directions in degrees, one per selected robot
+        returns: numpy boolean array, True for the moves that stay in the room
+        """
+        x, y = self.x[robots], self.y[robots]
+        angles = numpy.radians(headings)
+        new_x = x + self.speed * numpy.sin(angles)
+        new_y = y + self.speed * numpy.cos(angles)
+        if self.room.plan is None:
+            return (new_x >= 0) & (new_x < self.room.width) & (new_y >= 0) & (new_y < self.room.height)
+        return self.room.plan.movesInRoom(x, y, new_x, new_y, self.speed)
+
+    def keep(self, trials):
+        """
+        Drops the robots of the trials that are over.
+
+        trials: numpy boolean array, True for the trials to keep
+        """
+        self.x = self.x[trials]
+        self.y = self.y[trials]
+        self.directions = self.directions[trials]
+        self.state = self.state[trials]
+
+
+# Default cap of the number of time-steps of a trial, per tile of the room
+MAX_STEPS_PER_TILE = 1000
+
+
+def stepLimit(min_coverage, num_tiles, max_steps=None):
+    """
+    Checks that the fraction MIN_COVERAGE of a room can be cleaned, and
+    returns the number of time-steps after which a trial that did not clean
+    it is given up. Only the tiles robots can reach count in NUM_TILES (the
+    free tiles of a FloorPlan), so any coverage up to 1 can be reached.
+
+    min_coverage: a float (0 <= min_coverage <= 1.0)
+    num_tiles: an int, number of tiles of the room
+    max_steps: an int, or None for MAX_STEPS_PER_TILE time-steps per tile
+    returns: an int
+    """
+    if not 0 <= min_coverage <= 1:
+        raise ValueError("min_coverage must be between 0 and 1, not %r" % (min_coverage,))
+    if not num_tiles:
+        raise ValueError("the room has no free tile to clean")
+    if max_steps is None:
+        max_steps = MAX_STEPS_PER_TILE * num_tiles
+    return max_steps
+
+
+def runTrials(num_robots, speed, width, height, min_coverage, num_trials, strategy, rng,
+              sweep=False, plan=None, max_steps=None):
+    """
+    Runs NUM_TRIALS trials stacked in the same arrays and returns the number
+    of time-steps each of them needed to clean the fraction MIN_COVERAGE of
+    the room. Trials are retired as soon as they reach the target coverage.
+
+    strategy: a key of STRATEGIES
+    rng: numpy.random.RandomState
+    sweep: True to clean every tile crossed by the robots, see RobotBatch
+    plan: a FloorPlan of the room, or None for an empty room
+    max_steps: an int, or None for a cap depending on the size of the room,
+               see stepLimit. A RuntimeError is raised when trials did not
+               reach the target coverage after that many time-steps, since
+               some strategies never clean some rooms
+    returns: numpy array with the number of time-steps of each trial
+    """
+    room = BatchRoom(width, height, num_trials, plan)
+    max_steps = stepLimit(min_coverage, room.getNumTiles(), max_steps)
+    robots = RobotBatch(room, num_robots, speed, strategy, rng, sweep)
+    needed = min_coverage * room.getNumTiles()
+    steps = numpy.zeros(num_trials, dtype=int)
+    active = numpy.arange(num_trials)
+    step = 0
+    while True:
+        done = room.getNumCleanedTiles() >= needed
+        if done.any():
+            steps[active[done]] = step
+            running = ~done
+            active = active[running]
+            room.keep(running)
+            robots.keep(running)
+            if not len(active):
+                return steps
+        if step >= max_steps:
+            raise RuntimeError("%d of %d trials did not clean %g of the room in %d time-steps"
+                               % (len(active), num_trials, min_coverage, max_steps))
+        robots.update()
+        step += 1
+
+
+def runTrial(num_robots, speed, width, height, min_coverage, strategy, rng, sweep=False,
+             plan=None, max_steps=None):
+    """
+    Runs a single trial and returns the number of time-steps needed to clean
+    the fraction MIN_COVERAGE of the room.
+    """
+    return runTrials(num_robots, speed, width, height, min_coverage, 1, strategy, rng, sweep,
+                     plan, max_steps)[0]
+
+
+def _runBatch(args):
+    """
+    Runs a batch of trials seeded with its own seed, in a worker process.
+
+    args: tuple (seed, arguments of runTrials before rng, sweep, plan, max_steps)
+    """
+    seed, trial_args, sweep, plan, max_steps = args
+    return runTrials(*(trial_args + (numpy.random.RandomState(seed), sweep, plan, max_steps)))
+
+
+def runSimulation(num_robots, speed, width, height, min_coverage, num_trials,
+                  strategy, seed=None, batch_size=None, max_workers=1, sweep=False,
+                  plan=None, max_steps=None):
+    """
+    Batched counterpart of ps2.runSimulation: runs NUM_TRIALS trials and
+    returns the mean number of time-steps needed to clean the fraction
+    MIN_COVERAGE of the room.
+
+    The trials are split in batches of BATCH_SIZE trials, each simulated in
+    one set of stacked arrays with its own seed. Batches run in MAX_WORKERS
+    processes; the result only depends on the seed and the batch size.
+
+    strategy: a key of STRATEGIES, see registerStrategy
+    seed: an int or None, seed of the trials
+    batch_size: an int or None to simulate all the trials in a single batch
+    max_workers: an int, number of processes running the batches, or None for
+                 one per CPU
+    sweep: True to clean every tile crossed by the robots, see RobotBatch
+    plan: a FloorPlan of the room, or None for an empty room
+    max_steps: an int or None, cap of the time-steps of a trial, see runTrials
+    """
+    batch_size = batch_size or num_trials
+    sizes = [min(batch_size, num_trials - start) for start in range(0, num_trials, batch_size)]
+    seeds = numpy.random.RandomState(seed).randint(2 ** 31 - 1, size=len(sizes))
+    batches = [(int(batch_seed), (num_robots, speed, width, height, min_coverage, size, strategy), sweep,
+                plan, max_steps)
+               for batch_seed, size in zip(seeds, sizes)]
+
+    if max_workers == 1 or len(batches) == 1:
+        results = [_runBatch(batch) for batch in batches]
+    else:
+        pool = multiprocessing.Pool(max_workers)
+        try:
+            results = pool.map(_runBatch, batches)
+        finally:
+            pool.close()
+            pool.join()
+    return float(sum(result.sum() for result in results)) / num_trials
+
+
+def runAdaptive(num_robots, speed, width, height, min_coverage, strategy,
+                precision=0.02, z=1.96, batch_size=50, max_trials=100000,
+                quantiles=(0.05, 0.25, 0.5, 0.75, 0.95), seed=None, sweep=False, plan=None,
+                max_steps=None):
+    """
+    Runs trials in batches until the confidence interval of the mean number
+    of time-steps needed to clean the fraction MIN_COVERAGE of the room is
+    narrow enough: its half-width must be at most PRECISION times the mean.
+    Easy configurations stop after a few batches, noisy ones run more.
+
+    precision: a float, target half-width of the interval relative to the mean
+    z: a float, number of standard errors of the interval, 1.96 for 95%
+    batch_size: an int, number of trials simulated between two checks
+    max_trials: an int, trials are stopped after this many even if the
+                interval is still too wide
+    quantiles: tuple of floats between 0 and 1, quantiles of the number of
+               time-steps to report
+    seed: an int or None, seed of the trials
+    sweep: True to clean every tile crossed by the robots, see RobotBatch
+    plan: a FloorPlan of the room, or None for an empty room
+    max_steps: an int or None, cap of the time-steps of a trial, see runTrials
+    returns: a dict with the 'mean', the 'half_width' of the interval, the
+             'num_trials' run, the 'quantiles' (dict quantile -> value) and
+             the 'steps' of every trial
+    """
+    rng = numpy.random.RandomState(seed)
+    batches = []
+    num_trials = 0
+    while True:
+        size = min(batch_size, max_trials - num_trials)
+        batches.append(runTrials(num_robots, speed, width, height, min_coverage, size,
+                                 strategy, rng, sweep, plan, max_steps))
+        num_trials += size
+        steps = numpy.concatenate(batches)
+        mean = steps.mean()
+        half_width = z * steps.std(ddof=1) / numpy.sqrt(num_trials) if num_trials > 1 else numpy.inf
+        if half_width <= precision * mean or num_trials >= max_trials:
+            break
+
+    return {'mean': mean,
+            'half_width': half_width,
+            'num_trials': num_trials,
+            'quantiles': dict((q, numpy.percentile(steps, 100 * q)) for q in quantiles),
+            'steps': steps}
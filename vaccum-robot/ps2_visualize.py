@@ -2,22 +2,152 @@
 # Visualization code for simulated robots.
 #
 # See the problem set for instructions on how to use this code.
+#
+# The visualization only redraws what changed between two frames: the tiles
+# cleaned since the previous frame (see RectangularRoom.popCleanedTiles) and
+# the robots that moved. With a target frame rate, updates arriving faster
+# than it are folded into the next frame instead of slowing the simulation
+# down. Frames can also be recorded as an image sequence, with or without a
+# window.
 
 import math
+import os
 import time
 
-from Tkinter import *
+try:
+    from Tkinter import *
+except ImportError:
+    # Python 3, for the recorder and the tests
+    from tkinter import *
+
+# Colors of the recorded frames, as RGB bytes
+DIRTY = bytearray([128, 128, 128])
+CLEAN = bytearray([255, 255, 255])
+BLOCKED = bytearray([40, 40, 40])
+LINE = bytearray([0, 0, 0])
+ROBOT = bytearray([255, 0, 0])
+
+
+class FrameRecorder:
+    """
+    Draws the room in an RGB pixel buffer, without Tk, and writes frames as
+    binary PPM files. Tiles are painted once when they change; the robots are
+    drawn on a copy of the buffer for each frame.
+    """
+    def __init__(self, width, height, path, tile_size=None):
+        "Initializes a recorder writing frame-NNNNNN.ppm files in the directory PATH."
+        self.width = width
+        self.height = height
+        self.path = path
+        self.tile_size = tile_size or max(1, 450 // max(width, height))
+        self.num_frames = 0
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        # Gridlines are the first row and column of pixels of each tile, when
+        # tiles are large enough to show them
+        self.border = 1 if self.tile_size >= 4 else 0
+        self.pixel_width = width * self.tile_size
+        self.pixel_height = height * self.tile_size
+        self.pixels = LINE * (self.pixel_width * self.pixel_height)
+        for i in range(width):
+            for j in range(height):
+                self.paintTile(i, j, DIRTY)
+
+    def paintTile(self, i, j, color):
+        "Fills the tile (i, j) with COLOR."
+        size = self.tile_size
+        left = i * size + self.border
+        row = color * (size - self.border)
+        # Rows of pixels go from the top of the room down
+        top = (self.height - 1 - j) * size + self.border
+        for y in range(top, top + size - self.border):
+            start = 3 * (y * self.pixel_width + left)
+            self.pixels[start:start + len(row)] = row
+
+    def _pixel(self, x, y):
+        "Maps a room position to the pixel under it."
+        return int(x * self.tile_size), int((self.height - y) * self.tile_size)
+
+    def _setPixel(self, pixels, px, py, color):
+        "Sets the pixel (px, py) of PIXELS to COLOR, if it is in the image."
+        if 0 <= px < self.pixel_width and 0 <= py < self.pixel_height:
+            start = 3 * (py * self.pixel_width + px)
+            pixels[start:start + 3] = color
+
+    def write(self, poses):
+        """
+        Writes a frame with the robots at POSES, a list of (x, y, direction)
+        tuples, and returns its file name.
+        """
+        pixels = bytearray(self.pixels)
+        radius = max(1, self.tile_size // 5)
+        for x, y, direction in poses:
+            px, py = self._pixel(x, y)
+            for dy in range(-radius, radius + 1):
+                for dx in range(-radius, radius + 1):
+                    self._setPixel(pixels, px + dx, py + dy, ROBOT)
+            # Heading: a line of 0.6 tile in the direction of the robot
+            for k in range(1, int(0.6 * self.tile_size) + 1):
+                step = float(k) / self.tile_size
+                hx, hy = self._pixel(x + step * math.sin(math.radians(direction)),
+                                     y + step * math.cos(math.radians(direction)))
+                self._setPixel(pixels, hx, hy, LINE)
+
+        name = os.path.join(self.path, "frame-%06d.ppm" % self.num_frames)
+        f = open(name, "wb")
+        try:
+            f.write(bytearray("P6\n%d %d\n255\n" % (self.pixel_width, self.pixel_height), "ascii"))
+            f.write(pixels)
+        finally:
+            f.close()
+        self.num_frames += 1
+        return name
+
 
 class RobotVisualization:
-    def __init__(self, num_robots, width, height, delay = 0.2):
-        "Initializes a visualization with the specified parameters."
+    def __init__(self, num_robots, width, height, delay = 0.2, fps = None,
+                 record_to = None, show = True):
+        """
+        Initializes a visualization with the specified parameters.
+
+        delay: seconds to pause after each frame, when fps is None
+        fps: None to draw every update, or a target number of frames per
+             second: updates arriving faster are folded into the next frame
+             and nothing pauses
+        record_to: None, or a directory where each frame is written as a PPM
+                   image (see FrameRecorder)
+        show: False to record frames without opening a window
+        """
         # Number of seconds to pause after each frame
         self.delay = delay
+        self.fps = fps
 
         self.max_dim = max(width, height)
         self.width = width
         self.height = height
         self.num_robots = num_robots
+        self.num_tiles = width * height
+
+        # State not drawn yet: tiles cleaned, and the latest robot poses
+        self.pending = set()
+        self.poses = []
+        self.num_cleaned = 0
+        self.next_frame = 0
+        self.num_skipped = 0
+        self.cleaned = set()
+        self.obstacles_drawn = False
+
+        self.recorder = None
+        if record_to is not None:
+            self.recorder = FrameRecorder(width, height, record_to)
+
+        self.master = None
+        self.robots = None
+        self.drawn_poses = []
+        self.time = 0
+        if not show:
+            return
 
         # Initialize a drawing surface
         self.master = Tk()
@@ -50,15 +180,13 @@ class RobotVisualization:
             self.w.create_line(x1, y1, x2, y2)
 
         # Draw some status text
-        self.robots = None
         self.text = self.w.create_text(25, 0, anchor=NW,
                                        text=self._status_string(0, 0))
-        self.time = 0
         self.master.update()
 
     def _status_string(self, time, num_clean_tiles):
         "Returns an appropriate status string to print."
-        percent_clean = 100 * num_clean_tiles / (self.width * self.height)
+        percent_clean = 100 * num_clean_tiles / self.num_tiles
         return "Time: %04d; %d tiles (%d%%) cleaned" % \
             (time, num_clean_tiles, percent_clean)
 
@@ -67,9 +195,8 @@ class RobotVisualization:
         return (250 + 450 * ((x - self.width / 2.0) / self.max_dim),
                 250 + 450 * ((self.height / 2.0 - y) / self.max_dim))
 
-    def _draw_robot(self, position, direction):
-        "Returns a polygon representing a robot with the specified parameters."
-        x, y = position.getX(), position.getY()
+    def _robot_coords(self, x, y, direction):
+        "Returns the coordinates of the dot and of the triangle of a robot."
         d1 = direction + 165
         d2 = direction - 165
         x1, y1 = self._map_coords(x, y)
@@ -77,41 +204,99 @@ class RobotVisualization:
                                   y + 0.6 * math.cos(math.radians(d1)))
         x3, y3 = self._map_coords(x + 0.6 * math.sin(math.radians(d2)),
                                   y + 0.6 * math.cos(math.radians(d2)))
-        return self.w.create_polygon([x1, y1, x2, y2, x3, y3], fill="red")
+        dot = self._map_coords(x - 0.08, y - 0.08) + self._map_coords(x + 0.08, y + 0.08)
+        return dot, [x1, y1, x2, y2, x3, y3]
 
-    def update(self, room, robots):
-        "Redraws the visualization with the specified room and robot state."
-        # Removes a gray square for any tiles have been cleaned.
+    def _draw_obstacles(self, room):
+        "Draws the blocked tiles of a room with obstacles (see FurnishedRoom)."
+        self.obstacles_drawn = True
+        if not hasattr(room, "isTileFree"):
+            return
         for i in range(self.width):
             for j in range(self.height):
-                if room.isTileCleaned(i, j):
-                    self.w.delete(self.tiles[(i, j)])
-        # Delete all existing robots.
-        if self.robots:
-            for robot in self.robots:
-                self.w.delete(robot)
-                self.master.update_idletasks()
-        # Draw new robots
-        self.robots = []
+                if room.isTileFree(i, j):
+                    continue
+                if self.master is not None:
+                    self.w.itemconfig(self.tiles[(i, j)], fill = "black")
+                if self.recorder is not None:
+                    self.recorder.paintTile(i, j, BLOCKED)
+
+    def update(self, room, robots):
+        "Redraws the visualization with the specified room and robot state."
+        if not self.obstacles_drawn:
+            self._draw_obstacles(room)
+        if hasattr(room, "popCleanedTiles"):
+            tiles = room.popCleanedTiles()
+        else:
+            tiles = [(i, j) for i in range(self.width) for j in range(self.height)
+                     if (i, j) not in self.cleaned and room.isTileCleaned(i, j)]
+            self.cleaned.update(tiles)
+        poses = []
         for robot in robots:
             pos = robot.getRobotPosition()
-            x, y = pos.getX(), pos.getY()
-            x1, y1 = self._map_coords(x - 0.08, y - 0.08)
-            x2, y2 = self._map_coords(x + 0.08, y + 0.08)
-            self.robots.append(self.w.create_oval(x1, y1, x2, y2,
-                                                  fill = "black"))
-            self.robots.append(
-                self._draw_robot(robot.getRobotPosition(), robot.getRobotDirection()))
-        # Update text
-        self.w.delete(self.text)
+            poses.append((pos.getX(), pos.getY(), robot.getRobotDirection()))
+        self.num_tiles = room.getNumTiles()
+        self.draw(tiles, poses, room.getNumCleanedTiles())
+
+    def draw(self, tiles, poses, num_cleaned):
+        """
+        Advances the visualization by one time-step.
+
+        tiles: list of (i, j) tiles cleaned since the previous call
+        poses: list of (x, y, direction) tuples, one per robot
+        num_cleaned: total number of cleaned tiles
+        """
         self.time += 1
-        self.text = self.w.create_text(
-            25, 0, anchor=NW,
-            text=self._status_string(self.time, room.getNumCleanedTiles()))
-        self.master.update()
-        time.sleep(self.delay)
+        self.pending.update(tiles)
+        self.poses = poses
+        self.num_cleaned = num_cleaned
+        if self.fps is not None:
+            now = time.time()
+            if now < self.next_frame:
+                self.num_skipped += 1
+                return
+            self.next_frame = now + 1.0 / self.fps
+        self._render()
+        if self.fps is None and self.master is not None:
+            time.sleep(self.delay)
+
+    def _render(self):
+        "Draws the pending tiles and the robots that moved."
+        if self.master is not None:
+            # Removes a gray square for any tiles have been cleaned.
+            for tile in self.pending:
+                self.w.delete(self.tiles.pop(tile))
+            if self.robots is None or len(self.poses) != len(self.drawn_poses):
+                # Draw the robots
+                for item in self.robots or []:
+                    self.w.delete(item)
+                self.robots = []
+                for x, y, direction in self.poses:
+                    dot, triangle = self._robot_coords(x, y, direction)
+                    self.robots.append(self.w.create_oval(*dot, fill = "black"))
+                    self.robots.append(self.w.create_polygon(triangle, fill = "red"))
+            else:
+                # Move the robots whose pose changed
+                for k, pose in enumerate(self.poses):
+                    if pose != self.drawn_poses[k]:
+                        dot, triangle = self._robot_coords(*pose)
+                        self.w.coords(self.robots[2 * k], *dot)
+                        self.w.coords(self.robots[2 * k + 1], *triangle)
+            # Update text
+            self.w.itemconfig(self.text, text=self._status_string(self.time, self.num_cleaned))
+            self.master.update()
+
+        if self.recorder is not None:
+            for i, j in self.pending:
+                self.recorder.paintTile(i, j, CLEAN)
+            self.recorder.write(self.poses)
+        self.pending = set()
+        self.drawn_poses = list(self.poses)
 
     def done(self):
         "Indicate that the animation is done so that we allow the user to close the window."
-        mainloop()
-
+        # Draw the last state, which frame skipping may have left out
+        if self.pending or self.poses != self.drawn_poses:
+            self._render()
+        if self.master is not None:
+            mainloop()
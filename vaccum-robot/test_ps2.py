@@ -0,0 +1,197 @@
+# Problem Set 2:
+# Tests of the rooms and robots of ps2.py. Like ps2.py they need Python 2.7,
+# pylab and the ps2_verify_movement27 module of the problem set.
+
+import random
+import unittest
+
+import numpy
+
+import ps2_batch
+from ps2 import (BoustrophedonRobot, FurnishedRoom, KernelRobot, Position, RandomWalkRobot, RectangularRoom, SpiralRobot,
+                 StandardRobot, WallFollowRobot, runSimulation)
+
+
+class RectangularRoomTestCase(unittest.TestCase):
+
+    def test_clean_tiles(self):
+        room = RectangularRoom(5, 3)
+        self.assertEqual(room.getNumTiles(), 15)
+        self.assertEqual(room.getNumCleanedTiles(), 0)
+        room.cleanTileAtPosition(Position(4.9, 2.1))
+        room.cleanTileAtPosition(Position(4.2, 2.9))
+        room.cleanTileAtPosition(Position(0.0, 0.5))
+        self.assertTrue(room.isTileCleaned(4, 2))
+        self.assertTrue(room.isTileCleaned(0, 0))
+        self.assertFalse(room.isTileCleaned(2, 0))
+        self.assertEqual(room.getNumCleanedTiles(), 2)
+        self.assertAlmostEqual(room.getCoverage(), 2 / 15.0)
+
+    def test_pop_cleaned_tiles(self):
+        room = RectangularRoom(4, 4)
+        room.cleanTile(1, 2)
+        room.cleanTile(3, 0)
+        room.cleanTile(1, 2)
+        self.assertEqual(room.popCleanedTiles(), [(1, 2), (3, 0)])
+        self.assertEqual(room.popCleanedTiles(), [])
+
+    def test_no_log_without_visualization(self):
+        random.seed(10)
+        room = RectangularRoom(6, 6)
+        robot = StandardRobot(room, 1.0)
+        for _ in range(50):
+            robot.updatePositionAndClean()
+        self.assertIsNone(room.new_tiles)
+        self.assertEqual(len(room.popCleanedTiles()), room.getNumCleanedTiles())
+        self.assertEqual(room.popCleanedTiles(), [])
+
+    def test_positions(self):
+        room = RectangularRoom(3, 2)
+        self.assertTrue(room.isPositionInRoom(Position(0, 0)))
+        self.assertTrue(room.isPositionInRoom(Position(2.99, 1.99)))
+        self.assertFalse(room.isPositionInRoom(Position(3, 1)))
+        self.assertFalse(room.isPositionInRoom(Position(1, -0.01)))
+        for _ in range(100):
+            pos = room.getRandomPosition()
+            self.assertTrue(room.isPositionInRoom(pos))
+
+    def test_clean_segment(self):
+        room = RectangularRoom(6, 6)
+        room.cleanSegment(Position(0.5, 0.5), Position(3.5, 2.0))
+        self.assertEqual(sorted(room.popCleanedTiles()), [(0, 0), (1, 0), (1, 1), (2, 1), (3, 1), (3, 2)])
+        # Through a corner the segment goes straight to the diagonal tile
+        room.cleanSegment(Position(4.5, 4.5), Position(5.5, 5.5))
+        self.assertEqual(room.popCleanedTiles(), [(4, 4), (5, 5)])
+
+    def test_crossed_tiles_match_batch_engine(self):
+        random.seed(4)
+        room = RectangularRoom(10, 10)
+        for _ in range(200):
+            start = Position(random.uniform(0, 10), random.uniform(0, 10))
+            end = start.getNewPosition(random.uniform(0, 360), random.uniform(0, 5))
+            segments, x, y, starts = ps2_batch.crossedTiles(*[numpy.array([value]) for value in (
+                start.getX(), start.getY(), end.getX(), end.getY())])
+            batch = list(zip(numpy.floor(x).astype(int), numpy.floor(y).astype(int)))
+            self.assertEqual([(m, n) for _, m, n in room.crossedTiles(start, end)], batch)
+
+    def test_wall_hit_position(self):
+        room = RectangularRoom(4, 3)
+        hit = room.wallHitPosition(Position(1.0, 1.0), Position(7.0, 4.0))
+        self.assertTrue(room.isPositionInRoom(hit))
+        self.assertAlmostEqual(hit.getX(), 4.0)
+        self.assertAlmostEqual(hit.getY(), 2.5)
+        end = room.wallHitPosition(Position(1.0, 1.0), Position(2.0, 2.5))
+        self.assertEqual((end.getX(), end.getY()), (2.0, 2.5))
+
+
+class FurnishedRoomTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.plan = ps2_batch.FloorPlan(8, 6, blocked=[(5, n) for n in range(6)],
+                                        polygons=[[(1, 1), (3, 1), (3, 2), (1, 2)]])
+
+    def test_free_tiles(self):
+        random.seed(7)
+        room = FurnishedRoom(self.plan)
+        # The column of obstacles cuts off the 2 x 6 tiles behind it, the polygon covers 2 tiles
+        self.assertEqual(room.getNumTiles(), 5 * 6 - 2)
+        self.assertFalse(room.isTileFree(1, 1))
+        self.assertFalse(room.isTileFree(6, 3))
+        self.assertTrue(room.isTileFree(0, 0))
+        for _ in range(100):
+            self.assertTrue(room.isPositionInRoom(room.getRandomPosition()))
+
+    def test_moves_match_floor_plan(self):
+        random.seed(8)
+        room = FurnishedRoom(self.plan)
+        for length in (0.5, 1.0, 2.5):
+            for _ in range(300):
+                start = room.getRandomPosition()
+                start = Position(start.getX() + random.random(), start.getY() + random.random())
+                end = start.getNewPosition(random.uniform(0, 360), length)
+                expected = self.plan.movesInRoom(*[numpy.array([value]) for value in (
+                    start.getX(), start.getY(), end.getX(), end.getY())] + [length])[0]
+                self.assertEqual(room.isMoveInRoom(start, end), expected)
+                if not expected:
+                    self.assertTrue(room.isPositionInRoom(room.wallHitPosition(start, end)))
+
+    def test_run_simulation(self):
+        random.seed(9)
+        for engine in ('object', 'batch'):
+            steps = runSimulation(2, 1.0, 8, 6, 0.8, 5, StandardRobot, engine=engine,
+                                  blocked=[(5, n) for n in range(6)])
+            self.assertTrue(0 < steps < 500)
+
+
+class RobotTestCase(unittest.TestCase):
+
+    def test_robots_stay_in_the_room(self):
+        random.seed(1)
+        for robot_type in (StandardRobot, RandomWalkRobot):
+            room = RectangularRoom(4, 3)
+            robot = robot_type(room, 1.5)
+            self.assertEqual(room.getNumCleanedTiles(), 1)
+            for _ in range(200):
+                robot.updatePositionAndClean()
+                self.assertTrue(room.isPositionInRoom(robot.getRobotPosition()))
+                self.assertTrue(0 <= robot.getRobotDirection() < 360)
+            self.assertEqual(room.getNumCleanedTiles(), 12)
+
+    def test_standard_robot_turns_at_walls(self):
+        random.seed(3)
+        room = RectangularRoom(5, 5)
+        robot = StandardRobot(room, 1.0)
+        robot.setRobotPosition(Position(2.5, 4.5))
+        robot.setRobotDirection(0)
+        robot.updatePositionAndClean()
+        self.assertEqual(robot.getRobotPosition().getY(), 4.5)
+        self.assertNotEqual(robot.getRobotDirection(), 0)
+
+    def test_run_simulation(self):
+        random.seed(2)
+        # A single tile is clean as soon as the robot is placed
+        self.assertEqual(runSimulation(1, 1.0, 1, 1, 1.0, 3, StandardRobot), 0)
+        for engine in ('object', 'batch'):
+            steps = runSimulation(2, 1.0, 5, 5, 0.9, 20, StandardRobot, engine=engine)
+            self.assertTrue(5 < steps < 200)
+
+    def test_batch_engine_seed(self):
+        results = [runSimulation(2, 1.0, 5, 5, 0.9, 20, StandardRobot, engine='batch', seed=4,
+                                 batch_size=8, max_workers=workers) for workers in (1, 2, None)]
+        self.assertEqual(results, [results[0]] * 3)
+
+    def test_max_steps(self):
+        random.seed(12)
+        for engine in ('object', 'batch'):
+            self.assertRaises(RuntimeError, runSimulation, 1, 1.0, 8, 8, 1.0, 3, StandardRobot, engine=engine,
+                              max_steps=3)
+            self.assertRaises(ValueError, runSimulation, 1, 1.0, 8, 8, 1.5, 3, StandardRobot, engine=engine)
+
+
+class KernelRobotTestCase(unittest.TestCase):
+
+    def test_robots_reach_coverage(self):
+        random.seed(5)
+        for robot_type in (StandardRobot, RandomWalkRobot, SpiralRobot, WallFollowRobot, BoustrophedonRobot):
+            self.assertTrue(issubclass(robot_type, KernelRobot))
+            self.assertIs(robot_type(RectangularRoom(2, 2), 1.0).turn, ps2_batch.STRATEGIES[robot_type.strategy])
+            self.assertGreater(runSimulation(1, 1.0, 5, 5, 0.8, 3, robot_type), 0)
+
+    def test_wall_follow_robot_turns_along_the_wall_hit(self):
+        random.seed(6)
+        room = RectangularRoom(5, 5)
+        robot = WallFollowRobot(room, 1.0)
+        robot.setRobotPosition(Position(2.5, 4.5))
+        robot.setRobotDirection(45)
+        robot.updatePositionAndClean()
+        self.assertEqual(robot.getRobotDirection(), ps2_batch.EAST)
+        self.assertEqual(list(robot.state), [1])
+
+    def test_wall_follow_robot_reaches_pockets(self):
+        random.seed(11)
+        steps = runSimulation(1, 1.0, 7, 6, 1.0, 5, WallFollowRobot, blocked=[(3, n) for n in range(4)])
+        self.assertGreater(steps, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,323 @@
+# Problem Set 2:
+# Tests of the batched simulation engine of ps2_batch.py.
+
+import unittest
+
+import numpy
+
+import ps2_batch
+
+
+class BatchEngineTestCase(unittest.TestCase):
+
+    def test_clean_tiles(self):
+        room = ps2_batch.BatchRoom(3, 2, num_trials=2)
+        self.assertEqual(room.getNumTiles(), 6)
+        room.cleanTilesAt(numpy.array([0, 0, 1, 0]), numpy.array([0.5, 0.7, 0.5, 2.9]),
+                          numpy.array([1.5, 1.2, 1.5, 0.0]))
+        self.assertEqual(list(room.getNumCleanedTiles()), [2, 1])
+        self.assertTrue(room.cleaned[0, 0 * 2 + 1] and room.cleaned[0, 2 * 2 + 0])
+        room.keep(numpy.array([False, True]))
+        self.assertEqual(list(room.getNumCleanedTiles()), [1])
+
+    def test_robots_stay_in_the_room(self):
+        rng = numpy.random.RandomState(1)
+        room = ps2_batch.BatchRoom(4, 3, num_trials=5)
+        robots = ps2_batch.RobotBatch(room, 3, 1.5, 'standard', rng)
+        for _ in range(200):
+            robots.update()
+            self.assertTrue(((robots.x >= 0) & (robots.x < 4) & (robots.y >= 0) & (robots.y < 3)).all())
+        self.assertEqual(list(room.getNumCleanedTiles()), [12] * 5)
+
+    def test_run_trials(self):
+        rng = numpy.random.RandomState(2)
+        self.assertEqual(list(ps2_batch.runTrials(1, 1.0, 1, 1, 1.0, 3, 'standard', rng)), [0, 0, 0])
+        steps = ps2_batch.runTrials(2, 1.0, 5, 5, 0.9, 50, 'standard', rng)
+        self.assertEqual(len(steps), 50)
+        self.assertTrue((steps > 0).all())
+        self.assertTrue(5 < steps.mean() < 200)
+
+
+class StrategyTestCase(unittest.TestCase):
+
+    def test_strategies_reach_coverage(self):
+        plan = ps2_batch.FloorPlan(8, 8, blocked=[(4, n) for n in range(6)])
+        for strategy in ps2_batch.STRATEGIES:
+            for room_plan, min_coverage in ((None, 0.9), (plan, 0.9)):
+                rng = numpy.random.RandomState(9)
+                steps = ps2_batch.runTrials(2, 1.0, 8, 8, min_coverage, 10, strategy, rng, plan=room_plan)
+                self.assertTrue((steps > 0).all(), strategy)
+
+    def test_register_strategy(self):
+        def northTurns(directions, state, blocked, walls, rng, probe):
+            state[blocked] += 1
+            return numpy.zeros(directions.shape)
+        ps2_batch.registerStrategy('north', northTurns)
+        try:
+            rng = numpy.random.RandomState(10)
+            room = ps2_batch.BatchRoom(1, 5)
+            robots = ps2_batch.RobotBatch(room, 1, 1.0, 'north', rng)
+            robots.y[:], robots.directions[:] = 0.5, 0.0
+            for _ in range(6):
+                robots.update()
+            self.assertEqual(robots.y[0, 0], 4.5)
+            self.assertEqual(robots.state[0, 0], 2)
+            self.assertTrue(room.cleaned[0, 1:].all())
+        finally:
+            del ps2_batch.STRATEGIES['north']
+
+    def test_wall_follow_turns_along_the_wall_hit(self):
+        rng = numpy.random.RandomState(11)
+        directions = numpy.array([45.0, 45.0, 45.0, 200.0, 0.0])
+        state = numpy.zeros(5, dtype=int)
+        blocked = numpy.array([True, True, True, True, False])
+        walls = numpy.array([ps2_batch.WALL_X, ps2_batch.WALL_Y, ps2_batch.WALL_X | ps2_batch.WALL_Y,
+                             ps2_batch.WALL_X, 0])
+        directions = ps2_batch.wallFollowTurns(directions, state, blocked, walls, rng, None)
+        # East wall: turn right to the south, north wall: to the east, north-east
+        # corner: along the east wall, west wall: to the north
+        self.assertEqual(list(directions), [180.0, 90.0, 180.0, 0.0, 0.0])
+        self.assertEqual(list(state), [1, 1, 1, 1, 0])
+
+    def test_wall_follow_turns_around_convex_corners(self):
+        rng = numpy.random.RandomState(13)
+        directions = numpy.array([0.0, 0.0, 90.0])
+        state = numpy.array([1, 1, 0])
+        blocked = numpy.zeros(3, dtype=bool)
+        walls = numpy.zeros(3, dtype=int)
+        probed = []
+
+        def probe(robots, headings):
+            probed.append((list(robots), list(headings)))
+            return numpy.array([True, False])
+        directions = ps2_batch.wallFollowTurns(directions, state, blocked, walls, rng, probe)
+        # Only the robots on a wall look to their left; the wall of the first
+        # one ended, so it turns around the corner
+        self.assertEqual(probed, [([True, True, False], [ps2_batch.WEST, ps2_batch.WEST])])
+        self.assertEqual(list(directions), [ps2_batch.WEST, 0.0, 90.0])
+        self.assertEqual(list(state), [2, 1, 0])
+
+    def test_wall_follow_reaches_pockets(self):
+        # The pocket on the left of the bar is only entered by going around its
+        # end, a convex corner
+        plan = ps2_batch.FloorPlan(7, 6, blocked=[(3, n) for n in range(4)])
+        for sweep in (False, True):
+            rng = numpy.random.RandomState(14)
+            steps = ps2_batch.runTrials(1, 1.0, 7, 6, 1.0, 10, 'wall_follow', rng, sweep, plan)
+            self.assertTrue((steps > 0).all())
+
+    def test_wall_follow_counts_laps(self):
+        rng = numpy.random.RandomState(12)
+        room = ps2_batch.BatchRoom(6, 4)
+        robots = ps2_batch.RobotBatch(room, 1, 1.0, 'wall_follow', rng)
+        robots.x[:], robots.y[:], robots.directions[:] = 2.5, 1.5, 30.0
+        headings = []
+        while robots.state[0, 0] < 4:
+            robots.update()
+            if robots.state[0, 0] > len(headings):
+                headings.append(robots.directions[0, 0])
+        # Four corners make a lap along the walls, then the robot leaves them
+        self.assertEqual(headings[:3], [ps2_batch.EAST, ps2_batch.SOUTH, ps2_batch.WEST])
+        cleaned = room.cleaned[0].reshape(6, 4)
+        self.assertTrue(cleaned[5, :].all() and cleaned[:, 0].all())
+
+
+class GridTraversalTestCase(unittest.TestCase):
+
+    def test_crossed_tiles_match_dense_sampling(self):
+        rng = numpy.random.RandomState(6)
+        num_segments, num_samples = 300, 4000
+        x0, y0 = rng.uniform(0, 10, num_segments), rng.uniform(0, 10, num_segments)
+        length = rng.uniform(0, 4, num_segments)
+        angles = rng.uniform(0, 2 * numpy.pi, num_segments)
+        x1, y1 = x0 + length * numpy.sin(angles), y0 + length * numpy.cos(angles)
+        # Segments along grid lines and ending on them
+        x0[:10], x1[:10] = 2.0, 2.0
+        x1[10:20] = numpy.floor(x1[10:20])
+        segments, x, y, starts = ps2_batch.crossedTiles(x0, y0, x1, y1)
+        t = numpy.linspace(0, 1, num_samples)
+        for k in range(num_segments):
+            mine = segments == k
+            tiles = list(zip(numpy.floor(x[mine]).astype(int), numpy.floor(y[mine]).astype(int)))
+            self.assertEqual(tiles[0], (int(numpy.floor(x0[k])), int(numpy.floor(y0[k]))))
+            self.assertEqual(tiles[-1], (int(numpy.floor(x1[k])), int(numpy.floor(y1[k]))))
+            self.assertTrue((numpy.diff(starts[mine]) >= 0).all())
+            # Consecutive tiles share a side or, through a corner, a vertex
+            steps = numpy.abs(numpy.diff(numpy.array(tiles), axis=0))
+            self.assertTrue((steps <= 1).all() and (steps.sum(axis=1) > 0).all())
+            sampled = set(zip(numpy.floor(x0[k] + t * (x1[k] - x0[k])).astype(int),
+                              numpy.floor(y0[k] + t * (y1[k] - y0[k])).astype(int)))
+            self.assertTrue(sampled <= set(tiles))
+            # Only pieces too short for the sampling can be missed by it
+            pieces = numpy.diff(numpy.append(starts[mine], 1.0)) * length[k]
+            long_tiles = set(tile for tile, piece in zip(tiles, pieces) if piece > 2 * length[k] / num_samples)
+            self.assertTrue(long_tiles <= sampled)
+
+    def test_wall_hits_stay_in_the_room(self):
+        rng = numpy.random.RandomState(7)
+        x0, y0 = rng.uniform(0, 5, 1000), rng.uniform(0, 3, 1000)
+        angles = rng.uniform(0, 2 * numpy.pi, 1000)
+        x1, y1 = x0 + 4 * numpy.sin(angles), y0 + 4 * numpy.cos(angles)
+        x, y = ps2_batch.wallHits(x0, y0, x1, y1, 5, 3)
+        self.assertTrue(((x >= 0) & (x < 5) & (y >= 0) & (y < 3)).all())
+        inside = (x1 >= 0) & (x1 < 5) & (y1 >= 0) & (y1 < 3)
+        numpy.testing.assert_array_equal(x[inside], x1[inside])
+        # Moves that hit a wall stop on the segment, on one of the walls
+        t = numpy.where(numpy.abs(x1 - x0) > numpy.abs(y1 - y0), (x - x0) / (x1 - x0), (y - y0) / (y1 - y0))
+        numpy.testing.assert_allclose(x0 + t * (x1 - x0), x, atol=1e-9)
+        numpy.testing.assert_allclose(y0 + t * (y1 - y0), y, atol=1e-9)
+        on_wall = numpy.minimum(numpy.minimum(x, 5 - x), numpy.minimum(y, 3 - y)) < 1e-9
+        self.assertTrue(on_wall[~inside].all())
+
+    def test_sweep_cleans_crossed_tiles(self):
+        rng = numpy.random.RandomState(8)
+        room = ps2_batch.BatchRoom(10, 1)
+        robots = ps2_batch.RobotBatch(room, 1, 4.0, 'standard', rng, sweep=True)
+        robots.x[:], robots.y[:], robots.directions[:] = 0.5, 0.5, 90.0
+        robots.update()
+        robots.update()
+        self.assertEqual(robots.x[0, 0], 8.5)
+        self.assertTrue(room.cleaned[0, :9].all())
+        robots.update()
+        # The robot stops at the wall instead of skipping the last tile
+        self.assertTrue(room.cleaned.all())
+        self.assertTrue(9 < robots.x[0, 0] < 10)
+
+
+class FloorPlanTestCase(unittest.TestCase):
+
+    def random_moves(self, plan, length, rng, num_moves=3000):
+        tiles = plan.free_tiles[rng.randint(plan.getNumTiles(), size=num_moves)]
+        x0 = tiles // plan.height + rng.uniform(0, 1, num_moves)
+        y0 = tiles % plan.height + rng.uniform(0, 1, num_moves)
+        angles = rng.uniform(0, 2 * numpy.pi, num_moves)
+        return x0, y0, x0 + length * numpy.sin(angles), y0 + length * numpy.cos(angles)
+
+    def test_largest_region(self):
+        # A wall of obstacles cuts the room in a 3 x 4 and a 1 x 4 region
+        plan = ps2_batch.FloorPlan(5, 4, blocked=[(3, n) for n in range(4)])
+        self.assertEqual(plan.getNumTiles(), 12)
+        free = plan.free.reshape(5, 4)
+        self.assertTrue(free[:3].all())
+        self.assertFalse(free[3:].any())
+        self.assertEqual(ps2_batch.BatchRoom(5, 4, plan=plan).getNumTiles(), 12)
+
+    def test_polygons(self):
+        plan = ps2_batch.FloorPlan(6, 6, polygons=[[(1, 1), (3, 1), (3, 3), (1, 3)]])
+        blocked = set(zip(*numpy.nonzero(~plan.free.reshape(6, 6))))
+        self.assertEqual(blocked, set([(1, 1), (1, 2), (2, 1), (2, 2)]))
+
+    def test_clearances(self):
+        free = numpy.ones((7, 7), dtype=bool)
+        free[3, 3] = False
+        clearance = ps2_batch.clearances(free)
+        # Only obstacles count, the walls are left to a bounds check
+        self.assertEqual(clearance[3, 3], 0)
+        self.assertEqual(clearance[2, 3], 0)
+        self.assertEqual(clearance[1, 3], 1)
+        self.assertEqual(clearance[0, 0], 2)
+        # Without obstacles the clearance covers the whole room
+        self.assertTrue((ps2_batch.clearances(numpy.ones((4, 6), dtype=bool)) == 6).all())
+
+    def test_moves_in_empty_plan(self):
+        plan = ps2_batch.FloorPlan(7, 5)
+        rng = numpy.random.RandomState(13)
+        for length in (0.5, 1.0, 3.0, 9.0):
+            x0, y0, x1, y1 = self.random_moves(plan, length, rng)
+            inside = (x1 >= 0) & (x1 < 7) & (y1 >= 0) & (y1 < 5)
+            numpy.testing.assert_array_equal(plan.movesInRoom(x0, y0, x1, y1, length), inside)
+
+    def test_moves_with_obstacles(self):
+        plan = ps2_batch.FloorPlan(12, 9, blocked=[(6, n) for n in range(7)],
+                                   polygons=[[(1, 1), (4, 1), (4, 3), (1, 3)]])
+        rng = numpy.random.RandomState(14)
+        for length in (0.5, 1.0, 2.0, 3.5):
+            x0, y0, x1, y1 = self.random_moves(plan, length, rng)
+            segments, x, y, _ = ps2_batch.crossedTiles(x0, y0, x1, y1)
+            free = numpy.bincount(segments[~plan.contains(x, y)], minlength=len(x0)) == 0
+            numpy.testing.assert_array_equal(plan.movesInRoom(x0, y0, x1, y1, length), free)
+            # Blocked moves stop on the last free tile they cross
+            hit_x, hit_y = plan.obstacleHits(x0[~free], y0[~free], x1[~free], y1[~free])
+            self.assertTrue(plan.contains(hit_x, hit_y).all())
+
+    def test_robots_stay_on_free_tiles(self):
+        plan = ps2_batch.FloorPlan(8, 8, blocked=[(4, n) for n in range(6)])
+        for sweep in (False, True):
+            rng = numpy.random.RandomState(15)
+            room = ps2_batch.BatchRoom(8, 8, 5, plan)
+            robots = ps2_batch.RobotBatch(room, 2, 1.3, 'standard', rng, sweep)
+            for _ in range(200):
+                robots.update()
+                self.assertTrue(plan.contains(robots.x.reshape(-1), robots.y.reshape(-1)).all())
+            self.assertFalse(room.cleaned[:, ~plan.free].any())
+
+
+class RunSimulationTestCase(unittest.TestCase):
+
+    def run_simulation(self, seed, batch_size, max_workers=1):
+        return ps2_batch.runSimulation(2, 1.0, 6, 6, 0.8, 30, 'standard', seed=seed,
+                                       batch_size=batch_size, max_workers=max_workers)
+
+    def test_depends_on_seed_and_batch_size(self):
+        result = self.run_simulation(3, 7)
+        self.assertEqual(self.run_simulation(3, 7), result)
+        self.assertNotEqual(self.run_simulation(4, 7), result)
+        self.assertNotEqual(self.run_simulation(3, 10), result)
+
+    def test_workers(self):
+        result = self.run_simulation(3, 7)
+        self.assertEqual(self.run_simulation(3, 7, max_workers=2), result)
+        self.assertEqual(self.run_simulation(3, 7, max_workers=None), result)
+
+    def test_retired_trials(self):
+        # Each trial records the time-step at which it reached the coverage
+        rng = numpy.random.RandomState(5)
+        steps = ps2_batch.runTrials(1, 1.0, 8, 8, 1.0, 20, 'random_walk', rng)
+        self.assertGreater(len(set(steps)), 10)
+
+    def test_max_steps(self):
+        rng = numpy.random.RandomState(6)
+        self.assertRaises(RuntimeError, ps2_batch.runTrials, 1, 1.0, 8, 8, 1.0, 5, 'standard', rng,
+                          max_steps=3)
+        self.assertRaises(RuntimeError, ps2_batch.runSimulation, 1, 1.0, 8, 8, 1.0, 4, 'standard',
+                          batch_size=2, max_workers=2, max_steps=3)
+        self.assertEqual(list(ps2_batch.runTrials(1, 1.0, 1, 1, 1.0, 2, 'standard', rng, max_steps=0)), [0, 0])
+
+    def test_unreachable_coverage(self):
+        rng = numpy.random.RandomState(7)
+        self.assertRaises(ValueError, ps2_batch.runTrials, 1, 1.0, 4, 4, 1.5, 5, 'standard', rng)
+        plan = ps2_batch.FloorPlan(2, 2, blocked=[(0, 0), (0, 1), (1, 0), (1, 1)])
+        self.assertRaises(ValueError, ps2_batch.runTrials, 1, 1.0, 2, 2, 0.5, 5, 'standard', rng,
+                          plan=plan)
+
+
+class RunAdaptiveTestCase(unittest.TestCase):
+
+    def test_stops_at_precision(self):
+        result = ps2_batch.runAdaptive(2, 1.0, 6, 6, 0.8, 'standard', precision=0.03, batch_size=20, seed=1)
+        steps = result['steps']
+        self.assertEqual(len(steps), result['num_trials'])
+        self.assertEqual(result['num_trials'] % 20, 0)
+        self.assertAlmostEqual(result['mean'], steps.mean())
+        half_width = 1.96 * steps.std(ddof=1) / numpy.sqrt(len(steps))
+        self.assertAlmostEqual(result['half_width'], half_width)
+        self.assertLessEqual(half_width, 0.03 * result['mean'])
+        # The previous batch was not precise enough
+        previous = steps[:-20]
+        self.assertGreater(1.96 * previous.std(ddof=1) / numpy.sqrt(len(previous)), 0.03 * previous.mean())
+        self.assertEqual(result['quantiles'][0.5], numpy.median(steps))
+
+    def test_max_trials(self):
+        result = ps2_batch.runAdaptive(2, 1.0, 6, 6, 0.8, 'standard', precision=0.0001, batch_size=20,
+                                       max_trials=50, seed=1)
+        self.assertEqual(result['num_trials'], 50)
+        self.assertGreater(result['half_width'], 0.0001 * result['mean'])
+
+    def test_seed(self):
+        first = ps2_batch.runAdaptive(2, 1.0, 6, 6, 0.8, 'standard', precision=0.05, seed=2)
+        second = ps2_batch.runAdaptive(2, 1.0, 6, 6, 0.8, 'standard', precision=0.05, seed=2)
+        numpy.testing.assert_array_equal(first['steps'], second['steps'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# Problem Set 2:
+# Tests of the frame recording of ps2_visualize.py, which run without a
+# window.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ps2_visualize import CLEAN, DIRTY, LINE, ROBOT, FrameRecorder, RobotVisualization
+
+
+def readFrame(name):
+    "Returns the width, height and pixels of a binary PPM file."
+    f = open(name, "rb")
+    try:
+        data = f.read()
+    finally:
+        f.close()
+    magic, size, depth, pixels = data.split(b"\n", 3)
+    assert magic == b"P6" and depth == b"255"
+    width, height = size.split()
+    return int(width), int(height), bytearray(pixels)
+
+
+def pixel(pixels, width, px, py):
+    "Returns the color of the pixel (px, py) of an image WIDTH pixels wide."
+    start = 3 * (py * width + px)
+    return pixels[start:start + 3]
+
+
+class FrameRecorderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_write(self):
+        recorder = FrameRecorder(4, 3, self.path, tile_size=10)
+        recorder.paintTile(0, 0, CLEAN)
+        name = recorder.write([(3.5, 2.5, 90)])
+        self.assertEqual(name, os.path.join(self.path, "frame-000000.ppm"))
+        width, height, pixels = readFrame(name)
+        self.assertEqual((width, height), (40, 30))
+        self.assertEqual(len(pixels), 40 * 30 * 3)
+        # Tile (0, 0) is at the bottom left, below a gridline
+        self.assertEqual(pixel(pixels, width, 5, 25), CLEAN)
+        self.assertEqual(pixel(pixels, width, 5, 20), LINE)
+        self.assertEqual(pixel(pixels, width, 15, 25), DIRTY)
+        # The robot is drawn on the frame only, facing east
+        self.assertEqual(pixel(pixels, width, 35, 5), ROBOT)
+        self.assertEqual(pixel(pixels, width, 39, 5), LINE)
+        self.assertEqual(pixel(recorder.pixels, width, 35, 5), DIRTY)
+        recorder.write([])
+        self.assertEqual(recorder.num_frames, 2)
+
+    def test_small_tiles(self):
+        # Tiles too small for gridlines are filled entirely
+        recorder = FrameRecorder(100, 50, self.path, tile_size=2)
+        recorder.paintTile(99, 49, CLEAN)
+        width, height, pixels = readFrame(recorder.write([]))
+        self.assertEqual((width, height), (200, 100))
+        self.assertEqual(pixel(pixels, width, 198, 0), CLEAN)
+        self.assertEqual(pixel(pixels, width, 197, 0), DIRTY)
+
+
+class RobotVisualizationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_record_without_window(self):
+        anim = RobotVisualization(1, 3, 3, show=False, record_to=self.path)
+        anim.draw([(0, 0)], [(0.5, 0.5, 0)], 1)
+        anim.draw([(0, 1)], [(0.5, 1.5, 0)], 2)
+        anim.done()
+        self.assertEqual(anim.recorder.num_frames, 2)
+        self.assertEqual(len(os.listdir(self.path)), 2)
+        self.assertEqual(anim.recorder.pixels[:3], LINE)
+
+    def test_frame_skipping(self):
+        anim = RobotVisualization(1, 3, 3, fps=0.001, show=False, record_to=self.path)
+        for j in range(3):
+            anim.draw([(1, j)], [(1.5, j + 0.5, 0)], j + 1)
+        self.assertEqual(anim.recorder.num_frames, 1)
+        self.assertEqual(anim.num_skipped, 2)
+        # The skipped updates are drawn by the last frame
+        anim.done()
+        self.assertEqual(anim.recorder.num_frames, 2)
+        recorder = anim.recorder
+        middle = recorder.tile_size // 2
+        for j in range(3):
+            self.assertEqual(pixel(recorder.pixels, recorder.pixel_width, recorder.tile_size + middle,
+                                   (2 - j) * recorder.tile_size + middle), CLEAN)
+
+
+if __name__ == '__main__':
+    unittest.main()
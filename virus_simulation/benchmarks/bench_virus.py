@@ -0,0 +1,148 @@
+__author__ = 'nunoe'
+
+# Benchmarks of the virus simulation hot paths. Run from the virus_simulation directory:
+#
+#     python -m benchmarks.bench_virus [--repeat N] [--filter NAME] [--json results.json]
+#                                      [--compare baseline.json]
+#
+# Every benchmark is seeded, so two runs simulate the same trajectories and timings can
+# be compared across commits with --json / --compare.
+
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+import numpy
+from src.simulation_runner import make_patient, make_treated_patient, simulation_with_drugs_hist
+
+SEED = 2014
+NUM_VIRUSES = 100
+MAX_POP = 1000
+MAX_BIRTH_PROB = 0.1
+CLEAR_PROB = 0.05
+MUT_PROB = 0.005
+ONE_DRUG = {'guttagonol': False}
+TWO_DRUGS = {'guttagonol': False, 'grimpex': False}
+
+
+def untreated(engine, time_steps):
+    """
+    :return: function simulating an untreated patient for time_steps, and its number of steps
+    """
+    def run():
+        patient = make_patient(engine, NUM_VIRUSES, MAX_POP, MAX_BIRTH_PROB, CLEAR_PROB,
+                               numpy.random.default_rng(SEED))
+        for _ in range(time_steps):
+            patient.update()
+    return run, time_steps
+
+
+def treated(engine, resistances, time_steps, delay, query=False):
+    """
+    :return: function simulating a treated patient that takes every drug in resistances at
+        step delay, optionally querying the resistant population at every step, and its
+        number of steps
+    """
+    def run():
+        patient = make_treated_patient(engine, NUM_VIRUSES, MAX_POP, MAX_BIRTH_PROB, CLEAR_PROB,
+                                       resistances, MUT_PROB, numpy.random.default_rng(SEED))
+        for time_step in range(time_steps):
+            if time_step == delay:
+                for drug in resistances:
+                    patient.add_prescription(drug)
+            patient.update()
+            if query:
+                patient.get_resistant_pop(resistances.keys())
+    return run, time_steps
+
+
+def runner(engine, num_trials):
+    """
+    :return: function running simulation_with_drugs_hist with a 150 steps delay, and its
+        number of steps
+    """
+    def run():
+        simulation_with_drugs_hist(NUM_VIRUSES, MAX_POP, MAX_BIRTH_PROB, CLEAR_PROB, ONE_DRUG, MUT_PROB,
+                                   num_trials, 300, 150, engine=engine, seed=SEED)
+    return run, num_trials * 300
+
+
+def benchmarks():
+    """
+    :return: list of (name, (function, number of simulated steps)) tuples
+    """
+    cases = []
+    for engine in ('object', 'count', 'stochastic'):
+        cases.append(('patient_update_300/%s' % engine, untreated(engine, 300)))
+        cases.append(('treated_update_1drug_450/%s' % engine, treated(engine, ONE_DRUG, 450, 300)))
+        cases.append(('treated_update_2drugs_450/%s' % engine, treated(engine, TWO_DRUGS, 450, 150)))
+        cases.append(('get_resistant_pop_300/%s' % engine, treated(engine, ONE_DRUG, 300, 150, query=True)))
+        cases.append(('hist_runner_10x300/%s' % engine, runner(engine, 10)))
+    return cases
+
+
+def measure(function, steps, repeat):
+    """
+    Times a benchmark and measures its memory use. The timing runs are done without
+    tracing, memory is measured on a separate traced run: peak_kb is the largest amount of
+    memory allocated at once during the run, retained_kb what is still allocated at its end
+    :param function: function to benchmark
+    :param steps: integer, number of time steps simulated by function
+    :param repeat: integer, number of timing runs, the fastest one is reported
+    :return: dict with 'seconds', 'us_per_step', 'retained_kb' and 'peak_kb'
+    """
+    timings = []
+    for _ in range(repeat):
+        random.seed(SEED)
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+
+    random.seed(SEED)
+    tracemalloc.start()
+    function()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(timings)
+    return {'seconds': best,
+            'us_per_step': 1e6 * best / steps,
+            'retained_kb': retained / 1024.0,
+            'peak_kb': peak / 1024.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks of the virus simulation hot paths')
+    parser.add_argument('--repeat', type=int, default=3, help='timing runs per benchmark')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains FILTER')
+    parser.add_argument('--json', help='write the results to a JSON file')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare against')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    results = {}
+    print('%-38s %10s %12s %12s %10s %8s' % ('benchmark', 'seconds', 'us/step', 'retain KB', 'peak KB', 'ratio'))
+    for name, (function, steps) in benchmarks():
+        if args.filter not in name:
+            continue
+        result = measure(function, steps, args.repeat)
+        results[name] = result
+        ratio = ''
+        if name in baseline:
+            ratio = '%.2fx' % (result['seconds'] / baseline[name]['seconds'])
+        print('%-38s %10.4f %12.2f %12.1f %10.1f %8s' % (name, result['seconds'], result['us_per_step'],
+                                                        result['retained_kb'], result['peak_kb'], ratio))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
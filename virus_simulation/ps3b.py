@@ -2,7 +2,6 @@
 
 import numpy
 import random
-import pylab
 
 ''' 
 Begin helper code
@@ -168,19 +167,20 @@ class Patient(object):
 # PROBLEM 3
 #
 def simulationWithoutDrug(numViruses, maxPop, maxBirthProb, clearProb,
-                          numTrials):
+                          numTrials, plotTo=None):
     """
-    Run the simulation and plot the graph for problem 3 (no drugs are used,
-    viruses do not have any drug resistance).    
+    Run the simulation for problem 3 (no drugs are used, viruses do not have
+    any drug resistance).
     For each of numTrials trial, instantiates a patient, runs a simulation
-    for 300 timesteps, and plots the average virus population size as a
-    function of time.
+    for 300 timesteps, and returns the average virus population size as a
+    function of time, optionally plotting it to the file plotTo.
 
     numViruses: number of SimpleVirus to create for patient (an integer)
     maxPop: maximum virus population for patient (an integer)
     maxBirthProb: Maximum reproduction probability (a float between 0-1)        
     clearProb: Maximum clearance probability (a float between 0-1)
     numTrials: number of simulation runs to execute (an integer)
+    plotTo: file the graph is written to (a string), or None to skip plotting
     """
 
     average_pop = [0.0 for _ in range(300)]
@@ -193,13 +193,11 @@ def simulationWithoutDrug(numViruses, maxPop, maxBirthProb, clearProb,
 
     average_pop = [pop_sum / numTrials for pop_sum in average_pop]
 
-    pylab.figure()
-    pylab.plot(range(300), average_pop)
-    pylab.title('SimpleVirus simulation')
-    pylab.xlabel('Time Steps')
-    pylab.ylabel('Average Virus Population')
-    pylab.legend()
-    pylab.show()
+    if plotTo is not None:
+        from src import report
+        report.plot_curves(plotTo, [('', average_pop, 'b-')], 'SimpleVirus simulation')
+
+    return average_pop
 
 #
 # PROBLEM 4
@@ -436,15 +434,16 @@ class TreatedPatient(Patient):
 # PROBLEM 5
 #
 def simulationWithDrug(numViruses, maxPop, maxBirthProb, clearProb, resistances,
-                       mutProb, numTrials):
+                       mutProb, numTrials, plotTo=None):
     """
-    Runs simulations and plots graphs for problem 5.
+    Runs simulations for problem 5.
 
     For each of numTrials trials, instantiates a patient, runs a simulation for
     150 timesteps, adds guttagonol, and runs the simulation for an additional
-    150 timesteps.  At the end plots the average virus population size
+    150 timesteps.  At the end returns the average virus population size
     (for both the total virus population and the guttagonol-resistant virus
-    population) as a function of time.
+    population) as a function of time, optionally plotting them to the file
+    plotTo.
 
     numViruses: number of ResistantVirus to create for patient (an integer)
     maxPop: maximum virus population for patient (an integer)
@@ -455,7 +454,7 @@ def simulationWithDrug(numViruses, maxPop, maxBirthProb, clearProb, resistances,
     mutProb: mutation probability for each ResistantVirus particle
              (a float between 0-1). 
     numTrials: number of simulation runs to execute (an integer)
-    
+    plotTo: file the graph is written to (a string), or None to skip plotting
     """
 
     average_pop = [0.0 for _ in range(300)]
@@ -475,24 +474,20 @@ def simulationWithDrug(numViruses, maxPop, maxBirthProb, clearProb, resistances,
     average_pop = [pop_sum / numTrials for pop_sum in average_pop]
     average_res = [pop_sum / numTrials for pop_sum in average_res]
 
-    print average_pop
-    print average_res
+    if plotTo is not None:
+        from src import report
+        report.plot_curves(plotTo, [('Avg Virus Population', average_pop, 'b-'),
+                                    ('Avg Resistant Population', average_res, 'r--')],
+                           'ResistantVirus simulation')
 
-    pylab.figure()
-    pylab.plot(range(300), average_pop, 'b-', label='Avg Virus Population')
-    pylab.plot(range(300), average_res, 'r--', label='Avg Resistant Population')
-    pylab.title('ResistantVirus simulation')
-    pylab.xlabel('Time Steps')
-    pylab.ylabel('Average Virus Population')
-    pylab.legend()
-    pylab.show()
+    return average_pop, average_res
 
 
 if __name__ == '__main__':
-    simulationWithoutDrug(100, 1000, 0.1, 0.05, 10)
+    simulationWithoutDrug(100, 1000, 0.1, 0.05, 10, 'simple_virus.png')
     #simulationWithoutDrug(1, 90, 0.8, 0.1, 1)
 
     #simulationWithDrug(100, 1000, 0.1, 0.05, {'guttagonol': False}, 0.05, 100)
-    simulationWithDrug(100, 1000, 0.1, 0.05, {'guttagonol': False}, 0.05, 5)
+    simulationWithDrug(100, 1000, 0.1, 0.05, {'guttagonol': False}, 0.05, 5, 'resistant_virus.png')
     #simulationWithDrug(1, 10, 1.0, 0.0, {}, 1.0, 5)
 
@@ -0,0 +1,276 @@
+__author__ = 'nunoe'
+
+import copy
+import numpy
+
+
+class CountPatient(object):
+    """
+    Count-based representation of an untreated patient. Instead of holding one
+    SimpleVirus instance per particle, the patient only stores the size of its
+    virus population and evolves it with binomial draws. Since every particle of
+    a SimpleVirus population shares the same probabilities, the resulting
+    trajectories are statistically equivalent to the ones produced by Patient.
+    """
+
+    def __init__(self, num_viruses, max_birth_prob, clear_prob, max_population, rng=None):
+        """
+        Initializes the patient instance with a population of identical virus particles
+        :param num_viruses: integer, initial size of the virus population
+        :param max_birth_prob: float between 0 and 1, max reproduction probability of each particle
+        :param clear_prob: float between 0 and 1, clearing probability of each particle
+        :param max_population: integer, represents the maximum virus population for the
+            patient
+        :param rng: numpy.random.Generator, source of randomness. A freshly seeded generator
+            is created when None
+        """
+        self.population = num_viruses
+        self.max_birth_prob = max_birth_prob
+        self.clear_prob = clear_prob
+        self.max_population = max_population
+        self.rng = rng if rng is not None else numpy.random.default_rng()
+
+    def get_max_birth_prob(self):
+        return self.max_birth_prob
+
+    def get_clear_prob(self):
+        return self.clear_prob
+
+    def get_max_population(self):
+        return self.max_population
+
+    def get_total_population(self):
+        """
+        :return: integer, the size of the current virus population
+        """
+        return self.population
+
+    def snapshot(self):
+        """
+        Captures the state of the virus population. The state of the generator is not
+        part of the snapshot
+        :return: tuple, compact state of the patient that can be given to restore()
+        """
+        return (self.population,)
+
+    def restore(self, state):
+        """
+        Brings the patient back to a state captured by snapshot()
+        :param state: tuple, state returned by snapshot()
+        """
+        self.population = state[0]
+
+    def fork(self, rng=None):
+        """
+        Creates a patient in the same state as this one that evolves independently from
+        now on
+        :param rng: numpy.random.Generator, source of randomness of the new patient. When None,
+            a generator seeded from this patient's generator is used, so that both patients do
+            not share their random draws
+        :return: the new patient, of the same class as this one
+        """
+        child = copy.copy(self)
+        child.restore(self.snapshot())
+        child.rng = rng if rng is not None else numpy.random.default_rng(int(self.rng.integers(2 ** 63)))
+        return child
+
+    def birth_prob(self, pop_density):
+        """
+        Reproduction probability of a single particle for a given population density,
+        clipped to [0, 1] the same way a random.random() comparison would be
+        :param pop_density: float, current virus population divided by the maximum population
+        :return: float between 0 and 1
+        """
+        return min(max(self.max_birth_prob * (1 - pop_density), 0.0), 1.0)
+
+    def update(self):
+        """
+        Update the state of the virus population in the patient for a single time step.
+        Each call:
+        - Draws the amount of particles that clear from a binomial distribution;
+        - Calculates the current population density
+        - Draws the amount of surviving particles that reproduce from a binomial distribution
+        and adds them to the current virus population
+        :return: integer, the total virus population at the end of the update
+        """
+        survivors = self.population - int(self.rng.binomial(self.population, self.clear_prob))
+
+        pop_density = float(survivors) / self.get_max_population()
+        births = int(self.rng.binomial(survivors, self.birth_prob(pop_density)))
+
+        self.population = survivors + births
+        return self.population
+
+
+class CountTreatedPatient(CountPatient):
+    """
+    Count-based representation of a patient that is able to take drugs. Particles
+    with identical resistances are interchangeable, so the population is stored as
+    the amount of particles per resistance genotype. A genotype is a bitmask over the
+    drugs the particles were created with: bit i is set when the particle is resistant
+    to the i-th drug. The cost of a time step is proportional to the number of
+    genotypes present rather than to the number of particles.
+    """
+
+    def __init__(self, num_viruses, max_birth_prob, clear_prob, resistances, mut_prob,
+                 max_population, rng=None):
+        """
+        Initializes the treated patient instance with a population of identical
+        resistant virus particles
+        :param num_viruses: integer, initial size of the virus population
+        :param max_birth_prob: float between 0 and 1, max reproduction probability of each particle
+        :param clear_prob: float between 0 and 1, clearing probability of each particle
+        :param resistances: dictionary of <drug(str), resistance(boolean)>, resistances of the
+            initial particles. Its keys define the drugs to which particles can become resistant
+        :param mut_prob: float between 0 and 1, probability for each resistance to flip when a
+            particle reproduces
+        :param max_population: integer, represents the maximum virus population for the
+            patient
+        :param rng: numpy.random.Generator, source of randomness. A freshly seeded generator
+            is created when None
+        """
+        CountPatient.__init__(self, num_viruses, max_birth_prob, clear_prob, max_population, rng)
+        self.mut_prob = mut_prob
+        self.drug_bits = dict((drug, 1 << i) for (i, drug) in enumerate(resistances))
+        self.drugs = []
+        self.active_mask = 0
+        self.counts = {}
+        if num_viruses > 0:
+            self.counts[self.genotype(resistances)] = num_viruses
+        self.mutation_probs = self._mutation_probs(len(self.drug_bits), mut_prob)
+
+    @staticmethod
+    def _mutation_probs(num_drugs, mut_prob):
+        """
+        Probability of each flip mask when a particle reproduces. Every resistance flips
+        independently, so a mask with k bits set has probability mut_prob^k * (1 - mut_prob)^(n - k)
+        :param num_drugs: integer, number of drugs tracked by the genotypes
+        :param mut_prob: float between 0 and 1, probability for each resistance to flip
+        :return: numpy array with 2^num_drugs probabilities, indexed by flip mask
+        """
+        flips = numpy.array([bin(mask).count('1') for mask in range(1 << num_drugs)])
+        return mut_prob ** flips * (1 - mut_prob) ** (num_drugs - flips)
+
+    def genotype(self, resistances):
+        """
+        :param resistances: dictionary of <drug(str), resistance(boolean)>
+        :return: integer, bitmask with the bits of the drugs the particle is resistant to
+        """
+        mask = 0
+        for drug, resistant in resistances.items():
+            if resistant:
+                mask |= self.drug_bits[drug]
+        return mask
+
+    def drug_mask(self, drugs):
+        """
+        :param drugs: list of str, names of drugs
+        :return: integer, bitmask of the drugs tracked by the genotypes, unknown drugs are ignored
+        """
+        mask = 0
+        for drug in drugs:
+            mask |= self.drug_bits.get(drug, 0)
+        return mask
+
+    def get_genotype_counts(self):
+        """
+        :return: dict <integer, integer>, maps each genotype present to its amount of particles
+        """
+        return self.counts
+
+    def add_prescription(self, new_drug):
+        """
+        Administer a drug to the patient. Adds the name of the drug to the
+        list of drugs being taken by the patient if it is not already there
+        :param new_drug: str, name of the drug to administer
+        """
+        if not new_drug in self.drugs:
+            self.drugs.append(new_drug)
+            self.active_mask = self.drug_mask(self.drugs)
+
+    def get_prescriptions(self):
+        """
+        :return: list of str, returns the list of drugs being administered to the patient
+        """
+        return self.drugs
+
+    def set_prescriptions(self, drugs):
+        """
+        Replaces the drugs being administered to the patient, see TreatedPatient.set_prescriptions
+        :param drugs: list of str, names of the drugs in effect
+        """
+        self.drugs = list(drugs)
+        self.active_mask = self.drug_mask(self.drugs)
+
+    def snapshot(self):
+        """
+        Captures the amount of particles per genotype and the drugs being administered
+        :return: tuple, compact state of the patient that can be given to restore()
+        """
+        return (self.population, tuple(self.counts.items()), tuple(self.drugs))
+
+    def restore(self, state):
+        """
+        Brings the patient back to a state captured by snapshot()
+        :param state: tuple, state returned by snapshot()
+        """
+        self.population = state[0]
+        self.counts = dict(state[1])
+        self.set_prescriptions(state[2])
+
+    def get_resistant_pop(self, drug_resist):
+        """
+        Returns the amount of virus particles resistant to a set of drugs
+        :param drug_resist: list of str, the list of drugs agains which the
+        particles must be resistant
+        :return: integer, the amount of virus particles resistant to drug_resist
+        """
+        if any(drug not in self.drug_bits for drug in drug_resist):
+            return 0
+        mask = self.drug_mask(drug_resist)
+        return sum(count for (genotype, count) in self.counts.items() if genotype & mask == mask)
+
+    def can_reproduce(self, genotype):
+        """
+        Mirrors ResistantVirus.reproduce: a particle is blocked only when none of the
+        drugs in effect is one it is resistant to
+        :param genotype: integer, resistance bitmask of the particles
+        :return: boolean, True if particles of the genotype may reproduce
+        """
+        return not self.drugs or genotype & self.active_mask != 0
+
+    def update(self):
+        """
+        Update the state of the virus population in the patient for a single time step.
+        Each call:
+        - Draws the amount of particles of each genotype that clear from a binomial distribution;
+        - Calculates the current population density
+        - Draws the amount of particles of each genotype that reproduce. Only genotypes that are
+        not blocked by the drugs in effect can reproduce. The offspring of each genotype is spread
+        over the mutated genotypes with a multinomial draw and added to the current population
+        :return: integer, the total virus population at the end of the update
+        """
+        survivors = {}
+        for genotype, count in self.counts.items():
+            remaining = count - int(self.rng.binomial(count, self.clear_prob))
+            if remaining > 0:
+                survivors[genotype] = remaining
+        self.population = sum(survivors.values())
+
+        pop_density = float(self.population) / self.get_max_population()
+        birth_prob = self.birth_prob(pop_density)
+
+        self.counts = survivors.copy()
+        for genotype, count in survivors.items():
+            if not self.can_reproduce(genotype):
+                continue
+            births = int(self.rng.binomial(count, birth_prob))
+            if births == 0:
+                continue
+            self.population += births
+            offspring = self.rng.multinomial(births, self.mutation_probs)
+            for flip in numpy.flatnonzero(offspring):
+                child = genotype ^ int(flip)
+                self.counts[child] = self.counts.get(child, 0) + int(offspring[flip])
+
+        return self.population
@@ -0,0 +1,158 @@
+__author__ = 'nunoe'
+
+import numpy
+
+
+class Regimen(object):
+    """
+    Representation of the doses of a single drug. Doses are taken every interval steps
+    from start until stop, and the concentration of the drug in the patient decays by a
+    constant factor every time step. The drug is in effect while its concentration is at
+    least threshold.
+    """
+
+    def __init__(self, drug, start, stop=None, interval=None, dose=1.0, decay=1.0, threshold=0.5):
+        """
+        :param drug: str, name of the drug
+        :param start: integer, time step of the first dose
+        :param stop: integer or None, time step after which no more doses are taken. None keeps
+            dosing until the end of the simulation
+        :param interval: integer or None, number of time steps between two doses. None for a
+            single dose at start
+        :param dose: float, concentration added by each dose
+        :param decay: float between 0 and 1, fraction of the concentration remaining after a
+            time step. 1.0 keeps the drug in effect forever, like TreatedPatient.add_prescription
+        :param threshold: float, minimum concentration for the drug to be in effect
+        """
+        if start < 0:
+            raise ValueError('Expected a start time step >= 0, got %r' % (start,))
+        if interval is not None and interval < 1:
+            raise ValueError('Expected an interval of at least 1 time step or None, got %r' % (interval,))
+        if dose <= 0:
+            raise ValueError('Expected a dose > 0, got %r' % (dose,))
+        if not 0 <= decay <= 1:
+            raise ValueError('Expected a decay between 0 and 1, got %r' % (decay,))
+        self.drug = drug
+        self.start = start
+        self.stop = stop
+        self.interval = interval
+        self.dose = dose
+        self.decay = decay
+        self.threshold = threshold
+
+    def get_drug(self):
+        return self.drug
+
+    def dose_steps(self, time_steps):
+        """
+        :param time_steps: integer, number of time steps simulated
+        :return: list of integers, time steps at which a dose is taken
+        """
+        last = time_steps - 1 if self.stop is None else min(self.stop, time_steps - 1)
+        if self.interval is None:
+            return [self.start] if self.start <= last else []
+        return list(range(self.start, last + 1, self.interval))
+
+    def concentrations(self, time_steps):
+        """
+        Concentration of the drug at each time step, after the dose of that step is taken
+        :param time_steps: integer, number of time steps simulated
+        :return: numpy array with time_steps concentrations
+        """
+        doses = numpy.zeros(time_steps)
+        doses[self.dose_steps(time_steps)] = self.dose
+        concentration = numpy.zeros(time_steps)
+        level = 0.0
+        for time_step in range(time_steps):
+            level = level * self.decay + doses[time_step]
+            concentration[time_step] = level
+        return concentration
+
+    def in_effect(self, time_steps):
+        """
+        :param time_steps: integer, number of time steps simulated
+        :return: numpy array of booleans, True at the time steps where the drug is in effect
+        """
+        return self.concentrations(time_steps) >= self.threshold
+
+
+class DosingSchedule(object):
+    """
+    Representation of a treatment made of several regimens. The drugs in effect at every
+    time step are computed once for the whole simulation, so patients only have to swap in
+    the precomputed prescriptions at each step.
+    """
+
+    def __init__(self, regimens):
+        """
+        :param regimens: list of Regimen, several regimens may use the same drug
+        """
+        self.regimens = regimens
+
+    def get_drugs(self):
+        """
+        :return: list of str, drugs used by the schedule, in order of first appearance
+        """
+        drugs = []
+        for regimen in self.regimens:
+            if regimen.get_drug() not in drugs:
+                drugs.append(regimen.get_drug())
+        return drugs
+
+    def effect_matrix(self, time_steps):
+        """
+        :param time_steps: integer, number of time steps simulated
+        :return: numpy boolean array of shape (drugs, time_steps), True where the drug listed at
+            the same position by get_drugs() is in effect
+        """
+        drugs = self.get_drugs()
+        effect = numpy.zeros((len(drugs), time_steps), dtype=bool)
+        for regimen in self.regimens:
+            effect[drugs.index(regimen.get_drug())] |= regimen.in_effect(time_steps)
+        return effect
+
+    def prescriptions(self, time_steps):
+        """
+        :param time_steps: integer, number of time steps simulated
+        :return: list of tuples of str, drugs in effect at each time step
+        """
+        drugs = self.get_drugs()
+        effect = self.effect_matrix(time_steps)
+        return [tuple(drugs[i] for i in numpy.flatnonzero(effect[:, t])) for t in range(time_steps)]
+
+
+def simulate_schedule(patient, schedule, time_steps, drugs_resist=None):
+    """
+    Simulates a treated patient following a dosing schedule
+    :param patient: TreatedPatient or count-based equivalent
+    :param schedule: DosingSchedule
+    :param time_steps: integer, number of time steps to simulate
+    :param drugs_resist: list of str or None, when given the resistant population against these
+        drugs is recorded at each step as well
+    :return: list of integers with the total population at each time step, and when drugs_resist
+        is given the list of resistant populations
+    """
+    prescriptions = schedule.prescriptions(time_steps)
+    total_pop = [0 for _ in range(time_steps)]
+    resistant_pop = total_pop[:]
+    for time_step in range(time_steps):
+        patient.set_prescriptions(prescriptions[time_step])
+        total_pop[time_step] = patient.update()
+        if drugs_resist is not None:
+            resistant_pop[time_step] = patient.get_resistant_pop(drugs_resist)
+
+    if drugs_resist is None:
+        return total_pop
+    return total_pop, resistant_pop
+
+
+def evaluate_regimens(patient, schedules, time_steps):
+    """
+    Simulates a patient under many candidate schedules. Each schedule runs on a fork of the
+    patient, so the patient itself is left untouched
+    :param patient: TreatedPatient or count-based equivalent
+    :param schedules: list of DosingSchedule
+    :param time_steps: integer, number of time steps to simulate
+    :return: list of integers, final population under each schedule
+    """
+    return [simulate_schedule(patient.fork(), schedule, time_steps)[-1] for schedule in schedules]
@@ -0,0 +1,182 @@
+__author__ = 'nunoe'
+
+import numpy
+
+
+class ContactNetwork(object):
+    """
+    Undirected contact network between hosts, stored as two arrays of directed edges
+    (every contact appears once in each direction) so that transmissions along all the
+    contacts of the infected hosts can be drawn in a single vectorized operation.
+    """
+
+    def __init__(self, num_hosts, sources, targets):
+        """
+        :param num_hosts: integer, number of hosts in the network
+        :param sources: array of integers, first host of each contact
+        :param targets: array of integers, second host of each contact
+        """
+        sources = numpy.asarray(sources, dtype=numpy.int64)
+        targets = numpy.asarray(targets, dtype=numpy.int64)
+        self.num_hosts = num_hosts
+        self.sources = numpy.concatenate([sources, targets])
+        self.targets = numpy.concatenate([targets, sources])
+
+    @staticmethod
+    def random(num_hosts, mean_contacts, rng=None):
+        """
+        Builds a random network where each host has mean_contacts contacts on average
+        :param num_hosts: integer, number of hosts
+        :param mean_contacts: float, average number of contacts per host
+        :param rng: numpy.random.Generator, source of randomness
+        :return: ContactNetwork
+        """
+        rng = rng if rng is not None else numpy.random.default_rng()
+        num_edges = int(round(num_hosts * mean_contacts / 2.0))
+        sources = rng.integers(num_hosts, size=num_edges)
+        targets = rng.integers(num_hosts, size=num_edges)
+        distinct = sources != targets
+        return ContactNetwork(num_hosts, sources[distinct], targets[distinct])
+
+    def get_num_hosts(self):
+        return self.num_hosts
+
+    def degrees(self):
+        """
+        :return: numpy array of integers, number of contacts of each host
+        """
+        return numpy.bincount(self.sources, minlength=self.num_hosts)
+
+
+class Epidemic(object):
+    """
+    Representation of a virus spreading through a population of hosts. The within-host
+    dynamics follow CountPatient, but the virus populations of all the infected hosts are
+    stored in one array and stepped together with vectorized binomial draws. Uninfected
+    hosts hold no state beyond a zero in that array.
+
+    Hosts that need a detailed model (for instance a CountTreatedPatient taking drugs) can
+    be given a patient_factory: a patient is then only created when a host gets infected,
+    stepped through its own update() and dropped once its population is cleared.
+    """
+
+    def __init__(self, network, max_birth_prob, clear_prob, max_population, transmission_prob,
+                 inoculum, immunity=True, patient_factory=None, rng=None):
+        """
+        :param network: ContactNetwork, contacts between hosts
+        :param max_birth_prob: float between 0 and 1, max reproduction probability of each particle
+        :param clear_prob: float between 0 and 1, clearing probability of each particle
+        :param max_population: integer, maximum virus population of a host
+        :param transmission_prob: float between 0 and 1, probability for a host carrying
+            max_population particles to infect a contact at each time step. The probability
+            is proportional to the virus population of the infected host
+        :param inoculum: integer, virus population of a newly infected host
+        :param immunity: boolean, True if hosts that cleared the virus can not be infected again
+        :param patient_factory: function(host, inoculum) -> patient, or None to use the
+            vectorized model for every host
+        :param rng: numpy.random.Generator, source of randomness
+        """
+        self.network = network
+        self.max_birth_prob = max_birth_prob
+        self.clear_prob = clear_prob
+        self.max_population = max_population
+        self.transmission_prob = transmission_prob
+        self.inoculum = inoculum
+        self.immunity = immunity
+        self.patient_factory = patient_factory
+        self.rng = rng if rng is not None else numpy.random.default_rng()
+
+        num_hosts = network.get_num_hosts()
+        self.loads = numpy.zeros(num_hosts, dtype=numpy.int64)
+        self.immune = numpy.zeros(num_hosts, dtype=bool)
+        self.patients = {}
+
+    def get_loads(self):
+        """
+        :return: numpy array of integers, virus population of each host
+        """
+        return self.loads
+
+    def get_patient(self, host):
+        """
+        :param host: integer, index of the host
+        :return: the detailed patient of an infected host, None if it has none
+        """
+        return self.patients.get(host)
+
+    def get_num_infected(self):
+        return int(numpy.count_nonzero(self.loads))
+
+    def get_num_immune(self):
+        return int(numpy.count_nonzero(self.immune))
+
+    def infect(self, hosts):
+        """
+        Infects susceptible hosts with an inoculum of virus particles
+        :param hosts: array of integers, indices of the hosts to infect
+        :return: numpy array of integers, hosts that were actually infected
+        """
+        hosts = numpy.unique(numpy.asarray(hosts, dtype=numpy.int64))
+        hosts = hosts[(self.loads[hosts] == 0) & ~self.immune[hosts]]
+        self.loads[hosts] = self.inoculum
+        if self.patient_factory is not None:
+            for host in hosts.tolist():
+                self.patients[host] = self.patient_factory(host, self.inoculum)
+        return hosts
+
+    def update_hosts(self):
+        """
+        Steps the within-host dynamics of every infected host for a single time step
+        """
+        infected = numpy.flatnonzero(self.loads)
+        if self.patient_factory is None:
+            loads = self.loads[infected]
+            survivors = loads - self.rng.binomial(loads, self.clear_prob)
+            birth_probs = numpy.clip(self.max_birth_prob * (1 - survivors / float(self.max_population)), 0, 1)
+            self.loads[infected] = survivors + self.rng.binomial(survivors, birth_probs)
+        else:
+            for host in infected.tolist():
+                self.loads[host] = self.patients[host].update()
+
+        cleared = infected[self.loads[infected] == 0]
+        for host in cleared.tolist():
+            self.patients.pop(host, None)
+        if self.immunity:
+            self.immune[cleared] = True
+
+    def transmit(self):
+        """
+        Draws a transmission along every contact of every infected host
+        :return: numpy array of integers, newly infected hosts
+        """
+        sources = self.network.sources
+        contacts = numpy.flatnonzero(self.loads[sources] > 0)
+        if len(contacts) == 0:
+            return contacts
+        probs = self.transmission_prob * numpy.minimum(
+            self.loads[sources[contacts]] / float(self.max_population), 1.0)
+        hits = contacts[self.rng.random(len(contacts)) < probs]
+        return self.infect(self.network.targets[hits])
+
+    def update(self):
+        """
+        Update the state of the population for a single time step: steps every infected
+        host, then lets the infected hosts transmit the virus to their contacts
+        :return: integer, number of infected hosts at the end of the update
+        """
+        self.update_hosts()
+        self.transmit()
+        return self.get_num_infected()
+
+    def run(self, time_steps):
+        """
+        :param time_steps: integer, number of time steps to simulate
+        :return: tuple of numpy arrays, number of infected hosts and total virus population at
+            each time step
+        """
+        infected = numpy.zeros(time_steps, dtype=numpy.int64)
+        total_load = numpy.zeros(time_steps, dtype=numpy.int64)
+        for time_step in range(time_steps):
+            infected[time_step] = self.update()
+            total_load[time_step] = self.loads.sum()
+        return infected, total_load
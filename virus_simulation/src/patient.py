@@ -1,6 +1,9 @@
 __author__ = 'nunoe'
 
-from src.virus import NoChildException
+import collections
+import copy
+from src.rng import BufferedRandom, make_rng, spawn_rng
+from src.virus import reproduce_all
 
 
 class Patient(object):
@@ -9,16 +12,20 @@ class Patient(object):
     and his/her virus populations have no drug resistance.
     """
 
-    def __init__(self, viruses, max_population):
+    def __init__(self, viruses, max_population, rng=None):
         """
         Initializes the patient instance and stores the viruses and max_population
         parameters
         :param viruses: list of SimpleVirus, represent the virus population
         :param max_population: integer, represents the maximum virus population for the
             patient
+        :param rng: source of randomness given to the virus particles: a numpy.random.Generator
+            (wrapped in a BufferedRandom), a random.Random or BufferedRandom instance, or None for
+            the global random module
         """
         self.viruses = viruses
         self.max_population = max_population
+        self.rng = make_rng(rng)
 
     def get_viruses(self):
         return self.viruses
@@ -32,6 +39,36 @@ class Patient(object):
         """
         return len(self.viruses)
 
+    def snapshot(self):
+        """
+        Captures the state of the patient. Virus instances are never modified once
+        created, so the snapshot references them instead of copying them
+        :return: tuple, compact state of the patient that can be given to restore()
+        """
+        return (tuple(self.viruses),)
+
+    def restore(self, state):
+        """
+        Brings the patient back to a state captured by snapshot()
+        :param state: tuple, state returned by snapshot()
+        """
+        self.viruses = list(state[0])
+
+    def fork(self, rng=None):
+        """
+        Creates a patient in the same state as this one that evolves independently from
+        now on. Both patients share the virus instances but not the population lists, so
+        forking only costs a copy of the references
+        :param rng: source of randomness of the new patient, see __init__. When None, a
+            source seeded from this patient's one is used (see spawn_rng), so that both
+            patients do not share their random draws
+        :return: the new patient, of the same class as this one
+        """
+        child = copy.copy(self)
+        child.restore(self.snapshot())
+        child.rng = make_rng(rng) if rng is not None else spawn_rng(self.rng)
+        return child
+
     def update(self):
         """
         Update the state of the virus population in the patient for a single time step.
@@ -42,19 +79,17 @@ class Patient(object):
         the current virus population
         :return: integer, the total virus population at the end of the update
         """
-        temp_virus_list = self.viruses[:]
-        for v in temp_virus_list:
-            if v.does_clear():
-                self.viruses.remove(v)
+        rng = self.rng
+        if isinstance(rng, BufferedRandom):
+            # One batch of uniforms per step instead of a random() call per particle
+            draws = rng.uniforms(len(self.viruses))
+            self.viruses[:] = [v for v, u in zip(self.viruses, draws) if u >= v.clear_prob]
+        else:
+            self.viruses[:] = [v for v in self.viruses if not v.does_clear(rng)]
 
         pop_density = float(self.get_total_population()) / self.get_max_population()
 
-        temp_virus_list = self.viruses[:]
-        for v in temp_virus_list:
-            try:
-                self.viruses.append(v.reproduce(pop_density))
-            except NoChildException:
-                pass
+        self.viruses.extend(reproduce_all(self.viruses, pop_density, rng=rng))
 
         return self.get_total_population()
 
@@ -65,16 +100,26 @@ class TreatedPatient(Patient):
     can acquire resistance to the drugs being taken.
     """
 
-    def __init__(self, viruses, max_population):
+    def __init__(self, viruses, max_population, rng=None):
         """
         Initializes the treated patient instance and stores the viruses and max_population
         parameters
         :param viruses: list of ResistantVirus, represent the virus population
         :param max_population: integer, represents the maximum virus population for the
             patient
+        :param rng: source of randomness given to the virus particles, see Patient
         """
-        Patient.__init__(self, viruses, max_population)
+        Patient.__init__(self, viruses, max_population, rng)
         self.drugs = []
+        # Amount of particles resistant to each tracked set of drugs, see track_resistance
+        self.resistant_counts = {}
+        # Amount of particles of each resistance profile (keyed by the id of the interned
+        # profile), kept while resistance is tracked
+        self.profile_counts = {}
+        # A particle of each profile seen, and whether the profile resists each tracked set
+        # of drugs. Both only hold facts about the interned profiles and are shared by forks
+        self.profile_viruses = {}
+        self.profile_resists = {}
 
     def add_prescription(self, new_drug):
         """
@@ -91,19 +136,106 @@ class TreatedPatient(Patient):
         """
         return self.drugs
 
+    def set_prescriptions(self, drugs):
+        """
+        Replaces the drugs being administered to the patient, used to follow a DosingSchedule
+        where drugs can also stop being in effect
+        :param drugs: list of str, names of the drugs in effect
+        """
+        self.drugs = list(drugs)
+
+    def snapshot(self):
+        """
+        Captures the state of the patient, including the drugs being administered
+        :return: tuple, compact state of the patient that can be given to restore()
+        """
+        return Patient.snapshot(self) + (tuple(self.drugs), tuple(self.resistant_counts.items()),
+                                         tuple(self.profile_counts.items()))
+
+    def restore(self, state):
+        """
+        Brings the patient back to a state captured by snapshot()
+        :param state: tuple, state returned by snapshot()
+        """
+        Patient.restore(self, state)
+        self.drugs = list(state[1])
+        self.resistant_counts = dict(state[2])
+        self.profile_counts = dict(state[3])
+
+    def track_resistance(self, drug_resist):
+        """
+        Starts maintaining the amount of virus particles resistant to a set of drugs. The
+        population is tallied by resistance profile once, when the first set of drugs is
+        tracked. update() then adjusts the tally of each profile from the particles that
+        clear and the new particles, and the counts of the tracked sets follow from the
+        profiles whose tally changed. The virus list must not be modified from outside the
+        patient while counts are tracked
+        :param drug_resist: list of str, the list of drugs agains which the
+        particles must be resistant
+        :return: frozenset of str, the key of the tracked count
+        """
+        key = frozenset(drug_resist)
+        if key not in self.resistant_counts:
+            if not self.resistant_counts:
+                self.profile_counts = dict(self._count_profiles(self.viruses))
+            self.resistant_counts[key] = sum([count for profile, count in self.profile_counts.items()
+                                              if self._profile_resists(profile, key)])
+        return key
+
+    def _count_profiles(self, viruses):
+        """
+        :param viruses: list of ResistantVirus
+        :return: Counter, the amount of particles of each resistance profile in viruses
+        """
+        counts = collections.Counter([id(v.get_resistances()) for v in viruses])
+        for profile in counts:
+            if profile not in self.profile_viruses:
+                # New profiles are rare, look for a particle that has it
+                self.profile_viruses[profile] = next(v for v in viruses if id(v.get_resistances()) == profile)
+        return counts
+
+    def _profile_resists(self, profile, drug_resist):
+        """
+        :param profile: integer, id of an interned resistance profile seen by _count_profiles
+        :param drug_resist: frozenset of str, drugs agains which the particles must be resistant
+        :return: boolean, True if the particles of the profile are resistant to all of drug_resist
+        """
+        resists = self.profile_resists.get((profile, drug_resist))
+        if resists is None:
+            virus = self.profile_viruses[profile]
+            resists = all([virus.is_resistant_to(drug) for drug in drug_resist])
+            self.profile_resists[(profile, drug_resist)] = resists
+        return resists
+
     def get_resistant_pop(self, drug_resist):
         """
-        Returns the amount of virus particles resistant to a set of drugs
+        Returns the amount of virus particles resistant to a set of drugs. The first query
+        for a set of drugs starts tracking it, later queries take constant time
         :param drug_resist: list of str, the list of drugs agains which the
         particles must be resistant
         :return: integer, the amount of virus particles resistant to drug_resist
         """
-        resistant_viruses = 0
+        return self.resistant_counts[self.track_resistance(drug_resist)]
 
-        for virus in self.viruses:
-            if all([virus.is_resistant_to(drug) for drug in drug_resist]):
-                resistant_viruses += 1
-        return resistant_viruses
+    def reproducible_viruses(self):
+        """
+        Selects the particles that are not blocked by the drugs in effect, following the rule
+        of ResistantVirus.reproduce. Particles with the same resistances share their profile
+        (see intern_resistances), so the drugs are checked once per profile instead of once
+        per particle
+        :return: list of ResistantVirus, particles allowed to reproduce
+        """
+        if not self.drugs:
+            return self.viruses
+        allowed = {}
+        reproducible = []
+        for v in self.viruses:
+            profile = id(v.get_resistances())
+            if profile not in allowed:
+                allowed[profile] = any([v.is_resistant_to(drug) for drug in self.drugs])
+            if allowed[profile]:
+                reproducible.append(v)
+        return reproducible
 
     def update(self):
         """
@@ -116,18 +248,31 @@ class TreatedPatient(Patient):
         the current virus population
         :return: integer, the total virus population at the end of the update
         """
-        temp_virus_list = self.viruses[:]
-        for v in temp_virus_list:
-            if v.does_clear():
-                self.viruses.remove(v)
+        survivors = []
+        cleared = []
+        rng = self.rng
+        if isinstance(rng, BufferedRandom):
+            draws = rng.uniforms(len(self.viruses))
+            for v, u in zip(self.viruses, draws):
+                (cleared if u < v.clear_prob else survivors).append(v)
+        else:
+            for v in self.viruses:
+                (cleared if v.does_clear(rng) else survivors).append(v)
+        self.viruses[:] = survivors
 
         pop_density = float(self.get_total_population()) / self.get_max_population()
 
-        temp_virus_list = self.viruses[:]
-        for v in temp_virus_list:
-            try:
-                self.viruses.append(v.reproduce(pop_density, self.drugs))
-            except NoChildException:
-                pass
+        offspring = reproduce_all(self.reproducible_viruses(), pop_density, rng=rng)
+        self.viruses.extend(offspring)
+
+        if self.resistant_counts:
+            changes = self._count_profiles(offspring)
+            changes.subtract(self._count_profiles(cleared))
+            for profile, change in changes.items():
+                if change:
+                    self.profile_counts[profile] = self.profile_counts.get(profile, 0) + change
+            for key in self.resistant_counts:
+                self.resistant_counts[key] += sum([change for profile, change in changes.items()
+                                                   if change and self._profile_resists(profile, key)])
 
         return self.get_total_population()
\ No newline at end of file
@@ -0,0 +1,95 @@
+__author__ = 'nunoe'
+
+# Plots of the simulation results, rendered to image files. matplotlib is only imported
+# when a plot is drawn and always with the non-interactive Agg backend, so the simulation
+# modules never depend on it and batch workers never open a window.
+
+
+def pyplot():
+    """
+    :return: the matplotlib.pyplot module, configured with the Agg backend
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot
+    return pyplot
+
+
+def save(figure, path):
+    """
+    Writes a figure to a file and releases it
+    :param figure: matplotlib Figure
+    :param path: str, output file, the format is given by its extension
+    :return: str, path
+    """
+    figure.savefig(path)
+    pyplot().close(figure)
+    return path
+
+
+def plot_curves(path, curves, title, x_label='Time Steps', y_label='Average Virus Population'):
+    """
+    Plots one line per curve
+    :param path: str, output file
+    :param curves: list of (label, list of numbers, matplotlib style) tuples
+    :param title: str, title of the plot
+    :param x_label: str, label of the x axis
+    :param y_label: str, label of the y axis
+    :return: str, path
+    """
+    figure = pyplot().figure()
+    axes = figure.add_subplot(1, 1, 1)
+    for label, values, style in curves:
+        axes.plot(range(len(values)), values, style, label=label)
+    axes.set_title(title)
+    axes.set_xlabel(x_label)
+    axes.set_ylabel(y_label)
+    if any(label for label, _, _ in curves):
+        axes.legend()
+    return save(figure, path)
+
+
+def plot_trajectories(path, trajectories, title, x_label='Time Steps', y_label='Average Virus Population'):
+    """
+    Plots the mean of each TrajectoryStats with its confidence band
+    :param path: str, output file
+    :param trajectories: list of (label, TrajectoryStats, color) tuples
+    :param title: str, title of the plot
+    :param x_label: str, label of the x axis
+    :param y_label: str, label of the y axis
+    :return: str, path
+    """
+    figure = pyplot().figure()
+    axes = figure.add_subplot(1, 1, 1)
+    for label, stats, color in trajectories:
+        steps = range(len(stats.get_mean()))
+        axes.plot(steps, stats.get_mean(), color=color, label=label)
+        lower, upper = stats.get_confidence_band()
+        axes.fill_between(steps, lower, upper, color=color, alpha=0.2)
+    axes.set_title(title)
+    axes.set_xlabel(x_label)
+    axes.set_ylabel(y_label)
+    if any(label for label, _, _ in trajectories):
+        axes.legend()
+    return save(figure, path)
+
+
+def plot_histogram(path, values, title, x_label='Final Virus Population', y_label='Number of Trials'):
+    """
+    Plots the distribution of values with one bin per integer value. Without values, the
+    plot only has its title and axes
+    :param path: str, output file
+    :param values: list of integers, may be empty
+    :param title: str, title of the plot
+    :param x_label: str, label of the x axis
+    :param y_label: str, label of the y axis
+    :return: str, path
+    """
+    figure = pyplot().figure()
+    axes = figure.add_subplot(1, 1, 1)
+    if len(values):
+        axes.hist(values, bins=range(min(values), max(values) + 2))
+    axes.set_title(title)
+    axes.set_xlabel(x_label)
+    axes.set_ylabel(y_label)
+    return save(figure, path)
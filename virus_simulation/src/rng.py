@@ -0,0 +1,87 @@
+__author__ = 'nunoe'
+
+import random
+import numpy
+
+
+class BufferedRandom(object):
+    """
+    Source of uniform draws for the virus classes, backed by a numpy Generator. The
+    patients draw the uniforms of a whole population at once with uniforms(), and compare
+    them to the clearing and birth probabilities in bulk. random() hands out buffered
+    uniforms one by one for the remaining per-particle draws (mutations), and has the
+    signature of the random module's, so either can be given to SimpleVirus.does_clear
+    and try_reproduce.
+    """
+
+    def __init__(self, generator=None, batch_size=4096):
+        """
+        :param generator: numpy.random.Generator, integer seed or None for fresh entropy
+        :param batch_size: integer, number of uniforms generated at once
+        """
+        if not isinstance(generator, numpy.random.Generator):
+            generator = numpy.random.default_rng(generator)
+        self.generator = generator
+        self.batch_size = batch_size
+        self.buffer = []
+        self.index = 0
+
+    def get_generator(self):
+        return self.generator
+
+    def random(self):
+        """
+        :return: float uniformly drawn in [0, 1)
+        """
+        if self.index == len(self.buffer):
+            self.buffer = self.generator.random(self.batch_size).tolist()
+            self.index = 0
+        value = self.buffer[self.index]
+        self.index += 1
+        return value
+
+    def uniforms(self, size):
+        """
+        Draws a batch of uniforms, starting with the ones left in the buffer
+        :param size: integer, number of draws
+        :return: list of floats uniformly drawn in [0, 1)
+        """
+        values = self.buffer[self.index:self.index + size]
+        self.index += len(values)
+        if len(values) < size:
+            values.extend(self.generator.random(size - len(values)).tolist())
+        return values
+
+    def spawn(self):
+        """
+        :return: BufferedRandom, independent source seeded from this one
+        """
+        return BufferedRandom(numpy.random.default_rng(self.generator.integers(2 ** 63)), self.batch_size)
+
+
+def make_rng(rng):
+    """
+    Normalizes the rng argument of the patients and virus classes
+    :param rng: None for the global random module, a random.Random or BufferedRandom instance,
+        or a numpy.random.Generator which gets wrapped in a BufferedRandom
+    :return: None or an object with a random() method
+    """
+    if isinstance(rng, numpy.random.Generator):
+        return BufferedRandom(rng)
+    return rng
+
+
+def spawn_rng(rng):
+    """
+    Derives an independent source of randomness from a source normalized by make_rng, used
+    to fork patients. The new source is seeded from draws of rng, so a seeded simulation
+    forks into reproducible branches that do not share their draws
+    :param rng: None for the global random module, a random.Random or BufferedRandom instance
+    :return: BufferedRandom when rng is one, random.Random otherwise
+    """
+    if isinstance(rng, BufferedRandom):
+        return rng.spawn()
+    source = random if rng is None else rng
+    if hasattr(source, 'getrandbits'):
+        return random.Random(source.getrandbits(64))
+    return random.Random(int(source.random() * 2 ** 53))
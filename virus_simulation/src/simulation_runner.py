@@ -1,47 +1,193 @@
 __author__ = 'nunoe'
 
-import pylab
+import numpy
 from src.virus import SimpleVirus, ResistantVirus
 from src.patient import Patient, TreatedPatient
+from src.count_patient import CountPatient, CountTreatedPatient
+from src.stochastic import StochasticPatient, StochasticTreatedPatient
+from src.stats import TrajectoryStats
+from src.termination import SteadyStateDetector, equilibrium, run_patient
+from src.trials import iter_trials, run_trials, seed_trial
+
+ENGINES = ('object', 'count', 'stochastic')
+
+
+def make_patient(engine, num_viruses, max_pop, max_birth_prob, clear_prob, rng=None):
+    """
+    Creates an untreated patient backed by the requested simulation engine
+    :param engine: str, 'object' for a Patient holding one SimpleVirus per particle,
+        'count' for a CountPatient that only tracks the population size, 'stochastic' for
+        its continuous-time counterpart StochasticPatient
+    :param num_viruses: integer, number of virus particles in the initial population
+    :param max_pop: integer, maximum virus population for the patient
+    :param max_birth_prob: float between 0 and 1, probability for a virus instance to reproduce
+    :param clear_prob: float between 0 and 1, probability for a virus instance to clear
+    :param rng: numpy.random.Generator, source of randomness of the patient. The object engine
+        uses the global random module when None
+    :return: Patient or CountPatient instance
+    """
+    if engine == 'object':
+        viruses = [SimpleVirus(max_birth_prob, clear_prob) for _ in range(num_viruses)]
+        return Patient(viruses, max_pop, rng)
+    if engine == 'count':
+        return CountPatient(num_viruses, max_birth_prob, clear_prob, max_pop, rng)
+    if engine == 'stochastic':
+        return StochasticPatient(num_viruses, max_birth_prob, clear_prob, max_pop, rng)
+    raise ValueError('Unknown engine %r, expected one of %s' % (engine, ENGINES))
+
+
+def make_treated_patient(engine, num_viruses, max_pop, max_birth_prob, clear_prob,
+                         resistances, mut_prob, rng=None):
+    """
+    Creates a treated patient backed by the requested simulation engine
+    :param engine: str, 'object' for a TreatedPatient holding one ResistantVirus per particle,
+        'count' for a CountTreatedPatient that tracks the amount of particles per genotype,
+        'stochastic' for its continuous-time counterpart StochasticTreatedPatient
+    :param num_viruses: integer, number of virus particles in the initial population
+    :param max_pop: integer, maximum virus population for the patient
+    :param max_birth_prob: float between 0 and 1, probability for a virus instance to reproduce
+    :param clear_prob: float between 0 and 1, probability for a virus instance to clear
+    :param resistances: dict <str, boolean>, initial resistances of the virus particles
+    :param mut_prob, float between 0 and 1, probability for the offspring of the virus to
+    mutate on of its resistances
+    :param rng: numpy.random.Generator, source of randomness of the patient. The object engine
+        uses the global random module when None
+    :return: TreatedPatient or CountTreatedPatient instance
+    """
+    if engine == 'object':
+        viruses = [ResistantVirus(max_birth_prob, clear_prob, resistances, mut_prob) for _ in range(num_viruses)]
+        return TreatedPatient(viruses, max_pop, rng)
+    if engine == 'count':
+        return CountTreatedPatient(num_viruses, max_birth_prob, clear_prob, resistances, mut_prob, max_pop,
+                                   rng)
+    if engine == 'stochastic':
+        return StochasticTreatedPatient(num_viruses, max_birth_prob, clear_prob, resistances, mut_prob,
+                                        max_pop, rng)
+    raise ValueError('Unknown engine %r, expected one of %s' % (engine, ENGINES))
+
+
+def treated_trial(seed_seq, engine, num_viruses, max_pop, max_birth_prob, clear_prob,
+                  resistances, mut_prob, time_steps, prescriptions, steady_state=False,
+                  return_stop=False):
+    """
+    Runs a single trial with a treated patient. Defined at module level so that it can
+    be executed by the worker processes of run_trials
+    :param seed_seq: numpy.random.SeedSequence, seed of the trial
+    :param engine: str, 'object', 'count' or 'stochastic', see make_treated_patient
+    :param num_viruses: integer, number of virus instances to create
+    :param max_pop: integer, maximum virus population for the patient
+    :param max_birth_prob: float between 0 and 1, probability for a virus instance to reproduce
+    :param clear_prob: float between 0 and 1, probability for a virus instance to clear
+    :param resistances: dict <str, boolean>, initial resistances of the virus particles
+    :param mut_prob, float between 0 and 1, probability for the offspring of the virus to
+    mutate on of its resistances
+    :param time_steps integer, number of time_steps to simulate
+    :param prescriptions: dict <integer, list of str>, maps time steps to the drugs
+    administered at that step
+    :param steady_state: boolean, True to stop the trial once the population is steady after
+    the last prescription, see run_patient. Extinct trials always stop
+    :param return_stop: boolean, True to also return the Stop of the trial
+    :return: integer, the virus population at the end of the trial, or tuple (integer, Stop or
+    None) when return_stop is True
+    """
+    rng = seed_trial(seed_seq)
+    patient = make_treated_patient(engine, num_viruses, max_pop, max_birth_prob, clear_prob,
+                                   resistances, mut_prob, rng)
+    detector = SteadyStateDetector() if steady_state else None
+    total_pop, _, stop = run_patient(patient, time_steps, prescriptions, detector=detector)
+
+    if return_stop:
+        return total_pop[-1], stop
+    return total_pop[-1]
+
+
+def trajectory_trial(seed_seq, engine, num_viruses, max_pop, max_birth_prob, clear_prob,
+                     resistances, mut_prob, time_steps, prescriptions, steady_state=False):
+    """
+    Same as treated_trial, but returns the whole trajectory of the trial
+    :return: tuple (list of integers, total population at each time step, list of integers,
+    population resistant to every drug of resistances at each time step, Stop or None)
+    """
+    rng = seed_trial(seed_seq)
+    patient = make_treated_patient(engine, num_viruses, max_pop, max_birth_prob, clear_prob,
+                                   resistances, mut_prob, rng)
+    detector = SteadyStateDetector() if steady_state else None
+    return run_patient(patient, time_steps, prescriptions, list(resistances.keys()), detector)
+
+
+def store_treated_trials(store, num_viruses, max_pop, max_birth_prob, clear_prob, resistances,
+                         mut_prob, num_trials, time_steps, prescriptions, engine='count', seed=None,
+                         max_workers=1, steady_state=False):
+    """
+    Runs a series of trials with treated patients and appends the trajectory of each
+    trial to a TrialStore as soon as it finishes, so results never accumulate in memory.
+    Each row holds the parameters, the root 'seed' and 'trial' index (the trial is
+    reproduced by spawn_seeds(num_trials, seed)[trial]), 'total_pop' and 'resistant_pop'
+    at every step, and 'stop_step' / 'stop_reason' (-1 and '' when every step was simulated).
+    The parameters not listed here are the same as for treated_trial
+    :param store: TrialStore, receives one row per trial
+    :param prescriptions: dict <integer, list of str>, maps time steps to the drugs
+    administered at that step
+    :param seed: integer or None, root seed of the trials. Fresh entropy is drawn and recorded
+    when None
+    :return: integer, the root seed of the trials
+    """
+    if seed is None:
+        seed = numpy.random.SeedSequence().entropy
+    args = (engine, num_viruses, max_pop, max_birth_prob, clear_prob, resistances, mut_prob,
+            time_steps, prescriptions, steady_state)
+    for trial, (total_pop, resistant_pop, stop) in iter_trials(trajectory_trial, args, num_trials,
+                                                              seed, max_workers):
+        store.append({'engine': engine, 'seed': str(seed), 'trial': trial, 'num_viruses': num_viruses,
+                      'max_pop': max_pop, 'max_birth_prob': max_birth_prob, 'clear_prob': clear_prob,
+                      'mut_prob': mut_prob, 'total_pop': total_pop, 'resistant_pop': resistant_pop,
+                      'stop_step': -1 if stop is None else stop.step,
+                      'stop_reason': '' if stop is None else stop.reason})
+    return seed
 
 
 def simulation_without_drugs(num_viruses, max_pop, max_birth_prob,
-                             clear_prob, num_trials, time_steps):
+                             clear_prob, num_trials, time_steps, engine='object', steady_state=False,
+                             plot_to=None):
     """
     Runs a series of trials with an untreated patient and simple virus instances
-    with the given parameters and plots out the result
+    with the given parameters, optionally plotting the result
     :param num_viruses: integer, number of virus instances to create
     :param max_pop: integer, maximum virus population for each patient
     :param max_birth_prob: float between 0 and 1, probability for a virus instance to reproduce
     :param clear_prob: float between 0 and 1, probability for a virus instance to clear
     :param num_trials: integer, number of trials to run the simulation
     :param time_steps integer, number of time_steps to consider for each trial
+    :param engine: str, 'object' (default), 'count' or 'stochastic', see make_patient
+    :param steady_state: boolean, True to fast-forward trials that reached the equilibrium
+    population, see run_patient. Extinct trials always stop
+    :param plot_to: str or None, file the average population is plotted to, see src.report
+    :return: TrajectoryStats, per time step statistics of the virus population
     """
 
-    average_pop = [0.0 for _ in range(time_steps)]
-    viruses = [SimpleVirus(max_birth_prob, clear_prob) for _ in range(num_viruses)]
+    pop_stats = TrajectoryStats(time_steps)
+    detector = None
+    if steady_state:
+        detector = SteadyStateDetector(target=equilibrium(max_birth_prob, clear_prob, max_pop))
 
     for _ in range(num_trials):
-        patient = Patient(viruses, max_pop)
-        for time_step in range(time_steps):
-            average_pop[time_step] += patient.update()
+        patient = make_patient(engine, num_viruses, max_pop, max_birth_prob, clear_prob)
+        pop_stats.add(run_patient(patient, time_steps, detector=detector)[0])
 
-    average_pop = [pop_sum / num_trials for pop_sum in average_pop]
+    if plot_to is not None:
+        from src import report
+        report.plot_trajectories(plot_to, [('', pop_stats, 'b')], 'SimpleVirus simulation')
 
-    pylab.figure()
-    pylab.plot(range(time_steps), average_pop)
-    pylab.title('SimpleVirus simulation')
-    pylab.xlabel('Time Steps')
-    pylab.ylabel('Average Virus Population')
-    pylab.show()
+    return pop_stats
 
 
 def simulation_with_drugs(num_viruses, max_pop, max_birth_prob,
                           clear_prob, resistances, mut_prob,
-                          num_trials, time_steps, drug_administration_step):
+                          num_trials, time_steps, drug_administration_step, engine='object',
+                          steady_state=False, plot_to=None):
     """
     Runs a series of trials with treated patients and resistant virus instances
-    the given parameters and plots out the result
+    the given parameters, optionally plotting the result
     :param num_viruses: integer, number of virus instances to create
     :param max_pop: integer, maximum virus population for each patient
     :param max_birth_prob: float between 0 and 1, probability for a virus instance to reproduce
@@ -54,41 +200,45 @@ def simulation_with_drugs(num_viruses, max_pop, max_birth_prob,
     :param time_steps integer, number of time_steps to consider for each trial
     :param drug_administration_step, integer between 0 and time_step, time_step at which to
     administer the necessary drugs
+    :param engine: str, 'object' (default), 'count' or 'stochastic', see make_treated_patient
+    :param steady_state: boolean, True to fast-forward trials that are steady after the drug
+    administration, see run_patient. Extinct trials always stop
+    :param plot_to: str or None, file the average populations are plotted to, see src.report
+    :return: tuple of TrajectoryStats, per time step statistics of the total and of the
+    resistant virus population
     """
 
-    average_pop = [0 for _ in range(time_steps)]
-    average_res = average_pop[:]
+    pop_stats = TrajectoryStats(time_steps)
+    res_stats = TrajectoryStats(time_steps)
+    prescriptions = {drug_administration_step: list(resistances.keys())}
+    detector = SteadyStateDetector() if steady_state else None
 
     for _ in range(num_trials):
-        viruses = [ResistantVirus(max_birth_prob, clear_prob, resistances, mut_prob) for _ in range(num_viruses)]
-        patient = TreatedPatient(viruses, max_pop)
-        for time_step in range(time_steps):
-            if time_step == drug_administration_step:
-                for drug in resistances.keys():
-                    patient.add_prescription(drug)
+        patient = make_treated_patient(engine, num_viruses, max_pop, max_birth_prob, clear_prob,
+                                       resistances, mut_prob)
+        trial_pop, trial_res, _ = run_patient(patient, time_steps, prescriptions,
+                                              list(resistances.keys()), detector)
 
-            average_pop[time_step] += patient.update()
-            average_res[time_step] += patient.get_resistant_pop(resistances.keys())
+        pop_stats.add(trial_pop)
+        res_stats.add(trial_res)
 
-    average_pop = [float(pop_sum) / num_trials for pop_sum in average_pop]
-    average_res = [float(pop_sum) / num_trials for pop_sum in average_res]
+    if plot_to is not None:
+        from src import report
+        report.plot_trajectories(plot_to, [('Avg Virus Population', pop_stats, 'b'),
+                                           ('Avg Resistant Population', res_stats, 'r')],
+                                 'ResistantVirus simulation')
 
-    pylab.figure()
-    pylab.plot(range(time_steps), average_pop, 'b-', label='Avg Virus Population')
-    pylab.plot(range(time_steps), average_res, 'r--', label='Avg Resistant Population')
-    pylab.title('ResistantVirus simulation')
-    pylab.xlabel('Time Steps')
-    pylab.ylabel('Average Virus Population')
-    pylab.legend()
-    pylab.show()
+    return pop_stats, res_stats
 
 
 def simulation_with_drugs_hist(num_viruses, max_pop, max_birth_prob,
                                clear_prob, resistances, mut_prob,
-                               num_trials, time_steps, drug_administration_step):
+                               num_trials, time_steps, drug_administration_step, engine='object',
+                               seed=None, max_workers=1, steady_state=False, plot_to=None,
+                               return_stops=False):
     """
     Runs a series of trials with treated patients and resistant virus instances with
-    the given parameters and plots final population distribution on a histogram
+    the given parameters, optionally plotting the final population distribution on a histogram
     :param num_viruses: integer, number of virus instances to create
     :param max_pop: integer, maximum virus population for each patient
     :param max_birth_prob: float between 0 and 1, probability for a virus instance to reproduce
@@ -101,34 +251,43 @@ def simulation_with_drugs_hist(num_viruses, max_pop, max_birth_prob,
     :param time_steps integer, number of time_steps to consider for each trial
     :param drug_administration_step, integer between 0 and time_step, time_step at which to
     administer the necessary drugs
+    :param engine: str, 'object' (default), 'count' or 'stochastic', see make_treated_patient
+    :param seed: integer or None, root seed of the trials, see run_trials
+    :param max_workers: integer or None, number of worker processes running the trials, see run_trials
+    :param steady_state: boolean, True to stop trials once they are steady, see treated_trial
+    :param plot_to: str or None, file the histogram is plotted to, see src.report
+    :param return_stops: boolean, True to also return the Stop of each trial
+    :return: list of integers, final population of each trial, or tuple (final populations,
+    list of Stop or None, step at which each trial stopped being simulated) when return_stops
+    is True
     """
 
-    final_pop = [0 for _ in range(num_trials)]
+    prescriptions = {drug_administration_step: list(resistances.keys())}
+    results = run_trials(treated_trial,
+                         (engine, num_viruses, max_pop, max_birth_prob, clear_prob,
+                          resistances, mut_prob, time_steps, prescriptions, steady_state,
+                          return_stops),
+                         num_trials, seed, max_workers)
+    final_pop = [final for final, _ in results] if return_stops else results
 
-    for trial in range(num_trials):
-        viruses = [ResistantVirus(max_birth_prob, clear_prob, resistances, mut_prob) for _ in range(num_viruses)]
-        patient = TreatedPatient(viruses, max_pop)
-        for time_step in range(time_steps):
-            if time_step == drug_administration_step:
-                for drug in resistances.keys():
-                    patient.add_prescription(drug)
-            patient.update()
-
-        final_pop[trial] = patient.get_total_population()
+    if plot_to is not None:
+        from src import report
+        report.plot_histogram(plot_to, final_pop,
+                              'Population after administering drugs with delay: ' + str(drug_administration_step))
 
+    if return_stops:
+        return final_pop, [stop for _, stop in results]
     return final_pop
-    pylab.figure()
-    pylab.hist(final_pop, bins=range(min(final_pop), max(final_pop)))
-    pylab.title('Population after administering drugs with delay: ' + str(drug_administration_step))
-    pylab.show()
+
 
 def simulation_with_2drugs_hist(num_viruses, max_pop, max_birth_prob,
                                 clear_prob, resistances, mut_prob,
                                 num_trials, time_steps, drug1_administration_step,
-                                drug2_administration_step):
+                                drug2_administration_step, engine='object', seed=None,
+                                max_workers=1, steady_state=False, plot_to=None, return_stops=False):
     """
     Runs a series of trials with treated patients and resistant virus instances with
-    the given parameters and plots final population distribution on a histogram
+    the given parameters, optionally plotting the final population distribution on a histogram
     :param num_viruses: integer, number of virus instances to create
     :param max_pop: integer, maximum virus population for each patient
     :param max_birth_prob: float between 0 and 1, probability for a virus instance to reproduce
@@ -141,39 +300,45 @@ def simulation_with_2drugs_hist(num_viruses, max_pop, max_birth_prob,
     :param time_steps integer, number of time_steps to consider for each trial
     :param drug_administration_step, integer between 0 and time_step, time_step at which to
     administer the necessary drugs
+    :param engine: str, 'object' (default), 'count' or 'stochastic', see make_treated_patient
+    :param seed: integer or None, root seed of the trials, see run_trials
+    :param max_workers: integer or None, number of worker processes running the trials, see run_trials
+    :param steady_state: boolean, True to stop trials once they are steady, see treated_trial
+    :param plot_to: str or None, file the histogram is plotted to, see src.report
+    :param return_stops: boolean, True to also return the Stop of each trial
+    :return: list of integers, final population of each trial, or tuple (final populations,
+    list of Stop or None, step at which each trial stopped being simulated) when return_stops
+    is True
     """
 
-    final_pop = [0 for _ in range(num_trials)]
-
-    for trial in range(num_trials):
-        viruses = [ResistantVirus(max_birth_prob, clear_prob, resistances, mut_prob) for _ in range(num_viruses)]
-        patient = TreatedPatient(viruses, max_pop)
-        for time_step in range(time_steps):
-            if time_step == drug1_administration_step:
-                patient.add_prescription('guttagonol')
-            if time_step == drug2_administration_step:
-                patient.add_prescription('grimpex')
-            patient.update()
+    prescriptions = {}
+    prescriptions.setdefault(drug1_administration_step, []).append('guttagonol')
+    prescriptions.setdefault(drug2_administration_step, []).append('grimpex')
+    results = run_trials(treated_trial,
+                         (engine, num_viruses, max_pop, max_birth_prob, clear_prob,
+                          resistances, mut_prob, time_steps, prescriptions, steady_state,
+                          return_stops),
+                         num_trials, seed, max_workers)
+    final_pop = [final for final, _ in results] if return_stops else results
 
-        final_pop[trial] = patient.get_total_population()
+    if plot_to is not None:
+        from src import report
+        delay = drug2_administration_step - drug1_administration_step
+        report.plot_histogram(plot_to, final_pop,
+                              'Population after administering drugs with delay: ' + str(delay))
 
+    if return_stops:
+        return final_pop, [stop for _, stop in results]
     return final_pop
-    pylab.figure()
-    pylab.hist(final_pop, bins=range(min(final_pop), max(final_pop)))
-    pylab.title('Population after administering drugs with delay: ' + str(drug_administration_step))
-    pylab.show()
 
 
 if __name__ == '__main__':
     # simulation_without_drugs(100, 1000, 0.1, 0.05, 10, 300)
     # simulation_with_drugs(100, 1000, 0.1, 0.05, {'guttagonol': True}, 0.05, 10, 300, 150)
     #simulation_with_drugs(100, 1000, 0.1, 0.05, {'guttagonol': False}, 0.005, 5, 300, 150)
-    delay = 300
-    simulation_with_drugs_hist(100, 1000, 0.1, 0.05, {'guttagonol': False}, 0.005, 300, delay + 150, delay)
-    delay = 150
-    simulation_with_drugs_hist(100, 1000, 0.1, 0.05, {'guttagonol': False}, 0.005, 300, delay + 150, delay)
-    delay = 75
-    simulation_with_drugs_hist(100, 1000, 0.1, 0.05, {'guttagonol': False}, 0.005, 300, delay + 150, delay)
+    for delay in (300, 150, 75, 0):
+        simulation_with_drugs_hist(100, 1000, 0.1, 0.05, {'guttagonol': False}, 0.005, 300, delay + 150, delay,
+                                   plot_to='drugs_hist_delay_%d.png' % delay)
     delay = 0
-    simulation_with_drugs_hist(100, 1000, 0.1, 0.05, {'guttagonol': False}, 0.005, 300, delay + 150, delay)
-    simulation_with_2drugs_hist(100, 1000, 0.1, 0.05, {'guttagonol': False, 'grimpex': False}, 0.005, 300, delay + 300, 150, 150+delay)
+    simulation_with_2drugs_hist(100, 1000, 0.1, 0.05, {'guttagonol': False, 'grimpex': False}, 0.005, 300,
+                                delay + 300, 150, 150 + delay, plot_to='2drugs_hist_delay_%d.png' % delay)
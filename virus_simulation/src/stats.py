@@ -0,0 +1,186 @@
+__author__ = 'nunoe'
+
+import numpy
+
+
+class RunningStats(object):
+    """
+    Online mean and variance (Welford's algorithm) of a stream of observations. Each
+    observation is an array of a fixed shape, for instance the population of a trial at
+    every time step, and the statistics are kept element-wise. Memory does not grow with
+    the number of observations.
+    """
+
+    def __init__(self, shape=()):
+        """
+        :param shape: tuple, shape of each observation
+        """
+        self.count = 0
+        self.mean = numpy.zeros(shape)
+        self.m2 = numpy.zeros(shape)
+
+    def add(self, values):
+        """
+        Adds an observation to the statistics
+        :param values: array-like of the configured shape
+        """
+        values = numpy.asarray(values, dtype=float)
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (values - self.mean)
+
+    def get_count(self):
+        return self.count
+
+    def get_mean(self):
+        return self.mean
+
+    def get_variance(self):
+        """
+        :return: array, unbiased sample variance of each element, 0 with less than 2 observations
+        """
+        if self.count < 2:
+            return numpy.zeros_like(self.m2)
+        return self.m2 / (self.count - 1)
+
+    def get_std(self):
+        return numpy.sqrt(self.get_variance())
+
+    def get_confidence_band(self, z=1.96):
+        """
+        Normal approximation of the confidence interval of the mean
+        :param z: float, number of standard errors on each side of the mean, 1.96 for 95%
+        :return: tuple of arrays (lower bound, upper bound)
+        """
+        half_width = z * self.get_std() / numpy.sqrt(max(self.count, 1))
+        return self.mean - half_width, self.mean + half_width
+
+
+class P2Quantile(object):
+    """
+    Online estimate of a quantile with the P-square algorithm (Jain & Chlamtac, 1985).
+    Five markers per element track the minimum, the maximum, the quantile and two
+    intermediate quantiles, and are adjusted with a piecewise-parabolic interpolation
+    after every observation, so memory does not grow with the number of observations.
+    Observations are arrays of a fixed shape and the quantile is estimated element-wise.
+    """
+
+    def __init__(self, quantile, shape=()):
+        """
+        :param quantile: float between 0 and 1, quantile to estimate
+        :param shape: tuple, shape of each observation
+        """
+        p = quantile
+        self.quantile = quantile
+        self.shape = shape
+        self.count = 0
+        self.initial = []
+        self.heights = None
+        self.positions = None
+        self.desired = numpy.array([1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5], dtype=float)
+        self.increments = numpy.array([0, p / 2, p, (1 + p) / 2, 1], dtype=float)
+
+    def add(self, values):
+        """
+        Adds an observation to the estimate
+        :param values: array-like of the configured shape
+        """
+        values = numpy.array(values, dtype=float).reshape(-1)
+        self.count += 1
+        if self.count <= 5:
+            self.initial.append(values)
+            if self.count == 5:
+                self.heights = numpy.sort(numpy.array(self.initial), axis=0)
+                self.positions = numpy.tile(numpy.arange(1, 6, dtype=float)[:, None], (1, values.size))
+                self.initial = []
+            return
+
+        q = self.heights
+        n = self.positions
+        q[0] = numpy.minimum(q[0], values)
+        q[4] = numpy.maximum(q[4], values)
+        cell = (values[None, :] >= q[1:4]).sum(axis=0)
+        n += numpy.arange(5)[:, None] > cell[None, :]
+        self.desired += self.increments
+
+        for i in (1, 2, 3):
+            d = self.desired[i] - n[i]
+            move = ((d >= 1) & (n[i + 1] - n[i] > 1)) | ((d <= -1) & (n[i - 1] - n[i] < -1))
+            if not move.any():
+                continue
+            d = numpy.where(move, numpy.sign(d), 0.0)
+            parabolic = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) +
+                (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+            neighbour = numpy.where(d > 0, i + 1, i - 1)
+            q_neighbour = numpy.choose(neighbour - i + 1, (q[i - 1], q[i], q[i + 1]))
+            n_neighbour = numpy.choose(neighbour - i + 1, (n[i - 1], n[i], n[i + 1]))
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                linear = q[i] + d * (q_neighbour - q[i]) / (n_neighbour - n[i])
+            inside = (q[i - 1] < parabolic) & (parabolic < q[i + 1])
+            q[i] = numpy.where(move, numpy.where(inside, parabolic, linear), q[i])
+            n[i] += d
+
+    def get_count(self):
+        return self.count
+
+    def get_quantile(self):
+        """
+        :return: array of the configured shape, current estimate of the quantile. The exact
+            sample quantile is returned while there are less than 5 observations
+        """
+        if self.count == 0:
+            return numpy.full(self.shape, numpy.nan)
+        if self.heights is None:
+            return numpy.percentile(numpy.array(self.initial), 100 * self.quantile, axis=0).reshape(self.shape)
+        return self.heights[2].reshape(self.shape).copy()
+
+
+class TrajectoryStats(object):
+    """
+    Per time step statistics of simulated trajectories. Each trial feeds its whole
+    trajectory once it finishes, and memory stays proportional to the number of time
+    steps regardless of the number of trials.
+    """
+
+    def __init__(self, time_steps, quantiles=(0.05, 0.5, 0.95)):
+        """
+        :param time_steps: integer, length of the trajectories
+        :param quantiles: tuple of floats between 0 and 1, quantiles to estimate at each time step
+        """
+        self.time_steps = time_steps
+        self.moments = RunningStats((time_steps,))
+        self.quantiles = dict((q, P2Quantile(q, (time_steps,))) for q in quantiles)
+
+    def add(self, trajectory):
+        """
+        Adds the trajectory of a trial to the statistics
+        :param trajectory: list of numbers, value at each time step
+        """
+        trajectory = numpy.asarray(trajectory, dtype=float)
+        if trajectory.shape != (self.time_steps,):
+            raise ValueError('Expected a trajectory of %d time steps, got shape %s'
+                             % (self.time_steps, trajectory.shape))
+        self.moments.add(trajectory)
+        for estimator in self.quantiles.values():
+            estimator.add(trajectory)
+
+    def get_count(self):
+        return self.moments.get_count()
+
+    def get_mean(self):
+        return self.moments.get_mean()
+
+    def get_std(self):
+        return self.moments.get_std()
+
+    def get_confidence_band(self, z=1.96):
+        return self.moments.get_confidence_band(z)
+
+    def get_quantile(self, quantile):
+        """
+        :param quantile: float, one of the quantiles given to the constructor
+        :return: array with the estimate of the quantile at each time step
+        """
+        return self.quantiles[quantile].get_quantile()
@@ -0,0 +1,213 @@
+__author__ = 'nunoe'
+
+import math
+import numpy
+from src.count_patient import CountPatient, CountTreatedPatient
+
+METHODS = ('auto', 'exact', 'tau')
+
+
+def leap(counts, max_birth_prob, clear_prob, max_population, can_reproduce, mutation_probs,
+         tau, rng):
+    """
+    Advances a population by a tau-leap of length tau. Clearances are drawn from a binomial
+    distribution so that a genotype can not become negative, births from a Poisson
+    distribution with the birth rate at the start of the leap
+    :param counts: dict <integer, integer>, amount of particles per genotype
+    :param max_birth_prob: float, reproduction rate of a particle in an empty patient
+    :param clear_prob: float, clearing rate of a particle
+    :param max_population: integer, maximum virus population
+    :param can_reproduce: function(genotype) -> boolean, False for genotypes blocked by drugs
+    :param mutation_probs: numpy array, probability of each flip mask of the offspring
+    :param tau: float, length of the leap in time steps
+    :param rng: numpy.random.Generator, source of randomness
+    :return: dict <integer, integer>, amount of particles per genotype after the leap
+    """
+    population = sum(counts.values())
+    birth_rate = max_birth_prob * max(1 - float(population) / max_population, 0.0)
+    survival = math.exp(-clear_prob * tau)
+
+    new_counts = {}
+    for genotype, count in counts.items():
+        remaining = int(rng.binomial(count, survival))
+        if remaining > 0:
+            new_counts[genotype] = new_counts.get(genotype, 0) + remaining
+        if birth_rate == 0 or not can_reproduce(genotype):
+            continue
+        births = int(rng.poisson(count * birth_rate * tau))
+        if births == 0:
+            continue
+        offspring = rng.multinomial(births, mutation_probs)
+        for flip in numpy.flatnonzero(offspring):
+            child = genotype ^ int(flip)
+            new_counts[child] = new_counts.get(child, 0) + int(offspring[flip])
+    return new_counts
+
+
+def gillespie(counts, max_birth_prob, clear_prob, max_population, can_reproduce, mutation_probs,
+              duration, rng):
+    """
+    Simulates every clearance and birth event of a population during duration time steps
+    with Gillespie's stochastic simulation algorithm. The cost is proportional to the number
+    of events, so it is only meant for small populations
+    :param counts: dict <integer, integer>, amount of particles per genotype
+    :param max_birth_prob: float, reproduction rate of a particle in an empty patient
+    :param clear_prob: float, clearing rate of a particle
+    :param max_population: integer, maximum virus population
+    :param can_reproduce: function(genotype) -> boolean, False for genotypes blocked by drugs
+    :param mutation_probs: numpy array, probability of each flip mask of the offspring
+    :param duration: float, simulated time in time steps
+    :param rng: numpy.random.Generator, source of randomness
+    :return: dict <integer, integer>, amount of particles per genotype after duration
+    """
+    counts = dict(counts)
+    population = sum(counts.values())
+    time = 0.0
+    while population > 0:
+        birth_rate = max_birth_prob * max(1 - float(population) / max_population, 0.0)
+        rates = []
+        for genotype, count in counts.items():
+            rates.append((genotype, False, count * clear_prob))
+            if birth_rate > 0 and can_reproduce(genotype):
+                rates.append((genotype, True, count * birth_rate))
+        total_rate = sum(rate for (_, _, rate) in rates)
+        if total_rate == 0:
+            break
+        time += rng.exponential(1.0 / total_rate)
+        if time > duration:
+            break
+
+        target = rng.random() * total_rate
+        for genotype, is_birth, rate in rates:
+            target -= rate
+            if target < 0:
+                break
+        if is_birth:
+            child = genotype ^ int(rng.choice(len(mutation_probs), p=mutation_probs))
+            counts[child] = counts.get(child, 0) + 1
+            population += 1
+        else:
+            counts[genotype] -= 1
+            if counts[genotype] == 0:
+                del counts[genotype]
+            population -= 1
+    return counts
+
+
+class StochasticMixin(object):
+    """
+    Time stepping shared by the continuous-time patients. Small populations are simulated
+    event by event (Gillespie), large ones with tau-leaping, whose cost per time step does
+    not depend on the population size.
+    """
+
+    def init_method(self, method, exact_below, leaps):
+        """
+        :param method: str, 'exact' (Gillespie), 'tau' (tau-leaping) or 'auto' to pick 'exact'
+            for populations smaller than exact_below and 'tau' otherwise
+        :param exact_below: integer, population size under which 'auto' simulates every event
+        :param leaps: integer, number of tau-leaps per time step. Births use the rate at the
+            start of each leap, so fewer leaps are faster but slightly overshoot the equilibrium
+        """
+        if method not in METHODS:
+            raise ValueError('Unknown method %r, expected one of %s' % (method, METHODS))
+        self.method = method
+        self.exact_below = exact_below
+        self.leaps = leaps
+
+    def uses_exact(self):
+        """
+        :return: boolean, True if the next update simulates every event
+        """
+        if self.method == 'auto':
+            return self.get_total_population() < self.exact_below
+        return self.method == 'exact'
+
+    def advance(self, counts, can_reproduce, mutation_probs):
+        """
+        Advances a population by one time step with the configured method
+        :param counts: dict <integer, integer>, amount of particles per genotype
+        :param can_reproduce: function(genotype) -> boolean, False for genotypes blocked by drugs
+        :param mutation_probs: numpy array, probability of each flip mask of the offspring
+        :return: dict <integer, integer>, amount of particles per genotype one time step later
+        """
+        params = (self.max_birth_prob, self.clear_prob, self.max_population, can_reproduce, mutation_probs)
+        if self.uses_exact():
+            return gillespie(counts, *(params + (1.0, self.rng)))
+        tau = 1.0 / self.leaps
+        for _ in range(self.leaps):
+            counts = leap(counts, *(params + (tau, self.rng)))
+        return counts
+
+
+class StochasticPatient(StochasticMixin, CountPatient):
+    """
+    Continuous-time counterpart of CountPatient. Each particle clears at rate clear_prob
+    and reproduces at rate max_birth_prob * (1 - population density) per time step, see
+    StochasticMixin for the simulation methods.
+    """
+
+    def __init__(self, num_viruses, max_birth_prob, clear_prob, max_population, rng=None,
+                 method='auto', exact_below=100, leaps=4):
+        """
+        :param num_viruses: integer, initial size of the virus population
+        :param max_birth_prob: float, reproduction rate of a particle in an empty patient
+        :param clear_prob: float, clearing rate of a particle
+        :param max_population: integer, represents the maximum virus population for the
+            patient
+        :param rng: numpy.random.Generator, source of randomness. A freshly seeded generator
+            is created when None
+        :param method: str, 'exact', 'tau' or 'auto', see StochasticMixin.init_method
+        :param exact_below: integer, population size under which 'auto' simulates every event
+        :param leaps: integer, number of tau-leaps per time step
+        """
+        CountPatient.__init__(self, num_viruses, max_birth_prob, clear_prob, max_population, rng)
+        self.init_method(method, exact_below, leaps)
+
+    def update(self):
+        """
+        Update the state of the virus population in the patient for a single time step
+        :return: integer, the total virus population at the end of the update
+        """
+        counts = self.advance({0: self.population}, lambda genotype: True, numpy.ones(1))
+        self.population = counts.get(0, 0)
+        return self.population
+
+
+class StochasticTreatedPatient(StochasticMixin, CountTreatedPatient):
+    """
+    Continuous-time counterpart of CountTreatedPatient, see StochasticPatient. Births
+    follow the same drug and mutation rules as CountTreatedPatient.
+    """
+
+    def __init__(self, num_viruses, max_birth_prob, clear_prob, resistances, mut_prob,
+                 max_population, rng=None, method='auto', exact_below=100, leaps=4):
+        """
+        :param num_viruses: integer, initial size of the virus population
+        :param max_birth_prob: float, reproduction rate of a particle in an empty patient
+        :param clear_prob: float, clearing rate of a particle
+        :param resistances: dictionary of <drug(str), resistance(boolean)>, resistances of the
+            initial particles, see CountTreatedPatient
+        :param mut_prob: float between 0 and 1, probability for each resistance to flip when a
+            particle reproduces
+        :param max_population: integer, represents the maximum virus population for the
+            patient
+        :param rng: numpy.random.Generator, source of randomness. A freshly seeded generator
+            is created when None
+        :param method: str, 'exact', 'tau' or 'auto', see StochasticMixin.init_method
+        :param exact_below: integer, population size under which 'auto' simulates every event
+        :param leaps: integer, number of tau-leaps per time step
+        """
+        CountTreatedPatient.__init__(self, num_viruses, max_birth_prob, clear_prob, resistances,
+                                     mut_prob, max_population, rng)
+        self.init_method(method, exact_below, leaps)
+
+    def update(self):
+        """
+        Update the state of the virus population in the patient for a single time step.
+        Only genotypes that are not blocked by the drugs in effect can reproduce
+        :return: integer, the total virus population at the end of the update
+        """
+        self.counts = self.advance(self.counts, self.can_reproduce, self.mutation_probs)
+        self.population = sum(self.counts.values())
+        return self.population
@@ -0,0 +1,175 @@
+__author__ = 'nunoe'
+
+import glob
+import json
+import os
+
+import numpy
+
+CHUNK_PATTERN = 'chunk-%06d.npz'
+META_FILE = 'columns.json'
+
+
+class TrialStore(object):
+    """
+    Append-only columnar store of trial results. Rows are buffered and written every
+    chunk_size rows as a compressed .npz chunk holding one array per column, so a sweep
+    only keeps one chunk of results in memory. Columns are inferred from the first row:
+    numbers and strings become 1-D columns, fixed-length sequences (for instance the
+    population at every time step) become 2-D columns with one line per row.
+
+    A store is a directory. Once written it can be read back with load(), and
+    consolidate() merges the chunks into one .npy file per column that load() then
+    memory-maps instead of decompressing. Writing a new chunk deletes the consolidated
+    files, which would no longer hold every row.
+    """
+
+    def __init__(self, path, chunk_size=1000):
+        """
+        :param path: str, directory of the store, created if needed. Existing chunks are kept
+            and new rows are appended after them
+        :param chunk_size: integer, number of rows per chunk
+        """
+        self.path = path
+        self.chunk_size = chunk_size
+        self.rows = []
+        self.columns = None
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.num_chunks = len(chunk_files(path))
+        meta = read_meta(path)
+        if meta is not None:
+            self.columns = meta['columns']
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, row):
+        """
+        Adds a row to the store
+        :param row: dict <str, value>, value of each column. Every row must have the same keys
+        """
+        if self.columns is None:
+            self.columns = sorted(row.keys())
+        elif sorted(row.keys()) != self.columns:
+            raise ValueError('Expected columns %s, got %s' % (self.columns, sorted(row.keys())))
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def flush(self):
+        """
+        Writes the buffered rows as a new chunk, and deletes the consolidated columns
+        """
+        if not self.rows:
+            return
+        for column_file in column_files(self.path, self.columns):
+            if os.path.exists(column_file):
+                os.remove(column_file)
+        arrays = dict((column, numpy.array([row[column] for row in self.rows])) for column in self.columns)
+        numpy.savez_compressed(os.path.join(self.path, CHUNK_PATTERN % self.num_chunks), **arrays)
+        self.num_chunks += 1
+        self.rows = []
+        with open(os.path.join(self.path, META_FILE), 'w') as f:
+            json.dump({'columns': self.columns}, f)
+
+    def close(self):
+        self.flush()
+
+
+def chunk_files(path):
+    """
+    :param path: str, directory of a store
+    :return: list of str, chunk files of the store in the order they were written
+    """
+    return sorted(glob.glob(os.path.join(path, 'chunk-*.npz')))
+
+
+def column_files(path, columns):
+    """
+    :param path: str, directory of a store
+    :param columns: list of str, columns of the store
+    :return: list of str, consolidated file of each column, see consolidate
+    """
+    return [os.path.join(path, column + '.npy') for column in columns]
+
+
+def read_meta(path):
+    """
+    :param path: str, directory of a store
+    :return: dict with the 'columns' of the store, None for an empty store
+    """
+    meta_file = os.path.join(path, META_FILE)
+    if not os.path.exists(meta_file):
+        return None
+    with open(meta_file) as f:
+        return json.load(f)
+
+
+def iter_chunks(path):
+    """
+    Reads a store one chunk at a time
+    :param path: str, directory of a store
+    :return: generator of dict <str, numpy array>, the columns of each chunk
+    """
+    for chunk_file in chunk_files(path):
+        with numpy.load(chunk_file) as chunk:
+            yield dict((column, chunk[column]) for column in chunk.files)
+
+
+def consolidate(path):
+    """
+    Merges the chunks of a store into one .npy file per column. Each column is written
+    chunk by chunk into a memory-mapped file, so the store never has to fit in memory
+    :param path: str, directory of a store
+    """
+    meta = read_meta(path)
+    if meta is None:
+        return
+    shapes = {}
+    dtypes = {}
+    for chunk in iter_chunks(path):
+        for column, values in chunk.items():
+            length = shapes[column][0] + len(values) if column in shapes else len(values)
+            shapes[column] = (length,) + values.shape[1:]
+            dtypes[column] = numpy.promote_types(dtypes.get(column, values.dtype), values.dtype)
+
+    outputs = dict((column, numpy.lib.format.open_memmap(column_file, mode='w+', dtype=dtypes[column],
+                                                         shape=shapes[column]))
+                   for column, column_file in zip(meta['columns'], column_files(path, meta['columns'])))
+    start = 0
+    for chunk in iter_chunks(path):
+        size = 0
+        for column, values in chunk.items():
+            size = len(values)
+            outputs[column][start:start + size] = values
+        start += size
+    for output in outputs.values():
+        output.flush()
+
+
+def load(path, mmap_mode='r'):
+    """
+    Reads the columns of a store. Consolidated columns are memory-mapped, the others are
+    read from the chunks
+    :param path: str, directory of a store
+    :param mmap_mode: str or None, mode given to numpy.load for consolidated columns
+    :return: dict <str, numpy array>, the values of each column
+    """
+    meta = read_meta(path)
+    if meta is None:
+        return {}
+    columns = meta['columns']
+    files = column_files(path, columns)
+    if all(os.path.exists(column_file) for column_file in files):
+        return dict((column, numpy.load(column_file, mmap_mode=mmap_mode))
+                    for column, column_file in zip(columns, files))
+    chunks = list(iter_chunks(path))
+    return dict((column, numpy.concatenate([chunk[column] for chunk in chunks])) for column in columns)
@@ -0,0 +1,143 @@
+__author__ = 'nunoe'
+
+import itertools
+from collections import namedtuple
+
+from src.simulation_runner import make_treated_patient
+from src.trials import iter_tasks, seed_trial
+
+PATIENT_PARAMS = ('max_pop', 'max_birth_prob', 'clear_prob', 'mut_prob')
+
+# A drug schedule: name identifies the schedule in the results, prescriptions maps time
+# steps to the list of drugs administered at that step and time_steps is the number of
+# steps to simulate
+Schedule = namedtuple('Schedule', ['name', 'prescriptions', 'time_steps'])
+
+
+def delay_schedules(delays, drugs, treatment_steps):
+    """
+    Builds the schedules of a drug administration delay study
+    :param delays: list of integers, steps at which the drugs are administered
+    :param drugs: list of str, drugs administered after each delay
+    :param treatment_steps: integer, number of steps simulated after the drugs are administered
+    :return: list of Schedule, one per delay
+    """
+    return [Schedule('delay %d' % delay, {delay: list(drugs)}, delay + treatment_steps)
+            for delay in delays]
+
+
+def param_grid(**axes):
+    """
+    Builds the cartesian product of the patient parameter values
+    :param axes: lists of values, keyed by parameter name (see PATIENT_PARAMS)
+    :return: list of dict <str, value>, one per combination of parameter values
+    """
+    names = sorted(axes.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*[axes[name] for name in names])]
+
+
+def run_branches(patient, schedules, time_step, drugs, results):
+    """
+    Simulates a patient under several schedules. The patient is stepped once for as
+    long as the schedules agree and is forked at every step where their prescriptions
+    differ, so shared prefixes such as an untreated phase are only simulated once.
+    Forked count engines draw from their own generator, see CountPatient.fork. An extinct
+    patient stays extinct whatever the drugs, so its remaining schedules end right away
+    :param patient: TreatedPatient or CountTreatedPatient at time_step
+    :param schedules: list of Schedule to follow from time_step on
+    :param time_step: integer, current time step of the patient
+    :param drugs: list of str, drugs against which the resistant population is counted
+    :param results: dict <str, (integer, integer)>, receives the total and resistant population
+        at the end of each schedule, keyed by schedule name
+    """
+    while True:
+        for schedule in schedules:
+            if schedule.time_steps == time_step:
+                results[schedule.name] = (patient.get_total_population(),
+                                          patient.get_resistant_pop(drugs))
+        schedules = [schedule for schedule in schedules if schedule.time_steps > time_step]
+        if not schedules:
+            return
+        if patient.get_total_population() == 0:
+            for schedule in schedules:
+                results[schedule.name] = (0, 0)
+            return
+
+        groups = {}
+        for schedule in schedules:
+            groups.setdefault(tuple(schedule.prescriptions.get(time_step, [])), []).append(schedule)
+        branches = list(groups.values())
+        for branch in branches[1:]:
+            run_branches(patient.fork(), branch, time_step, drugs, results)
+        schedules = branches[0]
+
+        for drug in schedules[0].prescriptions.get(time_step, []):
+            patient.add_prescription(drug)
+        patient.update()
+        time_step += 1
+
+
+def sweep_trial(seed_seq, engine, num_viruses, resistances, params, schedules):
+    """
+    Runs a single trial of a grid point under every schedule. Defined at module level
+    so that it can be executed by the worker processes of iter_tasks
+    :param seed_seq: numpy.random.SeedSequence, seed of the trial
+    :param engine: str, 'object' or 'count', see make_treated_patient
+    :param num_viruses: integer, number of virus instances to create
+    :param resistances: dict <str, boolean>, initial resistances of the virus particles
+    :param params: dict <str, value>, patient parameters of the grid point
+    :param schedules: list of Schedule
+    :return: dict <str, (integer, integer)>, total and resistant population at the end of
+        each schedule
+    """
+    rng = seed_trial(seed_seq)
+    patient = make_treated_patient(engine, num_viruses, params['max_pop'], params['max_birth_prob'],
+                                   params['clear_prob'], resistances, params['mut_prob'], rng)
+    results = {}
+    run_branches(patient, schedules, 0, list(resistances.keys()), results)
+    return results
+
+
+def run_sweep(num_viruses, resistances, grid, schedules, num_trials, engine='count',
+              seed=None, max_workers=1, store=None):
+    """
+    Runs num_trials trials for every combination of grid point and schedule
+    :param num_viruses: integer, number of virus instances to create
+    :param resistances: dict <str, boolean>, initial resistances of the virus particles
+    :param grid: list of dict <str, value>, patient parameters (see PATIENT_PARAMS and param_grid)
+    :param schedules: list of Schedule, drug schedules applied to every grid point
+    :param num_trials: integer, number of trials per grid point
+    :param engine: str, 'count' (default) or 'object', see make_treated_patient
+    :param seed: integer or None, root seed of the trials, see iter_tasks
+    :param max_workers: integer or None, number of worker processes, see iter_tasks
+    :param store: TrialStore or None, when given the rows are appended to it as the trials
+        finish instead of being collected
+    :return: list of dict, one row per grid point, schedule and trial with the patient
+        parameters, 'schedule', 'trial', 'total_pop' and 'resistant_pop'. None when a store
+        is given
+    """
+    for params in grid:
+        missing = [name for name in PATIENT_PARAMS if name not in params]
+        if missing:
+            raise ValueError('Grid point %r is missing parameters %s' % (params, missing))
+
+    tasks = [(engine, num_viruses, resistances, params, schedules)
+             for params in grid for _ in range(num_trials)]
+    results = [None for _ in tasks]
+    for index, result in iter_tasks(sweep_trial, tasks, seed, max_workers):
+        params = grid[index // num_trials]
+        rows = []
+        for schedule in schedules:
+            total_pop, resistant_pop = result[schedule.name]
+            row = dict(params)
+            row.update(schedule=schedule.name, trial=index % num_trials,
+                       total_pop=total_pop, resistant_pop=resistant_pop)
+            rows.append(row)
+        if store is None:
+            results[index] = rows
+        else:
+            store.extend(rows)
+
+    if store is not None:
+        return None
+    return [row for rows in results for row in rows]
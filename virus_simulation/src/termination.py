@@ -0,0 +1,122 @@
+__author__ = 'nunoe'
+
+from collections import deque, namedtuple
+
+EXTINCT = 'extinct'
+STEADY = 'steady'
+
+# Time step at which a trial stopped being simulated and why (EXTINCT or STEADY)
+Stop = namedtuple('Stop', ['step', 'reason'])
+
+
+def equilibrium(max_birth_prob, clear_prob, max_population):
+    """
+    Expected population of an untreated patient at equilibrium. Each time step a fraction
+    clear_prob of the particles clears, then the survivors S reproduce with probability
+    max_birth_prob * (1 - S / max_population), so the population N is stable when
+    N = S * (1 + max_birth_prob * (1 - S / max_population)) with S = N * (1 - clear_prob)
+    :param max_birth_prob: float between 0 and 1, max reproduction probability of each particle
+    :param clear_prob: float between 0 and 1, clearing probability of each particle
+    :param max_population: integer, maximum virus population
+    :return: float, the equilibrium population, 0 when the virus can not sustain itself
+    """
+    if clear_prob >= 1 or max_birth_prob == 0:
+        return 0.0
+    survivor_density = 1 - clear_prob / ((1 - clear_prob) * max_birth_prob)
+    return max(survivor_density, 0.0) * max_population / (1 - clear_prob)
+
+
+class SteadyStateDetector(object):
+    """
+    Detects that a population stopped drifting: the means of the two halves of the last
+    window observations must agree within tolerance. When a target level is given (see
+    equilibrium) the population must also be within tolerance of it, and the target is
+    used as the steady level.
+    """
+
+    def __init__(self, window=50, tolerance=0.05, target=None):
+        """
+        :param window: integer, number of observations considered
+        :param tolerance: float, maximum relative difference between the two half-window means
+            and, if given, between the window mean and target
+        :param target: float or None, expected steady level
+        """
+        self.window = window
+        self.tolerance = tolerance
+        self.target = target
+        self.values = deque(maxlen=window)
+
+    def reset(self):
+        self.values.clear()
+
+    def add(self, value):
+        """
+        Adds an observation
+        :param value: number, latest value of the population
+        :return: boolean, True if the population is steady
+        """
+        self.values.append(value)
+        if len(self.values) < self.window:
+            return False
+        half = self.window // 2
+        values = list(self.values)
+        first = float(sum(values[:half])) / half
+        second = float(sum(values[half:])) / (self.window - half)
+        mean = (first + second) / 2
+        if abs(first - second) > self.tolerance * max(mean, 1.0):
+            return False
+        return self.target is None or abs(mean - self.target) <= self.tolerance * max(self.target, 1.0)
+
+    def get_level(self):
+        """
+        :return: float, the steady level: target when given, the window mean otherwise
+        """
+        if self.target is not None:
+            return self.target
+        return float(sum(self.values)) / max(len(self.values), 1)
+
+
+def run_patient(patient, time_steps, prescriptions=None, drugs_resist=None, detector=None):
+    """
+    Simulates a patient, stopping as soon as the outcome of the remaining time steps is
+    known. An extinct population stays extinct, so the remaining steps are filled with 0.
+    When a detector is given and no prescription is left, a steady population is
+    fast-forwarded in time only: the remaining steps hold the last simulated populations,
+    which are a sample of the steady distribution, so final populations keep their spread
+    across trials
+    :param patient: Patient, TreatedPatient or count-based equivalent
+    :param time_steps: integer, number of time steps to simulate
+    :param prescriptions: dict <integer, list of str> or None, maps time steps to the drugs
+        administered at that step
+    :param drugs_resist: list of str or None, when given the resistant population against these
+        drugs is recorded at each step
+    :param detector: SteadyStateDetector or None, steady states are not detected when None
+    :return: tuple (list of total populations, list of resistant populations or None, Stop or
+        None when every step was simulated)
+    """
+    prescriptions = prescriptions or {}
+    last_prescription = max(prescriptions) if prescriptions else -1
+    total_pop = [0 for _ in range(time_steps)]
+    resistant_pop = None if drugs_resist is None else total_pop[:]
+    if detector is not None:
+        detector.reset()
+
+    for time_step in range(time_steps):
+        for drug in prescriptions.get(time_step, []):
+            patient.add_prescription(drug)
+        total_pop[time_step] = patient.update()
+        if resistant_pop is not None:
+            resistant_pop[time_step] = patient.get_resistant_pop(drugs_resist)
+
+        if total_pop[time_step] == 0:
+            return total_pop, resistant_pop, Stop(time_step, EXTINCT)
+        if detector is None or time_step < last_prescription:
+            continue
+        if detector.add(total_pop[time_step]):
+            for step in range(time_step + 1, time_steps):
+                total_pop[step] = total_pop[time_step]
+                if resistant_pop is not None:
+                    resistant_pop[step] = resistant_pop[time_step]
+            return total_pop, resistant_pop, Stop(time_step, STEADY)
+
+    return total_pop, resistant_pop, None
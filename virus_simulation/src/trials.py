@@ -0,0 +1,92 @@
+__author__ = 'nunoe'
+
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy
+
+
+def spawn_seeds(num_trials, seed=None):
+    """
+    Derives one independent seed per trial from a root seed. The seed of a trial only
+    depends on the root seed and on the trial index, so results can be reproduced
+    regardless of the number of workers or of the order in which trials finish
+    :param num_trials: integer, number of trials
+    :param seed: integer or None, root seed. Fresh entropy is used when None
+    :return: list of numpy.random.SeedSequence, one per trial
+    """
+    return numpy.random.SeedSequence(seed).spawn(num_trials)
+
+
+def seed_trial(seed_seq):
+    """
+    Seeds every source of randomness used by a trial. The global random module is
+    reseeded for code that does not take an rng, and a numpy Generator is returned for the
+    patients. iter_tasks restores the global random state after each trial it runs in the
+    current process
+    :param seed_seq: numpy.random.SeedSequence, seed of the trial
+    :return: numpy.random.Generator, generator seeded from seed_seq
+    """
+    random.seed(int(seed_seq.generate_state(1, numpy.uint64)[0]))
+    return numpy.random.default_rng(seed_seq)
+
+
+def iter_tasks(task_fn, tasks, seed=None, max_workers=1):
+    """
+    Runs independent tasks, each with its own seed, and yields their results as soon as
+    they finish
+    :param task_fn: function called as task_fn(seed_seq, *task). Must be defined at module
+        level so that it can be sent to worker processes
+    :param tasks: list of tuples, the arguments of each task
+    :param seed: integer or None, root seed the per-task seeds are spawned from
+    :param max_workers: integer or None, size of the process pool. Tasks run serially in the
+        current process when 1, None uses one process per core
+    :return: generator of (task index, task result) tuples, in completion order
+    """
+    seeds = spawn_seeds(len(tasks), seed)
+
+    if max_workers == 1:
+        for index, task in enumerate(tasks):
+            # Trials reseed the global random module, keep the caller's state
+            state = random.getstate()
+            try:
+                result = task_fn(seeds[index], *task)
+            finally:
+                random.setstate(state)
+            yield index, result
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = dict((executor.submit(task_fn, seeds[index], *task), index)
+                       for (index, task) in enumerate(tasks))
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
+def iter_trials(trial_fn, args, num_trials, seed=None, max_workers=1):
+    """
+    Runs independent trials and yields their results as soon as they finish
+    :param trial_fn: function called as trial_fn(seed_seq, *args), see iter_tasks
+    :param args: tuple, arguments shared by all the trials
+    :param num_trials: integer, number of trials to run
+    :param seed: integer or None, root seed the per-trial seeds are spawned from
+    :param max_workers: integer or None, size of the process pool, see iter_tasks
+    :return: generator of (trial index, trial result) tuples, in completion order
+    """
+    return iter_tasks(trial_fn, [args for _ in range(num_trials)], seed, max_workers)
+
+
+def run_trials(trial_fn, args, num_trials, seed=None, max_workers=1):
+    """
+    Runs independent trials and collects their results
+    :param trial_fn: function called as trial_fn(seed_seq, *args), see iter_tasks
+    :param args: tuple, arguments shared by all the trials
+    :param num_trials: integer, number of trials to run
+    :param seed: integer or None, root seed the per-trial seeds are spawned from
+    :param max_workers: integer or None, size of the process pool, see iter_tasks
+    :return: list with the result of each trial, ordered by trial index
+    """
+    results = [None for _ in range(num_trials)]
+    for trial, result in iter_trials(trial_fn, args, num_trials, seed, max_workers):
+        results[trial] = result
+    return results
@@ -1,6 +1,26 @@
 __author__ = 'nunoe'
 
 import random
+from types import MappingProxyType
+
+# Canonical read-only resistance profiles, shared by every particle with the same resistances
+_resistance_profiles = {}
+
+
+def intern_resistances(resistances):
+    """
+    Returns the shared read-only instance of a resistance profile. Particles only read
+    their resistances, so all the particles with the same profile can reference a single
+    mapping instead of holding a dict each
+    :param resistances: dict <str, boolean>, maps drug names to the particle's resistance to them
+    :return: read-only mapping equal to resistances
+    """
+    key = frozenset(resistances.items())
+    profile = _resistance_profiles.get(key)
+    if profile is None:
+        profile = MappingProxyType(dict(resistances))
+        _resistance_profiles[key] = profile
+    return profile
 
 
 class NoChildException(Exception):
@@ -14,6 +34,9 @@ class NoChildException(Exception):
 class SimpleVirus(object):
     """ Representation of a Simple Virus without modelling the effects of drugs / resistances """
 
+    # Populations hold a large number of particles, slots avoid a __dict__ per instance
+    __slots__ = ('max_birth_prob', 'clear_prob')
+
     def __init__(self, max_birth_prob, clear_prob):
         """
         :param max_birth_prob: float between 0 and 1, max reproduction probability
@@ -28,14 +51,16 @@ class SimpleVirus(object):
     def get_clear_prob(self):
         return self.clear_prob
 
-    def does_clear(self):
+    def does_clear(self, rng=None):
         """ Stochastically determines whether the virus instance is cleared or not
             the probability is given by self.clear_prob
+        :param rng: object with a random() method (random.Random, BufferedRandom), the global
+            random module is used when None
         :return: boolean, True if the virus instance clears, False otherwise
         """
-        return random.random() < self.clear_prob
+        return (random if rng is None else rng).random() < self.clear_prob
 
-    def reproduce(self, pop_density):
+    def reproduce(self, pop_density, rng=None):
         """ Stochastically determines whether the virus instance reproduces itself
             This method is called from Patient instances.
             The probability that the virus will reproduce is given by
@@ -43,29 +68,59 @@ class SimpleVirus(object):
 
         :param pop_density: float between 0 and 1, current virus population divided by the
             maximum population
+        :param rng: object with a random() method, the global random module is used when None
         :return: if the reproduction succeeds, a new instance of the SimpleVirus class with the same max_birth_prob
             and clear_prob as the current instance. Otherwise an exception is raised
         """
-        if random.random() < self.max_birth_prob * (1 - pop_density):
-            return SimpleVirus(self.max_birth_prob, self.clear_prob)
-        else:
+        child = self.try_reproduce(pop_density, rng)
+        if child is None:
             raise NoChildException()
+        return child
+
+    def try_reproduce(self, pop_density, rng=None):
+        """ Same as reproduce, but signals that the virus instance does not reproduce by
+            returning None instead of raising NoChildException. Used by the update loop of
+            Patient instances, where most particles do not reproduce at each time step.
+
+        :param pop_density: float between 0 and 1, current virus population divided by the
+            maximum population
+        :param rng: object with a random() method, the global random module is used when None
+        :return: a new instance of the SimpleVirus class if the reproduction succeeds, None otherwise
+        """
+        if (random if rng is None else rng).random() < self.max_birth_prob * (1 - pop_density):
+            return self.make_child(rng)
+        return None
+
+    def make_child(self, rng=None):
+        """
+        :param rng: object with a random() method, the global random module is used when None
+        :return: SimpleVirus, the offspring of a successful reproduction
+        """
+        return SimpleVirus(self.max_birth_prob, self.clear_prob)
 
 
 class ResistantVirus(SimpleVirus):
     """ Representation of a virus which can have drug resistances """
+
+    __slots__ = ('resistances', 'mut_prob')
+
     def __init__(self, max_birth_prob, clear_prob, resistances, mut_prob):
         """
         :param max_birth_prob: float between 0 and 1, max reproduction probability
         :param clear_prob: float between 0 and 1, max clearing probability
         :param resistances: dictionary of <drug(str), resistance(boolean)>, maps drug names to the
-            virus particle's resistance to them
+            virus particle's resistance to them. The particle stores the shared read-only copy
+            returned by intern_resistances
         :param mut_prob: float between 0 and 1, mutation probability when the virus reproduces
         """
         SimpleVirus.__init__(self, max_birth_prob, clear_prob)
-        self.resistances = resistances
+        self.resistances = intern_resistances(resistances)
         self.mut_prob = mut_prob
 
+    def __reduce__(self):
+        # Read-only profiles can not be pickled or deep-copied, rebuild them from a plain dict
+        return (ResistantVirus, (self.max_birth_prob, self.clear_prob, dict(self.resistances), self.mut_prob))
+
     def get_resistances(self):
         return self.resistances
 
@@ -79,7 +134,7 @@ class ResistantVirus(SimpleVirus):
         """
         return self.resistances.get(drug, False)
 
-    def reproduce(self, pop_density, active_drugs=[]):
+    def reproduce(self, pop_density, active_drugs=[], rng=None):
         """Stochastically determines whether the virus instance reproduces itself
             This method is called from Patient instances.
             The virus will only be able to reproduce if it is resistant to ALL of the active_drugs. If it is, then
@@ -91,31 +146,84 @@ class ResistantVirus(SimpleVirus):
             maximum population
         :param active_drugs: list of str, contains all the drugs currently in effect (against which the virus'
             resistances myust be checked)
+        :param rng: object with a random() method, the global random module is used when None
         :return: if the reproduction succeeds, a new instance of the SimpleVirus class with the same max_birth_prob
             and clear_prob as the current instance. Otherwise an exception is raised
         """
+        child = self.try_reproduce(pop_density, active_drugs, rng)
+        if child is None:
+            raise NoChildException()
+        return child
+
+    def try_reproduce(self, pop_density, active_drugs=(), rng=None):
+        """ Same as reproduce, but signals that the virus instance does not reproduce by
+            returning None instead of raising NoChildException.
+
+        :param pop_density: float between 0 and 1, current virus population divided by the
+            maximum population
+        :param active_drugs: list of str, contains all the drugs currently in effect
+        :param rng: object with a random() method, the global random module is used when None
+        :return: a new instance of the ResistantVirus class if the reproduction succeeds, None otherwise
+        """
+        working_drugs = [not self.is_resistant_to(drug) for drug in active_drugs]
+        if all(working_drugs) and not len(working_drugs) == 0:
+            return None
+        else:
+            if (random if rng is None else rng).random() <= self.max_birth_prob * (1 - pop_density):
+                return self.make_child(rng)
+            else:
+                return None
+
+    def make_child(self, rng=None):
+        """ Creates the offspring of a successful reproduction. For each resistance, the
+            probability that the new virus will "flip" the progenitor's resistance is given
+            by self.mut_prob
+        :param rng: object with a random() method, the global random module is used when None
+        :return: ResistantVirus, the new particle
+        """
+        rng = random if rng is None else rng
 
         def generate_new_resistances(resistances, mut_prob):
             """ Helper method used to stochastically "flip" the resistances of new viruses
             :param resistances: dict <str, boolean>, maps each drug to True if the parent virus has a
                 resistance to it, False otherwise
             :param mut_prob: float between 0 and 1, parent virus' mutation probability
-            :return: the new list of resistances for the offspring
+            :return: the new list of resistances for the offspring, the parent's own profile when
+                no resistance flips
             """
-            new_res = resistances.copy()
+            new_res = None
 
-            for k in new_res.keys():
-                if random.random() <= mut_prob:
+            for k in resistances.keys():
+                if rng.random() <= mut_prob:
+                    if new_res is None:
+                        new_res = resistances.copy()
                     new_res[k] = not new_res[k]
 
-            return new_res
+            return resistances if new_res is None else new_res
 
-        working_drugs = [not self.is_resistant_to(drug) for drug in active_drugs]
-        if all(working_drugs) and not len(working_drugs) == 0:
-            raise NoChildException()
-        else:
-            if random.random() <= self.max_birth_prob * (1 - pop_density):
-                new_resistances = generate_new_resistances(self.resistances, self.mut_prob)
-                return ResistantVirus(self.max_birth_prob, self.clear_prob, new_resistances, self.mut_prob)
-            else:
-                raise NoChildException()
\ No newline at end of file
+        new_resistances = generate_new_resistances(self.resistances, self.mut_prob)
+        return ResistantVirus(self.max_birth_prob, self.clear_prob, new_resistances, self.mut_prob)
+
+
+def reproduce_all(viruses, pop_density, active_drugs=None, rng=None):
+    """ Reproduces a whole virus population without raising NoChildException for the
+        particles that do not reproduce.
+
+    :param viruses: list of SimpleVirus or ResistantVirus instances
+    :param pop_density: float between 0 and 1, current virus population divided by the
+        maximum population
+    :param active_drugs: list of str, drugs currently in effect, only given to ResistantVirus populations
+    :param rng: object with a random() method, the global random module is used when None.
+        When it also has a uniforms() method (BufferedRandom), the draws of the whole
+        population are taken in one batch
+    :return: list with the offspring of the population
+    """
+    if active_drugs is None and hasattr(rng, 'uniforms'):
+        scale = 1 - pop_density
+        draws = rng.uniforms(len(viruses))
+        return [v.make_child(rng) for v, u in zip(viruses, draws) if u < v.max_birth_prob * scale]
+    if active_drugs is None:
+        children = [v.try_reproduce(pop_density, rng=rng) for v in viruses]
+    else:
+        children = [v.try_reproduce(pop_density, active_drugs, rng) for v in viruses]
+    return [child for child in children if child is not None]
@@ -0,0 +1,121 @@
+__author__ = 'nunoe'
+
+import unittest
+import numpy
+from src.count_patient import CountPatient, CountTreatedPatient
+
+
+class CountPatientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.max_population = 1000
+        self.test_patient = CountPatient(100, 0.1, 0.05, self.max_population,
+                                         numpy.random.default_rng(42))
+
+    def test_get_max_population(self):
+        self.assertEqual(self.test_patient.get_max_population(), self.max_population)
+
+    def test_get_total_population(self):
+        self.assertEqual(self.test_patient.get_total_population(), 100)
+
+    def test_birth_prob(self):
+        self.assertAlmostEqual(self.test_patient.birth_prob(0.5), 0.05)
+        # Overcrowded populations cannot reproduce
+        self.assertEqual(self.test_patient.birth_prob(1.5), 0.0)
+
+    def test_update_clears_everything(self):
+        patient = CountPatient(100, 1.0, 1.0, self.max_population)
+        self.assertEqual(patient.update(), 0)
+
+    def test_update_doubles(self):
+        # No particle clears and every particle reproduces while the density is 0
+        patient = CountPatient(4, 1.0, 0.0, 10 ** 9)
+        self.assertEqual(patient.update(), 8)
+
+    def test_update_is_reproducible(self):
+        other_patient = CountPatient(100, 0.1, 0.05, self.max_population,
+                                     numpy.random.default_rng(42))
+        for _ in range(50):
+            self.assertEqual(self.test_patient.update(), other_patient.update())
+
+    def test_fork(self):
+        child = self.test_patient.fork(numpy.random.default_rng(1))
+        self.test_patient.update()
+        self.assertEqual(child.get_total_population(), 100)
+        self.assertIsNot(child.rng, self.test_patient.rng)
+
+    def test_update_reaches_equilibrium(self):
+        # The deterministic equilibrium for these parameters is close to 500 particles
+        for _ in range(300):
+            self.test_patient.update()
+        self.assertTrue(400 < self.test_patient.get_total_population() < 600)
+
+
+class CountTreatedPatientTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.resistances = {'drug1': True, 'drug2': False}
+        self.test_patient = CountTreatedPatient(100, 0.1, 0.05, self.resistances, 0.005, 1000,
+                                                numpy.random.default_rng(42))
+
+    def test_genotype_counts(self):
+        self.assertEqual(self.test_patient.get_genotype_counts(), {1: 100})
+
+    def test_snapshot_restore(self):
+        self.test_patient.add_prescription('drug1')
+        state = self.test_patient.snapshot()
+        for _ in range(10):
+            self.test_patient.update()
+        self.test_patient.add_prescription('drug2')
+        self.test_patient.restore(state)
+        self.assertEqual(self.test_patient.get_genotype_counts(), {1: 100})
+        self.assertEqual(self.test_patient.get_total_population(), 100)
+        self.assertEqual(self.test_patient.get_prescriptions(), ['drug1'])
+
+    def test_fork(self):
+        child = self.test_patient.fork()
+        child.add_prescription('drug1')
+        child.update()
+        self.assertEqual(self.test_patient.get_genotype_counts(), {1: 100})
+        self.assertEqual(self.test_patient.get_prescriptions(), [])
+
+    def test_prescription(self):
+        self.assertEqual(self.test_patient.get_prescriptions(), [])
+        self.test_patient.add_prescription('drug1')
+        self.test_patient.add_prescription('drug1')
+        self.assertEqual(self.test_patient.get_prescriptions(), ['drug1'])
+
+    def test_get_resistant_pop(self):
+        self.assertEqual(self.test_patient.get_resistant_pop([]), 100)
+        self.assertEqual(self.test_patient.get_resistant_pop(['drug1']), 100)
+        self.assertEqual(self.test_patient.get_resistant_pop(['drug1', 'drug2']), 0)
+        self.assertEqual(self.test_patient.get_resistant_pop(['unknown']), 0)
+
+    def test_mutation_probs(self):
+        probs = CountTreatedPatient._mutation_probs(2, 0.1)
+        self.assertEqual(len(probs), 4)
+        self.assertAlmostEqual(probs[0], 0.81)
+        self.assertAlmostEqual(probs[3], 0.01)
+        self.assertAlmostEqual(probs.sum(), 1.0)
+
+    def test_update_blocked_by_drugs(self):
+        # Particles resistant to none of the drugs in effect cannot reproduce
+        patient = CountTreatedPatient(100, 1.0, 0.0, {'drug1': False}, 0.0, 10 ** 9)
+        patient.add_prescription('drug1')
+        self.assertEqual(patient.update(), 100)
+        # Resistance to any of the drugs in effect lets the particles reproduce
+        patient = CountTreatedPatient(100, 1.0, 0.0, {'drug1': True, 'drug2': False}, 0.0, 10 ** 9)
+        patient.add_prescription('drug1')
+        patient.add_prescription('drug2')
+        self.assertEqual(patient.update(), 200)
+
+    def test_update_mutates(self):
+        # Every resistance flips on reproduction
+        patient = CountTreatedPatient(10, 1.0, 0.0, {'drug1': True, 'drug2': False}, 1.0, 10 ** 9)
+        self.assertEqual(patient.update(), 20)
+        self.assertEqual(patient.get_genotype_counts(), {1: 10, 2: 10})
+        self.assertEqual(patient.get_resistant_pop(['drug2']), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+__author__ = 'nunoe'
+
+import unittest
+import numpy
+from src.count_patient import CountTreatedPatient
+from src.dosing import Regimen, DosingSchedule, simulate_schedule, evaluate_regimens
+
+
+class RegimenTestCase(unittest.TestCase):
+
+    def test_dose_steps(self):
+        self.assertEqual(Regimen('drug1', 2).dose_steps(10), [2])
+        self.assertEqual(Regimen('drug1', 2, interval=3).dose_steps(10), [2, 5, 8])
+        self.assertEqual(Regimen('drug1', 2, stop=6, interval=3).dose_steps(10), [2, 5])
+        self.assertEqual(Regimen('drug1', 12).dose_steps(10), [])
+
+    def test_concentrations(self):
+        regimen = Regimen('drug1', 1, interval=2, decay=0.5)
+        numpy.testing.assert_allclose(regimen.concentrations(5), [0, 1, 0.5, 1.25, 0.625])
+        self.assertEqual(list(regimen.in_effect(5)), [False, True, True, True, True])
+
+    def test_permanent_dose(self):
+        # Without decay a single dose stays in effect, like TreatedPatient.add_prescription
+        self.assertTrue(Regimen('drug1', 3).in_effect(100)[3:].all())
+
+    def test_invalid_regimen(self):
+        for kwargs in ({'interval': 0}, {'interval': -2}, {'dose': 0.0}, {'decay': 1.5}):
+            self.assertRaises(ValueError, Regimen, 'drug1', 2, **kwargs)
+        self.assertRaises(ValueError, Regimen, 'drug1', -1)
+
+
+class DosingScheduleTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.schedule = DosingSchedule([Regimen('drug1', 0, decay=0.5),
+                                        Regimen('drug2', 1),
+                                        Regimen('drug1', 3, decay=0.5)])
+
+    def test_get_drugs(self):
+        self.assertEqual(self.schedule.get_drugs(), ['drug1', 'drug2'])
+
+    def test_prescriptions(self):
+        self.assertEqual(self.schedule.prescriptions(5),
+                         [('drug1',), ('drug1', 'drug2'), ('drug2',), ('drug1', 'drug2'), ('drug1', 'drug2')])
+
+    def test_simulate_schedule(self):
+        # Particles resistant to none of the drugs only reproduce while no drug is in effect
+        patient = CountTreatedPatient(10, 1.0, 0.0, {'drug1': False}, 0.0, 10 ** 9)
+        schedule = DosingSchedule([Regimen('drug1', 1, stop=1, decay=0.5)])
+        total_pop, resistant_pop = simulate_schedule(patient, schedule, 4, ['drug1'])
+        # The dose of step 1 decays to the threshold at step 2 and below it at step 3
+        self.assertEqual(total_pop, [20, 20, 20, 40])
+        self.assertEqual(resistant_pop, [0, 0, 0, 0])
+
+    def test_evaluate_regimens(self):
+        patient = CountTreatedPatient(10, 1.0, 0.0, {'drug1': False}, 0.0, 10 ** 9)
+        schedules = [DosingSchedule([]), DosingSchedule([Regimen('drug1', 0)])]
+        self.assertEqual(evaluate_regimens(patient, schedules, 3), [80, 10])
+        self.assertEqual(patient.get_total_population(), 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+__author__ = 'nunoe'
+
+import unittest
+import numpy
+from src.count_patient import CountPatient
+from src.epidemic import ContactNetwork, Epidemic
+
+
+class ContactNetworkTestCase(unittest.TestCase):
+
+    def test_contacts_are_symmetric(self):
+        network = ContactNetwork(4, [0, 1], [1, 2])
+        self.assertEqual(sorted(zip(network.sources.tolist(), network.targets.tolist())),
+                         [(0, 1), (1, 0), (1, 2), (2, 1)])
+        self.assertEqual(list(network.degrees()), [1, 2, 1, 0])
+
+    def test_random(self):
+        network = ContactNetwork.random(1000, 6, numpy.random.default_rng(1))
+        self.assertEqual(network.get_num_hosts(), 1000)
+        self.assertAlmostEqual(network.degrees().mean(), 6, delta=0.1)
+        self.assertFalse((network.sources == network.targets).any())
+
+
+class EpidemicTestCase(unittest.TestCase):
+
+    def make_epidemic(self, network, **kwargs):
+        params = dict(max_birth_prob=0.1, clear_prob=0.05, max_population=1000, transmission_prob=1.0,
+                      inoculum=500, rng=numpy.random.default_rng(2))
+        params.update(kwargs)
+        return Epidemic(network, **params)
+
+    def test_infect_skips_infected_and_immune_hosts(self):
+        epidemic = self.make_epidemic(ContactNetwork(4, [], []))
+        self.assertEqual(list(epidemic.infect([0, 1, 1])), [0, 1])
+        epidemic.immune[2] = True
+        self.assertEqual(list(epidemic.infect([0, 2, 3])), [3])
+        self.assertEqual(list(epidemic.get_loads()), [500, 500, 0, 500])
+
+    def test_uninfected_hosts_keep_no_state(self):
+        epidemic = self.make_epidemic(ContactNetwork(3, [], []))
+        epidemic.infect([1])
+        epidemic.update()
+        self.assertEqual(epidemic.get_loads()[0], 0)
+        self.assertEqual(epidemic.get_loads()[2], 0)
+        self.assertEqual(epidemic.get_num_infected(), 1)
+
+    def test_transmission_along_contacts(self):
+        # A host at max_population infects each of its contacts with probability 1
+        network = ContactNetwork(5, [0, 0], [1, 2])
+        epidemic = self.make_epidemic(network, max_birth_prob=0.0, clear_prob=0.0, inoculum=1000)
+        epidemic.infect([0])
+        epidemic.update()
+        self.assertEqual(list(epidemic.get_loads() > 0), [True, True, True, False, False])
+
+    def test_cleared_hosts_become_immune(self):
+        network = ContactNetwork(2, [0], [1])
+        epidemic = self.make_epidemic(network, clear_prob=1.0, transmission_prob=0.0)
+        epidemic.infect([0])
+        epidemic.update()
+        self.assertEqual(epidemic.get_num_infected(), 0)
+        self.assertEqual(epidemic.get_num_immune(), 1)
+        self.assertEqual(len(epidemic.infect([0])), 0)
+
+    def test_without_immunity(self):
+        epidemic = self.make_epidemic(ContactNetwork(1, [], []), clear_prob=1.0, immunity=False)
+        epidemic.infect([0])
+        epidemic.update()
+        self.assertEqual(len(epidemic.infect([0])), 1)
+
+    def test_within_host_matches_count_patient(self):
+        # Isolated hosts follow the same dynamics as CountPatient
+        epidemic = self.make_epidemic(ContactNetwork(2000, [], []), inoculum=100)
+        epidemic.infect(numpy.arange(2000))
+        for _ in range(20):
+            epidemic.update()
+        patients = [CountPatient(100, 0.1, 0.05, 1000, numpy.random.default_rng(seed)) for seed in range(2000)]
+        for _ in range(20):
+            for patient in patients:
+                patient.update()
+        expected = numpy.mean([patient.get_total_population() for patient in patients])
+        self.assertAlmostEqual(epidemic.get_loads().mean(), expected, delta=0.02 * expected)
+
+    def test_patient_factory(self):
+        created = []
+
+        def factory(host, inoculum):
+            created.append(host)
+            return CountPatient(inoculum, 0.1, 0.05, 1000, numpy.random.default_rng(host))
+
+        network = ContactNetwork(10, [0], [1])
+        epidemic = self.make_epidemic(network, transmission_prob=0.0, patient_factory=factory)
+        epidemic.infect([0])
+        infected, total_load = epidemic.run(5)
+        self.assertEqual(created, [0])
+        self.assertIsNone(epidemic.get_patient(1))
+        self.assertEqual(epidemic.get_patient(0).get_total_population(), total_load[-1])
+        self.assertEqual(list(infected), [1] * 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,10 @@
 __author__ = 'nunoe'
 
+import random
 import unittest
 from unittest import mock
 from src.patient import Patient, TreatedPatient
+from src.virus import ResistantVirus
 
 
 class PatientTestCase(unittest.TestCase):
@@ -11,11 +13,13 @@ class PatientTestCase(unittest.TestCase):
         # Create 2 virus instance mocks
         v1 = mock.Mock()
         attr1 = {'does_clear.return_value': True,
-                 'reproduce.return_value': v1}
+                 'reproduce.return_value': v1,
+                 'try_reproduce.return_value': v1}
         v1.configure_mock(**attr1)
         v2 = mock.Mock()
         attr2 = {'does_clear.return_value': False,
-                 'reproduce.return_value': v2}
+                 'reproduce.return_value': v2,
+                 'try_reproduce.return_value': v2}
         v2.configure_mock(**attr2)
 
         self.viruses = [v1, v2]
@@ -37,6 +41,19 @@ class PatientTestCase(unittest.TestCase):
         # Population grows by 2^n, the Patient class does not enforce the max_population
         self.assertEqual(self.test_patient.update(), 4)
 
+    def test_snapshot_restore(self):
+        state = self.test_patient.snapshot()
+        self.test_patient.update()
+        self.test_patient.restore(state)
+        self.assertEqual(self.test_patient.get_viruses(), self.viruses)
+
+    def test_fork(self):
+        child = self.test_patient.fork()
+        self.assertEqual(self.test_patient.update(), 2)
+        # The fork keeps the state it had when it was created
+        self.assertEqual(child.get_viruses(), self.viruses)
+        self.assertEqual(child.get_max_population(), self.max_population)
+
 
 class TreatedPatientTestCase(unittest.TestCase):
 
@@ -45,11 +62,13 @@ class TreatedPatientTestCase(unittest.TestCase):
         v1 = mock.Mock()
         attr1 = {'does_clear.return_value': True,
                  'reproduce.return_value': v1,
+                 'try_reproduce.return_value': v1,
                  'is_resistant_to.return_value': False}
         v1.configure_mock(**attr1)
         v2 = mock.Mock()
         attr2 = {'does_clear.return_value': False,
                  'reproduce.return_value': v2,
+                 'try_reproduce.return_value': v2,
                  'is_resistant_to.return_value': True}
         v2.configure_mock(**attr2)
 
@@ -62,11 +81,58 @@ class TreatedPatientTestCase(unittest.TestCase):
         self.test_patient.add_prescription('drug1')
         self.assertEqual(self.test_patient.get_prescriptions(), ['drug1'])
 
+    def test_set_prescriptions(self):
+        self.test_patient.add_prescription('drug1')
+        self.test_patient.set_prescriptions(('drug2',))
+        self.assertEqual(self.test_patient.get_prescriptions(), ['drug2'])
+
+    def test_update_with_drugs(self):
+        # v1 dies, v2 is resistant and reproduces
+        self.test_patient.add_prescription('drug1')
+        self.assertEqual(self.test_patient.update(), 2)
+        self.assertEqual(self.test_patient.update(), 4)
+
     def test_get_resistant_pop(self):
         self.assertEqual(self.test_patient.get_resistant_pop(['drug1']), 1)
         self.test_patient.update()
         self.assertEqual(self.test_patient.get_resistant_pop(['drug1']), 2)
 
+    def test_track_resistance(self):
+        key = self.test_patient.track_resistance(['drug1', 'drug2'])
+        self.assertEqual(self.test_patient.resistant_counts, {key: 1})
+        # Later updates adjust the tally of each profile, the resistances of a profile are
+        # only checked once
+        self.viruses[1].is_resistant_to.reset_mock()
+        self.test_patient.update()
+        self.assertEqual(self.viruses[1].is_resistant_to.call_count, 0)
+        self.assertEqual(self.test_patient.get_resistant_pop(['drug2', 'drug1']), 2)
+        self.assertEqual(sorted(self.test_patient.profile_counts.values()), [0, 2])
+        # A set of drugs tracked later is counted from the profiles
+        self.assertEqual(self.test_patient.get_resistant_pop(['drug1']), 2)
+        self.assertEqual(self.viruses[1].is_resistant_to.call_count, 1)
+
+    def test_resistant_counts_follow_mutations(self):
+        viruses = [ResistantVirus(0.3, 0.05, {'drug1': False, 'drug2': True}, 0.2) for _ in range(50)]
+        patient = TreatedPatient(viruses, 500, random.Random(3))
+        patient.track_resistance(['drug1'])
+        for time_step in range(40):
+            if time_step == 20:
+                patient.add_prescription('drug2')
+            patient.update()
+            for drugs in (['drug1'], ['drug1', 'drug2'], []):
+                expected = len([v for v in patient.get_viruses() if all([v.is_resistant_to(drug) for drug in drugs])])
+                self.assertEqual(patient.get_resistant_pop(drugs), expected)
+
+    def test_fork(self):
+        self.test_patient.add_prescription('drug1')
+        self.test_patient.track_resistance(['drug1'])
+        child = self.test_patient.fork()
+        self.test_patient.add_prescription('drug2')
+        self.test_patient.update()
+        self.assertEqual(child.get_prescriptions(), ['drug1'])
+        self.assertEqual(child.get_total_population(), 2)
+        self.assertEqual(child.get_resistant_pop(['drug1']), 1)
+
     def test_update(self):
         # v1 dies, v2 reproduces
         self.assertEqual(self.test_patient.update(), 2)
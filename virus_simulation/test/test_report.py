@@ -0,0 +1,61 @@
+__author__ = 'nunoe'
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from src.simulation_runner import simulation_with_drugs, simulation_with_drugs_hist
+from src.stats import TrajectoryStats
+
+
+class ReportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_runners_do_not_import_matplotlib(self):
+        code = ('import sys; import src.simulation_runner, src.sweep; '
+                'sys.exit(any(name.startswith("matplotlib") for name in sys.modules))')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(subprocess.call([sys.executable, '-c', code], cwd=root), 0)
+
+    def test_plot_trajectories(self):
+        from src import report
+        stats = TrajectoryStats(3)
+        stats.add([1, 2, 3])
+        stats.add([3, 4, 5])
+        path = report.plot_trajectories(os.path.join(self.path, 'pop.png'), [('pop', stats, 'b')], 'title')
+        self.assertGreater(os.path.getsize(path), 0)
+
+    def test_plot_curves(self):
+        from src import report
+        path = report.plot_curves(os.path.join(self.path, 'pop.png'), [('', [1, 2, 3], 'b-')], 'title')
+        self.assertGreater(os.path.getsize(path), 0)
+
+    def test_plot_histogram(self):
+        from src import report
+        for values in ([3, 1, 3, 2], []):
+            path = report.plot_histogram(os.path.join(self.path, 'hist.png'), values, 'title')
+            self.assertGreater(os.path.getsize(path), 0)
+
+    def test_runner_plot_to(self):
+        hist = os.path.join(self.path, 'hist.png')
+        final_pop = simulation_with_drugs_hist(100, 1000, 0.1, 0.05, {'drug1': False}, 0.005, 4, 50, 25,
+                                               engine='count', seed=1, plot_to=hist)
+        self.assertEqual(len(final_pop), 4)
+        self.assertTrue(os.path.exists(hist))
+
+        trajectories = os.path.join(self.path, 'trajectories.svg')
+        pop_stats, res_stats = simulation_with_drugs(100, 1000, 0.1, 0.05, {'drug1': False}, 0.005, 2, 50, 25,
+                                                     engine='count', plot_to=trajectories)
+        self.assertEqual(pop_stats.get_count(), 2)
+        self.assertTrue(os.path.exists(trajectories))
+
+
+if __name__ == '__main__':
+    unittest.main()
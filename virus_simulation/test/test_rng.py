@@ -0,0 +1,98 @@
+__author__ = 'nunoe'
+
+import random
+import unittest
+import numpy
+from src.rng import BufferedRandom, make_rng
+from src.patient import Patient, TreatedPatient
+from src.virus import SimpleVirus, ResistantVirus
+
+
+class BufferedRandomTestCase(unittest.TestCase):
+
+    def test_same_stream_as_generator(self):
+        rng = BufferedRandom(numpy.random.default_rng(3), batch_size=4)
+        draws = [rng.random() for _ in range(10)]
+        numpy.testing.assert_array_equal(draws, numpy.random.default_rng(3).random(12)[:10])
+
+    def test_uniforms_continue_the_buffer(self):
+        rng = BufferedRandom(5, batch_size=4)
+        first = rng.random()
+        batch = rng.uniforms(6)
+        expected = numpy.random.default_rng(5).random(4).tolist()
+        self.assertEqual([first] + batch[:3], expected)
+        self.assertEqual(len(batch), 6)
+
+    def test_spawn(self):
+        rng = BufferedRandom(5)
+        self.assertNotEqual(rng.spawn().random(), BufferedRandom(5).random())
+
+    def test_make_rng(self):
+        self.assertIsNone(make_rng(None))
+        self.assertIsInstance(make_rng(numpy.random.default_rng()), BufferedRandom)
+        generator = random.Random(1)
+        self.assertIs(make_rng(generator), generator)
+
+
+class PatientRngTestCase(unittest.TestCase):
+
+    def trajectory(self, seed):
+        viruses = [SimpleVirus(0.1, 0.05) for _ in range(100)]
+        patient = Patient(viruses, 1000, numpy.random.default_rng(seed))
+        return [patient.update() for _ in range(50)]
+
+    def test_reproducible(self):
+        # The same seed gives the same trajectory whatever the global random module does
+        random.seed(1)
+        first = self.trajectory(7)
+        random.seed(2)
+        self.assertEqual(self.trajectory(7), first)
+        self.assertNotEqual(self.trajectory(8), first)
+
+    def test_random_instance(self):
+        viruses = [ResistantVirus(0.1, 0.05, {'drug1': False}, 0.1) for _ in range(100)]
+        patients = [TreatedPatient(viruses[:], 1000, random.Random(4)) for _ in range(2)]
+        for patient in patients:
+            patient.add_prescription('drug1')
+            for _ in range(30):
+                patient.update()
+        self.assertEqual(patients[0].get_total_population(), patients[1].get_total_population())
+        self.assertEqual(patients[0].get_resistant_pop(['drug1']), patients[1].get_resistant_pop(['drug1']))
+
+    def test_update_draws_in_bulk(self):
+        class CountingRandom(BufferedRandom):
+            calls = 0
+
+            def random(self):
+                CountingRandom.calls += 1
+                return BufferedRandom.random(self)
+
+        patient = Patient([SimpleVirus(0.1, 0.05) for _ in range(100)], 1000, CountingRandom(3))
+        for _ in range(20):
+            patient.update()
+        self.assertEqual(CountingRandom.calls, 0)
+        self.assertGreater(patient.get_total_population(), 0)
+
+    def test_fork_is_independent(self):
+        viruses = [SimpleVirus(0.1, 0.05) for _ in range(100)]
+        patient = Patient(viruses, 1000, numpy.random.default_rng(9))
+        child = patient.fork()
+        self.assertIsNot(child.rng, patient.rng)
+        self.assertNotEqual([child.update() for _ in range(20)], [patient.update() for _ in range(20)])
+
+    def test_fork_derives_a_generator(self):
+        for rng in (None, random.Random(5)):
+            patient = Patient([SimpleVirus(0.1, 0.05) for _ in range(100)], 1000, rng)
+            child = patient.fork()
+            self.assertIsInstance(child.rng, random.Random)
+            self.assertIsNot(child.rng, patient.rng)
+            self.assertNotEqual([child.update() for _ in range(20)], [patient.update() for _ in range(20)])
+        # Forks of a seeded patient are reproducible
+        forks = [Patient([], 10, random.Random(6)).fork().rng.random() for _ in range(2)]
+        self.assertEqual(forks[0], forks[1])
+        child = Patient([], 10).fork(numpy.random.default_rng(7))
+        self.assertIsInstance(child.rng, BufferedRandom)
+
+
+if __name__ == '__main__':
+    unittest.main()
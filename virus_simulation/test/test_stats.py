@@ -0,0 +1,60 @@
+__author__ = 'nunoe'
+
+import unittest
+import numpy
+from src.stats import RunningStats, P2Quantile, TrajectoryStats
+
+
+class RunningStatsTestCase(unittest.TestCase):
+
+    def test_mean_variance(self):
+        data = numpy.random.default_rng(0).normal(size=(1000, 3))
+        stats = RunningStats((3,))
+        for row in data:
+            stats.add(row)
+        self.assertEqual(stats.get_count(), 1000)
+        numpy.testing.assert_allclose(stats.get_mean(), data.mean(axis=0))
+        numpy.testing.assert_allclose(stats.get_variance(), data.var(axis=0, ddof=1))
+
+    def test_confidence_band(self):
+        stats = RunningStats()
+        for value in [1, 2, 3, 4]:
+            stats.add(value)
+        lower, upper = stats.get_confidence_band()
+        self.assertAlmostEqual((lower + upper) / 2, 2.5)
+        self.assertAlmostEqual(upper - lower, 2 * 1.96 * numpy.sqrt(5.0 / 3) / 2)
+
+
+class P2QuantileTestCase(unittest.TestCase):
+
+    def test_few_observations(self):
+        estimator = P2Quantile(0.5)
+        for value in [3, 1, 2]:
+            estimator.add(value)
+        self.assertEqual(estimator.get_quantile(), 2)
+
+    def test_quantiles(self):
+        data = numpy.random.default_rng(1).normal(size=(5000, 2)) * [1, 10]
+        for quantile in (0.05, 0.5, 0.95):
+            estimator = P2Quantile(quantile, (2,))
+            for row in data:
+                estimator.add(row)
+            error = numpy.abs(estimator.get_quantile() - numpy.quantile(data, quantile, axis=0))
+            self.assertTrue(numpy.all(error < [0.1, 1]))
+
+
+class TrajectoryStatsTestCase(unittest.TestCase):
+
+    def test_add(self):
+        stats = TrajectoryStats(3, quantiles=(0.5,))
+        for trajectory in [[1, 2, 3], [3, 4, 5], [2, 3, 4]]:
+            stats.add(trajectory)
+        numpy.testing.assert_allclose(stats.get_mean(), [2, 3, 4])
+        numpy.testing.assert_allclose(stats.get_quantile(0.5), [2, 3, 4])
+
+    def test_add_wrong_length(self):
+        self.assertRaises(ValueError, TrajectoryStats(3).add, [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
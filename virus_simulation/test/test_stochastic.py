@@ -0,0 +1,62 @@
+__author__ = 'nunoe'
+
+import unittest
+import numpy
+from src.stochastic import leap, gillespie, StochasticPatient, StochasticTreatedPatient
+
+
+class StochasticFunctionsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.rng = numpy.random.default_rng(42)
+        self.no_mutation = numpy.array([1.0, 0.0])
+
+    def test_leap_without_events(self):
+        counts = leap({0: 10, 1: 5}, 0.0, 0.0, 100, lambda g: True, self.no_mutation, 1.0, self.rng)
+        self.assertEqual(counts, {0: 10, 1: 5})
+
+    def test_leap_blocked_genotypes(self):
+        counts = leap({0: 10, 1: 5}, 1.0, 0.0, 10 ** 9, lambda g: g == 1, self.no_mutation, 1.0, self.rng)
+        self.assertEqual(counts[0], 10)
+        self.assertTrue(counts[1] > 5)
+
+    def test_gillespie_extinction(self):
+        # Without births every particle eventually clears
+        counts = gillespie({0: 10}, 0.0, 1.0, 100, lambda g: True, self.no_mutation, 100.0, self.rng)
+        self.assertEqual(counts, {})
+
+    def test_gillespie_mutation(self):
+        # Every offspring of genotype 0 mutates, and mutants can not reproduce
+        counts = gillespie({0: 10}, 1.0, 0.0, 10 ** 9, lambda g: g == 0, numpy.array([0.0, 1.0]), 1.0, self.rng)
+        self.assertEqual(counts[0], 10)
+        self.assertTrue(counts[1] > 0)
+
+
+class StochasticPatientTestCase(unittest.TestCase):
+
+    def test_unknown_method(self):
+        self.assertRaises(ValueError, StochasticPatient, 100, 0.1, 0.05, 1000, method='euler')
+
+    def test_method_switch(self):
+        patient = StochasticPatient(50, 0.1, 0.05, 1000, numpy.random.default_rng(0), exact_below=100)
+        self.assertTrue(patient.uses_exact())
+        patient = StochasticPatient(500, 0.1, 0.05, 1000, numpy.random.default_rng(0), exact_below=100)
+        self.assertFalse(patient.uses_exact())
+
+    def test_update_reaches_equilibrium(self):
+        # The equilibrium of the continuous-time model is max_pop * (1 - clear_prob / max_birth_prob)
+        patient = StochasticPatient(100, 0.1, 0.05, 1000, numpy.random.default_rng(0))
+        for _ in range(300):
+            patient.update()
+        self.assertTrue(400 < patient.get_total_population() < 600)
+
+    def test_treated_update_blocked_by_drugs(self):
+        patient = StochasticTreatedPatient(100, 1.0, 0.0, {'drug1': False}, 0.0, 10 ** 9,
+                                           numpy.random.default_rng(0), method='tau')
+        patient.add_prescription('drug1')
+        self.assertEqual(patient.update(), 100)
+        self.assertEqual(patient.get_resistant_pop(['drug1']), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
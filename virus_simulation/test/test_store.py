@@ -0,0 +1,110 @@
+__author__ = 'nunoe'
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy
+from src.simulation_runner import store_treated_trials, trajectory_trial
+from src.store import TrialStore, chunk_files, consolidate, iter_chunks, load
+from src.sweep import delay_schedules, param_grid, run_sweep
+from src.trials import spawn_seeds
+
+
+class TrialStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def rows(self, num_rows):
+        return [{'trial': i, 'schedule': 'delay %d' % i, 'total_pop': [i, i + 1, i + 2]} for i in range(num_rows)]
+
+    def test_chunks(self):
+        with TrialStore(self.path, chunk_size=4) as store:
+            store.extend(self.rows(10))
+            self.assertEqual(len(chunk_files(self.path)), 2)
+        self.assertEqual([len(chunk['trial']) for chunk in iter_chunks(self.path)], [4, 4, 2])
+
+    def test_load(self):
+        with TrialStore(self.path, chunk_size=4) as store:
+            store.extend(self.rows(10))
+        columns = load(self.path)
+        self.assertEqual(list(columns['trial']), list(range(10)))
+        self.assertEqual(columns['schedule'][3], 'delay 3')
+        self.assertEqual(columns['total_pop'].shape, (10, 3))
+
+    def test_append_to_existing_store(self):
+        with TrialStore(self.path, chunk_size=4) as store:
+            store.extend(self.rows(5))
+        with TrialStore(self.path, chunk_size=4) as store:
+            store.extend(self.rows(3))
+        self.assertEqual(list(load(self.path)['trial']), [0, 1, 2, 3, 4, 0, 1, 2])
+
+    def test_consolidate(self):
+        with TrialStore(self.path, chunk_size=4) as store:
+            store.extend(self.rows(10))
+        consolidate(self.path)
+        self.assertTrue(os.path.exists(os.path.join(self.path, 'total_pop.npy')))
+        columns = load(self.path)
+        self.assertIsInstance(columns['total_pop'], numpy.memmap)
+        numpy.testing.assert_array_equal(columns['total_pop'][9], [9, 10, 11])
+        # Strings of different lengths across chunks are widened to the longest one
+        self.assertEqual(columns['schedule'][9], 'delay 9')
+
+    def test_append_after_consolidate(self):
+        with TrialStore(self.path, chunk_size=4) as store:
+            store.extend(self.rows(5))
+        consolidate(self.path)
+        with TrialStore(self.path, chunk_size=4) as store:
+            store.extend(self.rows(3))
+        self.assertFalse(os.path.exists(os.path.join(self.path, 'total_pop.npy')))
+        self.assertEqual(list(load(self.path)['trial']), [0, 1, 2, 3, 4, 0, 1, 2])
+        consolidate(self.path)
+        self.assertEqual(load(self.path)['total_pop'].shape, (8, 3))
+
+    def test_wrong_columns(self):
+        store = TrialStore(self.path)
+        store.append({'trial': 0})
+        self.assertRaises(ValueError, store.append, {'trial': 1, 'total_pop': 3})
+
+    def test_empty_store(self):
+        self.assertEqual(load(self.path), {})
+
+
+class StoreRunnersTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_store_treated_trials(self):
+        with TrialStore(self.path, chunk_size=2) as store:
+            seed = store_treated_trials(store, 100, 1000, 0.1, 0.05, {'drug1': False}, 0.005, 5, 100,
+                                        {50: ['drug1']})
+        columns = load(self.path)
+        self.assertEqual(columns['total_pop'].shape, (5, 100))
+        # The recorded seeds reproduce the trials
+        trial = int(columns['trial'][3])
+        total_pop, resistant_pop, _ = trajectory_trial(spawn_seeds(5, int(columns['seed'][3]))[trial], 'count',
+                                                       100, 1000, 0.1, 0.05, {'drug1': False}, 0.005, 100,
+                                                       {50: ['drug1']})
+        self.assertEqual(int(columns['seed'][0]), seed)
+        self.assertEqual(list(columns['total_pop'][3]), total_pop)
+        self.assertEqual(list(columns['resistant_pop'][3]), resistant_pop)
+
+    def test_run_sweep_store(self):
+        grid = param_grid(max_pop=[1000], max_birth_prob=[0.1], clear_prob=[0.05], mut_prob=[0.005])
+        schedules = delay_schedules([0, 10], ['drug1'], 10)
+        with TrialStore(self.path) as store:
+            self.assertIsNone(run_sweep(100, {'drug1': False}, grid, schedules, 3, seed=1, store=store))
+        rows = run_sweep(100, {'drug1': False}, grid, schedules, 3, seed=1)
+        self.assertEqual(sorted(load(self.path)['total_pop'].tolist()), sorted(row['total_pop'] for row in rows))
+
+
+if __name__ == '__main__':
+    unittest.main()
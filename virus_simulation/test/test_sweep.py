@@ -0,0 +1,57 @@
+__author__ = 'nunoe'
+
+import unittest
+from unittest import mock
+from src.sweep import Schedule, delay_schedules, param_grid, run_branches, run_sweep
+
+
+class SweepTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.grid = param_grid(max_pop=[1000], max_birth_prob=[0.1], clear_prob=[0.05],
+                               mut_prob=[0.005, 0.05])
+        self.schedules = delay_schedules([20, 10, 0], ['drug1'], 10)
+
+    def test_param_grid(self):
+        self.assertEqual(len(self.grid), 2)
+        self.assertEqual(self.grid[1], {'max_pop': 1000, 'max_birth_prob': 0.1,
+                                        'clear_prob': 0.05, 'mut_prob': 0.05})
+
+    def test_delay_schedules(self):
+        self.assertEqual(self.schedules[1], Schedule('delay 10', {10: ['drug1']}, 20))
+
+    def test_run_branches_shares_prefix(self):
+        patient = mock.Mock()
+        patient.configure_mock(**{'get_total_population.return_value': 1,
+                                  'get_resistant_pop.return_value': 0,
+                                  'fork.return_value': patient})
+        results = {}
+        run_branches(patient, self.schedules, 0, ['drug1'], results)
+        self.assertEqual(sorted(results.keys()), ['delay 0', 'delay 10', 'delay 20'])
+        # Untreated steps are shared: 30 steps for delay 20 plus the 10 treated steps of
+        # each fork, instead of 10 + 20 + 30 steps without forking
+        self.assertEqual(patient.update.call_count, 50)
+
+    def test_run_branches_stops_extinct_patients(self):
+        patient = mock.Mock()
+        patient.configure_mock(**{'get_total_population.return_value': 0,
+                                  'fork.return_value': patient})
+        results = {}
+        run_branches(patient, self.schedules, 0, ['drug1'], results)
+        self.assertEqual(results, {'delay 0': (0, 0), 'delay 10': (0, 0), 'delay 20': (0, 0)})
+        self.assertEqual(patient.update.call_count, 0)
+
+    def test_run_sweep(self):
+        rows = run_sweep(100, {'drug1': False}, self.grid, self.schedules, 3, seed=42)
+        self.assertEqual(len(rows), 2 * 3 * 3)
+        self.assertEqual(rows, run_sweep(100, {'drug1': False}, self.grid, self.schedules, 3, seed=42))
+        self.assertEqual(set(row['schedule'] for row in rows), set(s.name for s in self.schedules))
+        self.assertTrue(all(row['resistant_pop'] <= row['total_pop'] for row in rows))
+
+    def test_run_sweep_missing_params(self):
+        self.assertRaises(ValueError, run_sweep, 100, {'drug1': False}, [{'max_pop': 1000}],
+                          self.schedules, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+__author__ = 'nunoe'
+
+import unittest
+import numpy
+from src.count_patient import CountPatient, CountTreatedPatient
+from src.simulation_runner import simulation_with_drugs_hist
+from src.termination import EXTINCT, STEADY, Stop, SteadyStateDetector, equilibrium, run_patient
+
+
+class EquilibriumTestCase(unittest.TestCase):
+
+    def test_equilibrium(self):
+        self.assertAlmostEqual(equilibrium(0.1, 0.05, 1000), 498.615, places=3)
+        # The virus clears faster than it reproduces
+        self.assertEqual(equilibrium(0.01, 0.05, 1000), 0.0)
+        self.assertEqual(equilibrium(0.0, 0.05, 1000), 0.0)
+
+    def test_matches_simulation(self):
+        patients = [CountPatient(100, 0.1, 0.05, 1000, numpy.random.default_rng(seed)) for seed in range(50)]
+        populations = []
+        for patient in patients:
+            populations.extend([patient.update() for _ in range(600)][300:])
+        self.assertAlmostEqual(numpy.mean(populations), equilibrium(0.1, 0.05, 1000), delta=10)
+
+
+class SteadyStateDetectorTestCase(unittest.TestCase):
+
+    def test_detects_flat_window(self):
+        detector = SteadyStateDetector(window=4, tolerance=0.05)
+        self.assertEqual([detector.add(value) for value in (10, 100, 100, 100, 100)],
+                         [False, False, False, False, True])
+        self.assertEqual(detector.get_level(), 100)
+
+    def test_target(self):
+        detector = SteadyStateDetector(window=4, tolerance=0.05, target=200.0)
+        self.assertFalse(any(detector.add(100) for _ in range(10)))
+        self.assertTrue(any(detector.add(201) for _ in range(10)))
+        self.assertEqual(detector.get_level(), 200.0)
+
+
+class RunPatientTestCase(unittest.TestCase):
+
+    def test_extinction(self):
+        patient = CountPatient(10, 0.0, 0.5, 1000, numpy.random.default_rng(1))
+        total_pop, resistant_pop, stop = run_patient(patient, 200)
+        self.assertEqual(stop.reason, EXTINCT)
+        self.assertEqual(total_pop[stop.step], 0)
+        self.assertTrue(all(pop > 0 for pop in total_pop[:stop.step]))
+        self.assertEqual(total_pop[stop.step:], [0] * (200 - stop.step))
+        self.assertIsNone(resistant_pop)
+
+    def test_steady_state_waits_for_prescriptions(self):
+        patient = CountTreatedPatient(100, 0.1, 0.05, {'drug1': True}, 0.0, 1000, numpy.random.default_rng(2))
+        total_pop, resistant_pop, stop = run_patient(patient, 1000, {400: ['drug1']}, ['drug1'],
+                                                     SteadyStateDetector())
+        self.assertEqual(stop.reason, STEADY)
+        self.assertGreaterEqual(stop.step, 400)
+        self.assertEqual(patient.get_prescriptions(), ['drug1'])
+        self.assertEqual(total_pop[stop.step:], [total_pop[stop.step]] * (1000 - stop.step))
+        self.assertEqual(resistant_pop[-1], resistant_pop[stop.step])
+
+    def test_steady_final_populations_keep_their_spread(self):
+        final_pop = []
+        for seed in range(20):
+            patient = CountPatient(100, 0.1, 0.05, 1000, numpy.random.default_rng(seed))
+            total_pop, _, stop = run_patient(patient, 1000, detector=SteadyStateDetector())
+            self.assertEqual(stop.reason, STEADY)
+            final_pop.append(total_pop[-1])
+        self.assertGreater(numpy.std(final_pop), 5)
+
+    def test_without_detector(self):
+        patient = CountPatient(100, 0.1, 0.05, 1000, numpy.random.default_rng(3))
+        total_pop, _, stop = run_patient(patient, 300)
+        self.assertIsNone(stop)
+        self.assertEqual(total_pop[-1], patient.get_total_population())
+
+    def test_hist_runner_records_stops(self):
+        final_pop, stops = simulation_with_drugs_hist(100, 1000, 0.1, 0.05, {'guttagonol': False}, 0.0, 5,
+                                                      300, 0, engine='count', seed=4, return_stops=True)
+        self.assertEqual(final_pop, [0] * 5)
+        self.assertTrue(all(stop.reason == EXTINCT for stop in stops))
+        self.assertIsInstance(stops[0], Stop)
+        self.assertEqual(simulation_with_drugs_hist(100, 1000, 0.1, 0.05, {'guttagonol': False}, 0.0, 5, 300, 0,
+                                                    engine='count', seed=4), final_pop)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+__author__ = 'nunoe'
+
+import random
+import unittest
+from src.trials import spawn_seeds, seed_trial, iter_trials, run_trials
+
+
+def draw_trial(seed_seq, offset):
+    rng = seed_trial(seed_seq)
+    return offset + random.random() + rng.random()
+
+
+class TrialsTestCase(unittest.TestCase):
+
+    def test_spawn_seeds(self):
+        seeds = spawn_seeds(3, 42)
+        self.assertEqual(len(seeds), 3)
+        self.assertEqual([s.spawn_key for s in seeds], [(0,), (1,), (2,)])
+
+    def test_run_trials_is_reproducible(self):
+        results = run_trials(draw_trial, (10,), 5, seed=42)
+        self.assertEqual(results, run_trials(draw_trial, (10,), 5, seed=42))
+        self.assertEqual(len(set(results)), 5)
+        self.assertTrue(all(10 <= r < 12 for r in results))
+
+    def test_run_trials_in_pool(self):
+        # Results do not depend on the number of workers
+        self.assertEqual(run_trials(draw_trial, (0,), 8, seed=7, max_workers=2),
+                         run_trials(draw_trial, (0,), 8, seed=7))
+
+    def test_serial_trials_keep_global_random_state(self):
+        random.seed(3)
+        expected = random.random()
+        random.seed(3)
+        run_trials(draw_trial, (0,), 3, seed=1)
+        self.assertEqual(random.random(), expected)
+
+    def test_iter_trials(self):
+        trials = sorted(trial for (trial, _) in iter_trials(draw_trial, (0,), 4, seed=1, max_workers=2))
+        self.assertEqual(trials, [0, 1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
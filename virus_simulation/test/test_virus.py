@@ -2,7 +2,7 @@ __author__ = 'nunoe'
 
 import unittest
 from unittest import mock
-from src.virus import SimpleVirus, ResistantVirus, NoChildException
+from src.virus import SimpleVirus, ResistantVirus, NoChildException, reproduce_all
 
 
 class SimpleVirusTestCase(unittest.TestCase):
@@ -56,6 +56,20 @@ class SimpleVirusTestCase(unittest.TestCase):
         mock_random.return_value = 0.25
         self.assertRaises(NoChildException, self.test_virus.reproduce, 0.5)
 
+    @mock.patch('random.random')
+    def test_try_reproduce(self, mock_random):
+        mock_random.return_value = 0.5
+        self.assertIsNone(self.test_virus.try_reproduce(0))
+        mock_random.return_value = 0.49
+        self.assertEqual(self.test_virus.try_reproduce(0).get_clear_prob(), self.clear_prob)
+
+    @mock.patch('random.random')
+    def test_reproduce_all(self, mock_random):
+        viruses = [self.test_virus, SimpleVirus(0.2, self.clear_prob)]
+        mock_random.return_value = 0.3
+        offspring = reproduce_all(viruses, 0)
+        self.assertEqual([v.get_max_birth_prob() for v in offspring], [self.birth_prob])
+
 
 class ResistantVirusTestCase(unittest.TestCase):
 
@@ -70,6 +84,12 @@ class ResistantVirusTestCase(unittest.TestCase):
     def test_get_resistances(self):
         self.assertEqual(self.test_virus.get_resistances(), self.resistances)
 
+    def test_shared_resistances(self):
+        other_virus = ResistantVirus(self.birth_prob, self.clear_prob, dict(self.resistances), self.mut_prob)
+        self.assertIs(other_virus.get_resistances(), self.test_virus.get_resistances())
+        with self.assertRaises(TypeError):
+            self.test_virus.get_resistances()['drug1'] = False
+
     def test_get_mut_prob(self):
         self.assertEqual(self.test_virus.get_mut_prob(), self.mut_prob)
 
@@ -115,6 +135,12 @@ class ResistantVirusTestCase(unittest.TestCase):
         mock_random.return_value = 0.49
         self.assertRaises(NoChildException, self.test_virus.reproduce, 0, ['drug2'])
 
+    @mock.patch('random.random')
+    def test_reproduce_all(self, mock_random):
+        mock_random.return_value = 0.49
+        self.assertEqual(reproduce_all([self.test_virus], 0, ['drug2']), [])
+        self.assertEqual(len(reproduce_all([self.test_virus], 0, ['drug1', 'drug2'])), 1)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file